@@ -0,0 +1,144 @@
+"""Monthly amortization schedules as NumPy arrays.
+
+A schedule for a loan of L dollars is L times the schedule of a $1 loan at the same rate
+and term, so unit schedules are computed once per (rate, term) and cached; thousands of
+deals sharing a rate/term reuse one table and only pay for a scale and a gather.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+MONTHS_PER_YEAR = 12
+
+
+def _schedule_key(interest_rate, loan_term):
+    # Normalize so 6.5 and 6.500000001 share a table
+    rate = int(np.rint(float(interest_rate) * 1e6)) / 1e6
+    return rate, max(1, int(np.rint(float(loan_term) * MONTHS_PER_YEAR)))
+
+
+@lru_cache(maxsize=1024)
+def _unit_schedule(interest_rate, n_months):
+    monthly_rate = interest_rate / 100 / MONTHS_PER_YEAR
+    months = np.arange(n_months + 1)
+    if monthly_rate > 0:
+        growth = (1 + monthly_rate) ** months
+        payment = monthly_rate * growth[-1] / (growth[-1] - 1)
+        balance = growth - payment * (growth - 1) / monthly_rate
+    else:
+        payment = 1 / n_months
+        balance = 1 - payment * months
+    balance = np.maximum(balance, 0.0)
+    balance[-1] = 0.0
+    interest = balance[:-1] * monthly_rate
+    principal = balance[:-1] - balance[1:]
+
+    # Annual roll-ups, padded to whole years; balance is at the end of each year
+    n_years = -(-n_months // MONTHS_PER_YEAR)
+    pad = n_years * MONTHS_PER_YEAR - n_months
+    annual_interest = np.pad(interest, (0, pad)).reshape(n_years, MONTHS_PER_YEAR).sum(axis=1)
+    annual_principal = np.pad(principal, (0, pad)).reshape(n_years, MONTHS_PER_YEAR).sum(axis=1)
+    annual_balance = balance[np.minimum(np.arange(1, n_years + 1) * MONTHS_PER_YEAR, n_months)]
+
+    schedule = {
+        "payment": payment,
+        "balance": balance,
+        "interest": interest,
+        "principal": principal,
+        "annual_interest": annual_interest,
+        "annual_principal": annual_principal,
+        "annual_balance": annual_balance,
+    }
+    for value in schedule.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+    return schedule
+
+
+def unit_schedule(interest_rate, loan_term):
+    """Cached schedule of a $1 loan (rate in %, term in years). Arrays are read-only."""
+    return _unit_schedule(*_schedule_key(interest_rate, loan_term))
+
+
+def amortization_schedule(loan_amount, interest_rate, loan_term):
+    """Full monthly schedule for one loan: month, payment, interest, principal, balance."""
+    unit = unit_schedule(interest_rate, loan_term)
+    n_months = len(unit["interest"])
+    return {
+        "month": np.arange(1, n_months + 1),
+        "payment": np.full(n_months, unit["payment"] * loan_amount),
+        "interest": unit["interest"] * loan_amount,
+        "principal": unit["principal"] * loan_amount,
+        "balance": unit["balance"][1:] * loan_amount,
+    }
+
+
+def remaining_balance(loan_amount, interest_rate, loan_term, years):
+    """Closed-form balance left after `years` of payments; arrays broadcast, no tables needed."""
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    monthly_rate = np.asarray(interest_rate, dtype=float) / 100 / MONTHS_PER_YEAR
+    n_months = np.maximum(1, np.rint(np.asarray(loan_term, dtype=float) * MONTHS_PER_YEAR))
+    paid = np.minimum(np.asarray(years, dtype=float) * MONTHS_PER_YEAR, n_months)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        total_growth = (1 + monthly_rate) ** n_months
+        fraction = np.where(monthly_rate > 0,
+                            (total_growth - (1 + monthly_rate) ** paid) / (total_growth - 1),
+                            1 - paid / n_months)
+    return loan_amount * np.maximum(fraction, 0.0)
+
+
+def annual_debt_service(monthly_payment, loan_term, n_years):
+    """(n_loans, n_years) mortgage paid per year: 12 payments a year until the term runs out."""
+    monthly_payment = np.atleast_1d(np.asarray(monthly_payment, dtype=float))
+    n_months = np.maximum(1, np.rint(np.atleast_1d(np.asarray(loan_term, dtype=float)) * MONTHS_PER_YEAR))
+    year_start = np.arange(n_years) * MONTHS_PER_YEAR
+    months_paid = np.clip(n_months[:, None] - year_start, 0, MONTHS_PER_YEAR)
+    return monthly_payment[:, None] * months_paid
+
+
+def annual_schedule_batch(loan_amount, interest_rate, loan_term, n_years, monthly_payment=None):
+    """Year-by-year debt service, interest, principal and end-of-year balance for many loans.
+
+    Returns (n_loans, n_years) matrices. Debt service stops once a loan is paid off, so
+    years past the term carry no mortgage. `monthly_payment` can be passed when the caller
+    already has the level payment, so debt service matches it to the cent.
+    """
+    loan_amount, interest_rate, loan_term = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(v, dtype=float)) for v in (loan_amount, interest_rate, loan_term)])
+    n_loans = loan_amount.shape[0]
+    interest = np.zeros((n_loans, n_years))
+    principal = np.zeros((n_loans, n_years))
+    balance = np.zeros((n_loans, n_years))
+    unit_payment = np.zeros(n_loans)
+
+    # One unit table per distinct (rate, term); rows sharing it are filled with one scale
+    rate_micros = np.rint(interest_rate * 1e6).astype(np.int64)
+    terms = np.maximum(1, np.rint(loan_term * MONTHS_PER_YEAR)).astype(np.int64)
+    # Packed into one integer per row; spacing rates by the longest term keeps every key distinct
+    stride = int(terms.max(initial=0)) + 1
+    keys, group_of_row = np.unique(rate_micros * stride + terms, return_inverse=True)
+    order = np.argsort(group_of_row, kind="stable")
+    bounds = np.searchsorted(group_of_row[order], np.arange(len(keys) + 1))
+
+    for group, packed in enumerate(keys):
+        key = (int(packed // stride) / 1e6, int(packed % stride))
+        unit = _unit_schedule(*key)
+        rows = order[bounds[group]:bounds[group + 1]]
+        span = min(n_years, len(unit["annual_interest"]))
+        scale = loan_amount[rows, None]
+        interest[rows, :span] = unit["annual_interest"][:span] * scale
+        principal[rows, :span] = unit["annual_principal"][:span] * scale
+        balance[rows, :span] = unit["annual_balance"][:span] * scale
+        unit_payment[rows] = unit["payment"]
+
+    if monthly_payment is None:
+        monthly_payment = unit_payment * loan_amount
+    monthly_payment = np.broadcast_to(np.asarray(monthly_payment, dtype=float), (n_loans,))
+
+    return {
+        "debt_service": annual_debt_service(monthly_payment, loan_term, n_years),
+        "interest": interest,
+        "principal": principal,
+        "balance": balance,
+    }
@@ -0,0 +1,217 @@
+"""Stream a listings feed through the metrics engine and AI grading.
+
+    python batch_evaluate.py listings.csv results/ --chunksize 50000 --workers 8 \
+        --set interest_rate=6.5 --set loan_term=30
+
+The input (CSV, JSONL or Parquet) is read in fixed-size chunks; each chunk is evaluated
+with calculate_metrics_batch + grading.VERDICT_RULES and written to its own part file
+in the output directory (results/part-000042.csv; --format parquet writes .parquet
+parts and needs pyarrow). Only a few chunks are in memory at a time. Parts are written
+atomically, so rerunning the same command after a crash skips every chunk that already
+has a part and carries on from there. The output directory's manifest records the input
+file (path, size, mtime), chunk size, format and --set defaults; a rerun that differs in
+any of them is refused rather than mixing old parts with new ones.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from calculations import METRIC_INPUTS, calculate_metrics_batch, evaluable
+
+MANIFEST_NAME = "_manifest.json"
+
+# Scalar outputs written per listing, next to the listing's own columns
+OUTPUT_COLUMNS = {
+    "Cap Rate (%)": "cap_rate",
+    "Cash-on-Cash Return (%)": "coc_return",
+    "Final Year ROI (%)": "final_year_roi",
+    "First Year Cash Flow ($)": "first_year_cash_flow",
+    "Monthly Mortgage ($)": "monthly_mortgage",
+    "irr (%)": "irr",
+    "irr_converged": "irr_converged",
+    "equity_multiple": "equity_multiple",
+    "Net Sale Proceeds ($)": "net_sale_proceeds",
+    "Grade": "coc_grade",
+}
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt"):
+        return "csv"
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"can't tell the format of {path!r}; use --input-format")
+
+
+def read_chunks(path, chunksize, fmt=None):
+    """Yield DataFrames of at most `chunksize` rows without loading the whole file."""
+    fmt = fmt or detect_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+    elif fmt == "jsonl":
+        yield from pd.read_json(path, lines=True, chunksize=chunksize)
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("pyarrow is required for Parquet input: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"unsupported input format {fmt!r}")
+
+
+def evaluate_chunk(chunk, defaults=None):
+    """Metrics + verdict columns for one chunk of listings."""
+    from grading import VERDICT_RULES, batch_metrics
+
+    columns = {}
+    for name in METRIC_INPUTS:
+        if name in chunk.columns:
+            columns[name] = pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=float)
+        elif defaults and name in defaults:
+            columns[name] = np.full(len(chunk), defaults[name], dtype=float)
+        else:
+            raise ValueError(f"input has no {name!r} column (pass --set {name}=VALUE for a default)")
+
+    # Rows with missing or out-of-range inputs are kept but left without metrics
+    valid = evaluable(columns)
+    n_rows = len(chunk)
+    results = {column: np.full(n_rows, np.nan) for column in OUTPUT_COLUMNS.values()}
+    results["irr_converged"] = np.zeros(n_rows, dtype=bool)
+    results["coc_grade"] = np.full(n_rows, None, dtype=object)
+    results["total_cash_flow"] = np.full(n_rows, np.nan)
+    results["verdict_grade"] = np.full(n_rows, None, dtype=object)
+
+    if valid.any():
+        batch = calculate_metrics_batch({name: values[valid] for name, values in columns.items()}, irr_curve=False)
+        values = batch_metrics(batch)
+        for key, column in OUTPUT_COLUMNS.items():
+            results[column][valid] = batch[key]
+        results["total_cash_flow"][valid] = values["total_cash_flow"]
+        results["verdict_grade"][valid] = VERDICT_RULES.grade(values)
+
+    return chunk.assign(**results)
+
+
+def part_path(output_dir, index, fmt):
+    return os.path.join(output_dir, f"part-{index:06d}.{fmt}")
+
+
+def process_chunk(index, chunk, output_dir, output_format, defaults):
+    """Evaluate one chunk and write its part file; returns (index, rows). Runs in worker processes."""
+    result = evaluate_chunk(chunk, defaults)
+    path = part_path(output_dir, index, output_format)
+    tmp_path = path + ".tmp"
+    if output_format == "parquet":
+        result.to_parquet(tmp_path, index=False)
+    else:
+        result.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return index, len(result)
+
+
+def _check_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        changed = [key for key in manifest if previous.get(key) != manifest[key]]
+        if changed:
+            raise SystemExit(f"{output_dir} holds a run with a different {', '.join(changed)}; "
+                             "use a fresh output directory")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def run(input_path, output_dir, chunksize=50000, workers=1, input_format=None, output_format="csv",
+        defaults=None, log=sys.stderr):
+    if output_format == "parquet":
+        try:
+            import pyarrow
+        except ImportError:
+            raise SystemExit("pyarrow is required for Parquet output: pip install pyarrow")
+    os.makedirs(output_dir, exist_ok=True)
+    stat = os.stat(input_path)
+    _check_manifest(output_dir, {
+        "input": os.path.abspath(input_path), "input_size": stat.st_size, "input_mtime_ns": stat.st_mtime_ns,
+        "chunksize": chunksize, "output_format": output_format, "defaults": defaults or {},
+    })
+
+    started = time.perf_counter()
+    rows_done = skipped = 0
+
+    def report(index, rows):
+        nonlocal rows_done
+        rows_done += rows
+        elapsed = time.perf_counter() - started
+        print(f"chunk {index}: {rows} rows | total {rows_done} rows, {rows_done / elapsed:,.0f} rows/s", file=log)
+
+    chunks = ((i, c) for i, c in enumerate(read_chunks(input_path, chunksize, input_format)))
+
+    if workers <= 1:
+        for index, chunk in chunks:
+            if os.path.exists(part_path(output_dir, index, output_format)):
+                skipped += 1
+                continue
+            report(*process_chunk(index, chunk, output_dir, output_format, defaults))
+    else:
+        # Keep at most 2 chunks per worker in flight so memory stays bounded
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for index, chunk in chunks:
+                if os.path.exists(part_path(output_dir, index, output_format)):
+                    skipped += 1
+                    continue
+                pending.add(pool.submit(process_chunk, index, chunk, output_dir, output_format, defaults))
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report(*future.result())
+            for future in pending:
+                report(*future.result())
+
+    elapsed = time.perf_counter() - started
+    print(f"done: {rows_done} rows in {elapsed:.1f}s ({rows_done / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{skipped} chunks already complete", file=log)
+    return rows_done
+
+
+def _parse_defaults(pairs):
+    defaults = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if name not in METRIC_INPUTS or not value:
+            raise SystemExit(f"--set expects NAME=VALUE with NAME one of {', '.join(METRIC_INPUTS)}")
+        defaults[name] = float(value)
+    return defaults
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a listings feed in streaming chunks")
+    parser.add_argument("input", help="listings file (.csv, .jsonl or .parquet)")
+    parser.add_argument("output_dir", help="directory for part files (reused to resume)")
+    parser.add_argument("--chunksize", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--input-format", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument("--format", dest="output_format", choices=["csv", "parquet"], default="csv",
+                        help="part file format (parquet needs pyarrow)")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE",
+                        help="default for an input column missing from the feed (repeatable)")
+    args = parser.parse_args(argv)
+
+    run(args.input, args.output_dir, args.chunksize, args.workers, args.input_format, args.output_format,
+        _parse_defaults(args.set))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Build PDF report packs for a whole listings file.
+
+    python batch_reports.py listings.csv reports.zip --workers 16 --name-column listing_id \
+        --set interest_rate=6.5 --set loan_term=30
+    python batch_reports.py pairs.csv comparisons/ --mode comparison
+
+Deals are read in chunks and sent to a process pool in small blocks; each worker
+evaluates its block in one calculate_metrics_batch call and renders the PDFs. Finished
+PDFs are written straight into the ZIP (or directory) as blocks complete, and only a
+few blocks are in flight at a time, so memory doesn't grow with the number of reports.
+In comparison mode consecutive rows are paired (rows 1+2, 3+4, ...). Each report carries
+its projection chart: the same charts.py layout the pages show, drawn as vector graphics;
+--no-charts leaves them out for a little more throughput.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from batch_evaluate import _parse_defaults, read_chunks
+from calculations import METRIC_INPUTS, batch_row, calculate_metrics_batch, evaluable
+
+BLOCK_SIZE = 32
+
+
+# --- Worker-side (module level so they pickle) ---
+
+def _columns(deals):
+    return {name: [float(deal[name]) for deal in deals] for name in METRIC_INPUTS}
+
+
+def build_single_reports(names, deals, include_charts=True):
+    """[(file name, pdf bytes, seconds)] for one block of deals."""
+    from pdf_generator_single import generate_ai_verdict_batch, generate_pdf
+
+    batch = calculate_metrics_batch(_columns(deals), irr_curve=False)
+    summaries, grades = generate_ai_verdict_batch(
+        batch["Final Year ROI (%)"], batch["Multi-Year Cash Flow"], batch["Cash-on-Cash Return (%)"])
+    reports = []
+    for i, (name, deal) in enumerate(zip(names, deals)):
+        started = time.perf_counter()
+        metrics = batch_row(batch, i)
+        metrics["AI Verdict"] = summaries[i]
+        metrics["Grade"] = grades[i]
+        property_data = {input_name: deal[input_name] for input_name in METRIC_INPUTS}
+        pdf = generate_pdf(property_data, metrics, f"This is a {grades[i]}-grade rental with upside potential",
+                           include_charts=include_charts)
+        reports.append((f"{name}.pdf", pdf.getvalue(), time.perf_counter() - started))
+    return reports
+
+
+def build_comparison_reports(names, deals, include_charts=True):
+    """Same as build_single_reports, for consecutive (A, B) pairs of deals."""
+    from pdf_generator_dual import generate_comparison_pdf_table_style
+
+    batch = calculate_metrics_batch(_columns(deals), irr_curve=False)
+    reports = []
+    for i in range(0, len(deals) - 1, 2):
+        started = time.perf_counter()
+        pdf = generate_comparison_pdf_table_style(batch_row(batch, i), batch_row(batch, i + 1), include_charts)
+        reports.append((f"{names[i]}_vs_{names[i + 1]}.pdf", pdf, time.perf_counter() - started))
+    return reports
+
+
+BUILDERS = {"single": build_single_reports, "comparison": build_comparison_reports}
+
+
+# --- Output sinks ---
+
+_UNSAFE_CHARS = re.compile(r"[^\w .-]")
+
+
+def safe_filename(name, max_length=200):
+    """`name` reduced to a bare file name: no directories, separators or leading dots."""
+    stem, dot, ext = name.rpartition(".")
+    if not dot or not ext.isalnum():
+        stem, ext = name, ""
+    stem = re.sub(r"\.{2,}", ".", _UNSAFE_CHARS.sub("_", stem)).strip(". ")[:max_length]
+    return (stem or "report") + (f".{ext}" if ext else "")
+
+
+class UniqueNames:
+    """Hands out safe file names, suffixing repeats -2, -3, ... (case-insensitively)."""
+
+    def __init__(self):
+        self.used = set()
+
+    def __call__(self, name):
+        name = safe_filename(name)
+        stem, ext = os.path.splitext(name)  # safe names never start with a dot
+        n = 1
+        while name.casefold() in self.used:
+            n += 1
+            name = f"{stem}-{n}{ext}"
+        self.used.add(name.casefold())
+        return name
+
+
+class ZipSink:
+    def __init__(self, path, compression=zipfile.ZIP_DEFLATED):
+        self.zip = zipfile.ZipFile(path, "w", compression=compression)
+        self.names = UniqueNames()
+
+    def write(self, name, data):
+        self.zip.writestr(self.names(name), data)
+
+    def close(self):
+        self.zip.close()
+
+
+class DirectorySink:
+    def __init__(self, path):
+        self.path = path
+        self.names = UniqueNames()
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.path, self.names(name))
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        pass
+
+
+def open_sink(output):
+    return ZipSink(output) if output.lower().endswith(".zip") else DirectorySink(output)
+
+
+# --- Driver ---
+
+def iter_blocks(input_path, mode, chunksize, input_format, defaults, name_column, block_size=BLOCK_SIZE,
+                skipped=None):
+    """Yield (names, deals) blocks; comparison blocks always hold whole pairs.
+
+    Rows with missing, non-numeric or out-of-range inputs are skipped (in comparison mode,
+    with their partner) and counted in skipped["rows"] when a dict is passed.
+    """
+    if mode == "comparison":
+        block_size += block_size % 2
+        chunksize += chunksize % 2
+    row_number = 0
+    for chunk in read_chunks(input_path, chunksize, input_format):
+        for name, value in (defaults or {}).items():
+            if name not in chunk.columns:
+                chunk[name] = value
+        missing = [name for name in METRIC_INPUTS if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"input has no {', '.join(missing)} column (pass --set NAME=VALUE for a default)")
+        if name_column:
+            names = chunk[name_column].astype(str).tolist()
+        else:
+            names = [f"report-{row_number + i:06d}" for i in range(len(chunk))]
+        inputs = chunk[list(METRIC_INPUTS)].apply(pd.to_numeric, errors="coerce")
+        valid = evaluable({name: inputs[name].to_numpy(dtype=float) for name in METRIC_INPUTS})
+        if mode == "comparison":
+            pair_valid = valid[0::2][:len(valid) // 2] & valid[1::2]
+            valid = np.zeros(len(valid), dtype=bool)
+            valid[0:2 * len(pair_valid):2] = valid[1:2 * len(pair_valid):2] = pair_valid
+        if skipped is not None:
+            skipped["rows"] = skipped.get("rows", 0) + int((~valid).sum())
+        names = [name for name, ok in zip(names, valid) if ok]
+        deals = inputs[valid].to_dict("records")
+        row_number += len(chunk)
+        for start in range(0, len(deals), block_size):
+            yield names[start:start + block_size], deals[start:start + block_size]
+
+
+def run(input_path, output, mode="single", workers=1, chunksize=10000, input_format=None, defaults=None,
+        name_column=None, include_charts=True, log=sys.stderr):
+    builder = BUILDERS[mode]
+    sink = open_sink(output)
+    latencies = []
+    skipped = {"rows": 0}
+    total_bytes = 0
+    started = time.perf_counter()
+
+    def collect(reports):
+        nonlocal total_bytes
+        for name, pdf, seconds in reports:
+            sink.write(name, pdf)
+            latencies.append(seconds)
+            total_bytes += len(pdf)
+        elapsed = time.perf_counter() - started
+        print(f"{len(latencies)} reports, {len(latencies) / elapsed * 60:,.0f}/min", file=log)
+
+    blocks = iter_blocks(input_path, mode, chunksize, input_format, defaults, name_column, skipped=skipped)
+    try:
+        if workers <= 1:
+            for names, deals in blocks:
+                collect(builder(names, deals, include_charts))
+        else:
+            # At most 2 blocks per worker in flight, so finished PDFs never pile up in memory
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = set()
+                for names, deals in blocks:
+                    pending.add(pool.submit(builder, names, deals, include_charts))
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                for future in pending:
+                    collect(future.result())
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - started
+    stats = {"reports": len(latencies), "seconds": round(elapsed, 2),
+             "reports_per_minute": round(len(latencies) / max(elapsed, 1e-9) * 60),
+             "megabytes": round(total_bytes / 1e6, 1), "skipped_rows": skipped["rows"]}
+    if latencies:
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        stats.update(latency_ms_p50=round(p50, 1), latency_ms_p95=round(p95, 1),
+                     latency_ms_max=round(max(latencies) * 1000, 1))
+    print("done: " + ", ".join(f"{k}={v}" for k, v in stats.items()), file=log)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PDF reports for every deal in a listings file")
+    parser.add_argument("input", help="listings file (.csv, .jsonl or .parquet)")
+    parser.add_argument("output", help="a .zip file, or a directory for loose PDFs")
+    parser.add_argument("--mode", choices=list(BUILDERS), default="single")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--input-format", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument("--name-column", help="column used to name each PDF (default: row number)")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE",
+                        help="default for an input column missing from the feed (repeatable)")
+    parser.add_argument("--no-charts", action="store_true",
+                        help="leave out the projection charts (they cost about a sixth of the throughput)")
+    args = parser.parse_args(argv)
+
+    run(args.input, args.output, args.mode, args.workers, args.chunksize, args.input_format,
+        _parse_defaults(args.set), args.name_column, not args.no_charts)
+
+
+if __name__ == "__main__":
+    main()
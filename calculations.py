@@ -1,96 +1,287 @@
-from scipy.optimize import newton
 import numpy as np
-import numpy_financial as npf
+from amortization import annual_schedule_batch
+from grading import COC_RULES
+from irr_solver import irr_percent
+from metrics_result import result_from_batch
+
+# Argument order shared by calculate_metrics and calculate_metrics_batch
+# (also the column names expected when a DataFrame is passed to the batch engine)
+METRIC_INPUTS = (
+    "purchase_price", "monthly_rent", "down_payment_pct", "interest_rate", "loan_term",
+    "monthly_expenses", "vacancy_rate", "appreciation_rate", "rent_growth_rate", "time_horizon",
+)
+
+# Per-year series returned by calculate_metrics_batch as (n_deals, max_horizon) matrices
+SERIES_KEYS = (
+    "Multi-Year Cash Flow", "Annual ROI % (by year)", "Annual Rents $ (by year)",
+    "Loan Balance $ (by year)", "Equity $ (by year)", "IRR % by Hold Year",
+)
+
+# Broker/closing costs taken off the sale price at exit
+DEFAULT_SELLING_COST_PCT = 6.0
+
+# Longest horizon and loan term (years) evaluated: the engine allocates (deals x horizon)
+# matrices, so an unbounded horizon could exhaust memory
+MAX_TIME_HORIZON = 50
+MAX_LOAN_TERM = 50
+
+# Max cells of the (exits, years) cash-flow matrix solved at once for the hold-year IRR curve
+_HOLD_YEAR_BLOCK = 1 << 21
+
+
+def round_cents(values):
+    """np.round(values, 2), but rounding every value exactly as Python's round(value, 2) does.
+
+    np.round scales by 100 and rounds the (already rounded) product, so a value sitting on a
+    half cent, such as 1050.105, can land on the other cent from round(). The exact product
+    is recovered with Dekker's two-product, and only the ties it decides are changed.
+    """
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid="ignore"):
+        scaled = values * 100
+        split = values * 134217729.0  # 2**27 + 1
+        high = split - (split - values)
+        error = (high * 100 - scaled) + (values - high) * 100
+        rounded = np.rint(scaled)
+        tie = (np.abs(scaled - rounded) == 0.5) & (error != 0)
+        rounded = np.where(tie, np.where(error > 0, np.ceil(scaled), np.floor(scaled)), rounded)
+    return rounded / 100
+
+
+def evaluable(columns):
+    """Mask of the deals (float input columns by name) the engine evaluates: finite inputs, a
+    horizon of 1 to MAX_TIME_HORIZON years and a loan term over 0, at most MAX_LOAN_TERM years."""
+    horizon, term = columns["time_horizon"], columns["loan_term"]
+    with np.errstate(invalid="ignore"):
+        return (np.all([np.isfinite(columns[name]) for name in METRIC_INPUTS], axis=0)
+                & (horizon >= 1) & (horizon <= MAX_TIME_HORIZON) & (term > 0) & (term <= MAX_LOAN_TERM))
+
 
 def robust_irr(cash_flows, guess=0.1):
-    def npv(rate):
-        return sum(cf / (1 + rate) ** i for i, cf in enumerate(cash_flows))
-    try:
-        irr_solution = newton(npv, guess)
-        return round(irr_solution * 100, 2)
-    except Exception as e:
-        print(f"IRR calculation failed: {e}")
-        return 0
+    """IRR (%) of a single cash-flow vector; NaN when no IRR exists (see irr_solver.solve_irr)."""
+    irr, _ = irr_percent([cash_flows], guess=guess)
+    return float(irr[0])
 
-def calculate_metrics(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
-                      monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon):
-    
-    loan_amount = purchase_price * (1 - down_payment_pct / 100)
-    monthly_interest_rate = interest_rate / 100 / 12
-    number_of_payments = loan_term * 12
-
-    if monthly_interest_rate > 0:
-        monthly_mortgage = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** number_of_payments) / \
-                           ((1 + monthly_interest_rate) ** number_of_payments - 1)
+
+def mortgage_payment(loan_amount, interest_rate, loan_term):
+    """Level monthly payment for a fully amortizing loan (rate in %, term in years); arrays broadcast."""
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    monthly_interest_rate = np.asarray(interest_rate, dtype=float) / 100 / 12
+    number_of_payments = np.asarray(loan_term, dtype=float) * 12
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + monthly_interest_rate) ** number_of_payments
+        return np.where(
+            monthly_interest_rate > 0,
+            loan_amount * (monthly_interest_rate * growth) / (growth - 1),
+            loan_amount / number_of_payments,
+        )
+
+
+def project_cash_flows(monthly_rent, vacancy_rate, rent_growth_rate, annual_expenses, annual_mortgage,
+                       purchase_price, appreciation_rate, down_payment_amount, time_horizon):
+    """Year-by-year rents, cash flows, cumulative return and ROI for one or many deals.
+
+    All arguments are scalars or 1-D arrays of equal length, except `annual_mortgage`, which
+    may also be an (n_deals, max_horizon) debt-service matrix (see annual_schedule_batch).
+    Returns (n_deals, max_horizon) matrices; columns past a deal's own horizon are left as
+    computed and flagged False in "in_horizon" so callers can mask them.
+    """
+    monthly_rent, vacancy_rate, rent_growth_rate, annual_expenses, purchase_price, \
+        appreciation_rate, down_payment_amount, time_horizon = np.broadcast_arrays(
+            *[np.atleast_1d(np.asarray(v, dtype=float)) for v in (
+                monthly_rent, vacancy_rate, rent_growth_rate, annual_expenses, purchase_price,
+                appreciation_rate, down_payment_amount, time_horizon)])
+    n_deals = monthly_rent.shape[0]
+    max_horizon = int(time_horizon.max())
+    years = np.arange(1, max_horizon + 1)
+    annual_mortgage = np.asarray(annual_mortgage, dtype=float)
+    if annual_mortgage.ndim < 2:
+        annual_mortgage = np.atleast_1d(annual_mortgage)[:, None]
+    annual_mortgage = np.broadcast_to(annual_mortgage, (n_deals, max_horizon))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Geometric rent series: rent, rent*(1+g), rent*(1+g)*(1+g), ...
+        growth = np.repeat((1 + rent_growth_rate / 100)[:, None], max_horizon, axis=1)
+        growth[:, 0] = monthly_rent
+        current_rent = np.cumprod(growth, axis=1)
+
+        annual_rent = current_rent * (1 - vacancy_rate / 100)[:, None] * 12
+        cash_flows = round_cents(annual_rent - annual_expenses[:, None] - annual_mortgage)
+        rents = round_cents(current_rent)
+
+        # Prefix sums of the (rounded) cash flows plus straight-line appreciation
+        in_horizon = years <= time_horizon[:, None]
+        appreciation_value = purchase_price * ((1 + appreciation_rate / 100) ** time_horizon - 1)
+        cumulative_cash = np.cumsum(np.where(in_horizon, cash_flows, 0.0), axis=1)
+        cumulative_return = cumulative_cash + appreciation_value[:, None] * (years / time_horizon[:, None])
+        roi = np.where(down_payment_amount[:, None] != 0,
+                       round_cents(cumulative_return / down_payment_amount[:, None] * 100), 0.0)
+
+    return {
+        "rents": rents,
+        "cash_flows": cash_flows,
+        "cumulative_return": cumulative_return,
+        "roi": roi,
+        "in_horizon": in_horizon,
+    }
+
+
+def hold_year_irr(initial_investment, cash_flows, sale_proceeds, exits):
+    """IRR (%) of selling at each flagged year, all solved in one batch.
+
+    `cash_flows` and `sale_proceeds` are (n_deals, max_horizon); `exits` is a boolean
+    matrix of the same shape marking which hold years to solve. Exiting after year y
+    means receiving cash flows 1..y plus the year-y net sale proceeds. Returns
+    (irr, converged) matrices, NaN/False where not solved.
+    """
+    n_deals, max_horizon = cash_flows.shape
+    irr = np.full((n_deals, max_horizon), np.nan)
+    converged = np.zeros((n_deals, max_horizon), dtype=bool)
+    deal_index, exit_index = np.nonzero(exits)
+    block = max(1, _HOLD_YEAR_BLOCK // (max_horizon + 1))
+
+    for start in range(0, len(deal_index), block):
+        deals, years = deal_index[start:start + block], exit_index[start:start + block]
+        # Flows after the exit year are zero, which leaves the IRR unchanged
+        flows = np.where(np.arange(max_horizon) <= years[:, None], cash_flows[deals], 0.0)
+        flows[np.arange(len(deals)), years] += sale_proceeds[deals, years]
+        irr[deals, years], converged[deals, years] = irr_percent(np.column_stack([-initial_investment[deals], flows]))
+    return irr, converged
+
+
+def _as_input_arrays(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                     monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon):
+    # A DataFrame (or any mapping of columns) can be passed in place of the first argument
+    if hasattr(purchase_price, "columns") or isinstance(purchase_price, dict):
+        frame = purchase_price
+        values = [np.asarray(frame[name]) for name in METRIC_INPUTS]
     else:
-        monthly_mortgage = loan_amount / number_of_payments
+        values = [purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                  monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon]
+
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in values])
+    inputs = dict(zip(METRIC_INPUTS, (np.ravel(a) for a in arrays)))
+    inputs["time_horizon"] = inputs["time_horizon"].astype(int)
+    if (inputs["time_horizon"] < 1).any():
+        raise ValueError("time_horizon must be at least 1 year")
+    return inputs
 
-    effective_rent = monthly_rent * (1 - vacancy_rate / 100)
-    annual_rent = effective_rent * 12
-    annual_expenses = monthly_expenses * 12
-    annual_mortgage = monthly_mortgage * 12
-    annual_cash_flow = annual_rent - annual_expenses - annual_mortgage
 
-    cap_rate = (annual_rent - annual_expenses) / purchase_price * 100
-    coc_return = annual_cash_flow / (purchase_price * down_payment_pct / 100) * 100
+def calculate_metrics_batch(purchase_price, monthly_rent=None, down_payment_pct=None, interest_rate=None,
+                            loan_term=None, monthly_expenses=None, vacancy_rate=None, appreciation_rate=None,
+                            rent_growth_rate=None, time_horizon=None, selling_cost_pct=DEFAULT_SELLING_COST_PCT,
+                            irr_curve=True):
+    """Evaluate many deals at once.
 
-    # --- Build multi-year cash flow ---
-    cash_flows = []
-    rents = []
-    annual_cash_flows = []
-    current_rent = monthly_rent
+    Every argument may be a scalar or an array (broadcast against each other), or a
+    DataFrame with the METRIC_INPUTS columns may be passed as the only argument.
+    Scalar metrics come back as 1-D arrays; the per-year series in SERIES_KEYS come
+    back as (n_deals, max_horizon) matrices padded with NaN past each deal's horizon.
 
-    for year in range(1, time_horizon + 1):
-        effective_rent = current_rent * (1 - vacancy_rate / 100)
+    IRR includes selling the property at the end of the horizon (appreciated price less
+    `selling_cost_pct`, less the loan payoff). With irr_curve=False only that exit is
+    solved and "IRR % by Hold Year" is left NaN, which is much cheaper for large batches.
+    """
+    inp = _as_input_arrays(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                           monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon)
+    purchase_price = inp["purchase_price"]
+    monthly_rent = inp["monthly_rent"]
+    down_payment_pct = inp["down_payment_pct"]
+    vacancy_rate = inp["vacancy_rate"]
+    rent_growth_rate = inp["rent_growth_rate"]
+    time_horizon = inp["time_horizon"]
+    n_deals = purchase_price.shape[0]
+    max_horizon = int(time_horizon.max())
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        loan_amount = purchase_price * (1 - down_payment_pct / 100)
+        monthly_mortgage = mortgage_payment(loan_amount, inp["interest_rate"], inp["loan_term"])
+        # Debt service per year stops once the loan is paid off; balances give equity build-up
+        schedule = annual_schedule_batch(loan_amount, inp["interest_rate"], inp["loan_term"], max_horizon,
+                                         monthly_payment=monthly_mortgage)
+
+        effective_rent = monthly_rent * (1 - vacancy_rate / 100)
         annual_rent = effective_rent * 12
+        annual_expenses = inp["monthly_expenses"] * 12
+        annual_mortgage = monthly_mortgage * 12
         annual_cash_flow = annual_rent - annual_expenses - annual_mortgage
-        cash_flows.append(round(annual_cash_flow, 2))
-        annual_cash_flows.append(round(annual_cash_flow, 2))
-        rents.append(round(current_rent, 2))
-        current_rent *= (1 + rent_growth_rate / 100)
-
-    # --- IRR & Equity Multiple ---
-    initial_investment = purchase_price * down_payment_pct / 100
-    irr_cash_flows = [-initial_investment] + cash_flows
-    irr = robust_irr(irr_cash_flows)
-
-    total_cash_received = sum(cash_flows)
-    equity_multiple = round(total_cash_received / initial_investment, 2) if initial_investment != 0 else 0
-
-    # --- ROI per year ---
-    appreciation_value = purchase_price * ((1 + appreciation_rate / 100) ** time_horizon - 1)
-    down_payment_amount = purchase_price * (down_payment_pct / 100)
-
-    roi_list = []
-    for i in range(time_horizon):
-        cumulative_return = sum(annual_cash_flows[:i + 1]) + appreciation_value * ((i + 1) / time_horizon)
-        roi = (cumulative_return / down_payment_amount) * 100 if down_payment_amount != 0 else 0
-        roi_list.append(round(roi, 2))
-
-    # --- Grade Logic ---
-    if coc_return >= 15:
-        grade = "A"
-    elif coc_return >= 12:
-        grade = "B"
-    elif coc_return >= 9:
-        grade = "C"
-    elif coc_return >= 6:
-        grade = "D"
-    else:
-        grade = "F"
 
-    # --- Final Return Dictionary ---
+        cap_rate = (annual_rent - annual_expenses) / purchase_price * 100
+        coc_return = annual_cash_flow / (purchase_price * down_payment_pct / 100) * 100
+
+        # --- Multi-year projection ---
+        initial_investment = purchase_price * down_payment_pct / 100
+        down_payment_amount = purchase_price * (down_payment_pct / 100)
+        projection = project_cash_flows(monthly_rent, vacancy_rate, rent_growth_rate, annual_expenses,
+                                        schedule["debt_service"], purchase_price, inp["appreciation_rate"],
+                                        down_payment_amount, time_horizon)
+        in_horizon = projection["in_horizon"]
+        cash_flows = np.where(in_horizon, projection["cash_flows"], 0.0)
+        rents = projection["rents"]
+        roi = projection["roi"]
+
+        # --- Equity build-up & exit ---
+        years = np.arange(1, max_horizon + 1)
+        property_value = purchase_price[:, None] * (1 + inp["appreciation_rate"][:, None] / 100) ** years
+        loan_balance = round_cents(schedule["balance"])
+        equity = round_cents(property_value - schedule["balance"])
+        selling_costs = np.asarray(selling_cost_pct, dtype=float).reshape(-1, 1) / 100
+        sale_proceeds = round_cents(property_value * (1 - selling_costs) - schedule["balance"])
+
+        # --- IRR (with sale) & Equity Multiple ---
+        at_horizon = years == time_horizon[:, None]
+        irr_by_year, converged_by_year = hold_year_irr(initial_investment, cash_flows, sale_proceeds,
+                                                       in_horizon if irr_curve else at_horizon)
+        irr = irr_by_year[at_horizon]
+        irr_converged = converged_by_year[at_horizon]
+
+        total_cash_received = cash_flows.sum(axis=1)
+        equity_multiple = np.where(initial_investment != 0,
+                                   round_cents(total_cash_received / initial_investment), 0.0)
+
+    final_roi = roi[np.arange(n_deals), time_horizon - 1]
+
+    # --- Grade Logic (thresholds in grading.COC_POLICY) ---
+    grade = COC_RULES.grade({"coc_return": coc_return})
+
     return {
-        "Cap Rate (%)": round(cap_rate, 2),
-        "Cash-on-Cash Return (%)": round(coc_return, 2),
-        "Final Year ROI (%)": round(roi_list[-1], 2),
-        "First Year Cash Flow ($)": round(annual_cash_flows[0], 2),
-        "Monthly Mortgage ($)": round(monthly_mortgage, 2),
+        "Cap Rate (%)": round_cents(cap_rate),
+        "Cash-on-Cash Return (%)": round_cents(coc_return),
+        "Final Year ROI (%)": final_roi,
+        "First Year Cash Flow ($)": cash_flows[:, 0],
+        "Monthly Mortgage ($)": round_cents(monthly_mortgage),
         "Grade": grade,
-        "10yr Cash Flow": annual_cash_flows,
-        "Multi-Year Cash Flow": [round(x, 2) for x in annual_cash_flows],
-        "Annual ROI % (by year)": roi_list,
-        "Annual Rents $ (by year)": rents,
+        "Multi-Year Cash Flow": np.where(in_horizon, cash_flows, np.nan),
+        "Annual ROI % (by year)": np.where(in_horizon, roi, np.nan),
+        "Annual Rents $ (by year)": np.where(in_horizon, rents, np.nan),
+        "Loan Balance $ (by year)": np.where(in_horizon, loan_balance, np.nan),
+        "Equity $ (by year)": np.where(in_horizon, equity, np.nan),
+        "IRR % by Hold Year": irr_by_year,
+        "Net Sale Proceeds ($)": sale_proceeds[at_horizon],
         "irr (%)": irr,
-        "equity_multiple": equity_multiple
+        "irr_converged": irr_converged,
+        "equity_multiple": equity_multiple,
+        "Time Horizon": time_horizon,
     }
+
+
+def batch_row(batch, index):
+    """Pull one deal out of a calculate_metrics_batch result as a calculate_metrics-style dict."""
+    return result_from_batch(batch, index).to_display_dict()
+
+
+def calculate_metrics_result(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                             monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon):
+    """calculate_metrics as an immutable MetricsResult (see metrics_result.py)."""
+    batch = calculate_metrics_batch(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                                    monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate,
+                                    time_horizon)
+    return result_from_batch(batch, 0)
+
+
+def calculate_metrics(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                      monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon):
+    return calculate_metrics_result(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                                    monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate,
+                                    time_horizon).to_display_dict()
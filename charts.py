@@ -0,0 +1,407 @@
+"""Server-side chart rendering with a shared cache.
+
+The projection and comparison charts are laid out once, by chart_layout(), as plain data
+(ChartLayout: styled polylines and text labels, in points), and that one layout is all
+both outputs use: the pages show it as SVG (chart_svg(), via ReportLab's renderSVG) and
+the PDF reports draw it as vector graphics (report_templates.ChartFlowable). Laying a
+chart out takes well under a millisecond, so a batch of distinct deals can carry charts.
+Layouts and SVGs are cached keyed by a fingerprint of the series they plot, so a deal's
+chart is laid out once per process however many reruns, sessions or reports need it.
+
+The page-only plots (IRR by hold year, the sensitivity and portfolio plots) are drawn with
+matplotlib's object-oriented API (a bare Figure on an Agg canvas), so nothing is
+registered with pyplot and a figure is freed as soon as its bytes are saved.
+
+matplotlib, ReportLab and hashlib/json/struct (for the fingerprints) are imported inside
+the functions that use them, so importing this module is cheap.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from io import BytesIO
+
+DPI = 150
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+# matplotlib's text and font caches are shared module state; one render at a time
+_render_lock = threading.Lock()
+
+
+def new_figure(figsize=None):
+    """A Figure attached to its own Agg canvas (no pyplot, nothing to close)."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def figure_bytes(fig, fmt="png", dpi=DPI):
+    """Render `fig` to PNG or SVG bytes."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported chart format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+    buffer = BytesIO()
+    # No timestamp/software metadata, so equal charts give equal bytes
+    metadata = {"Software": None} if fmt == "png" else {"Date": None, "Creator": None}
+    with _render_lock:
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight", metadata=metadata)
+    return buffer.getvalue()
+
+
+def _series(values):
+    # Plain floats: a stable fingerprint whether the caller has lists, tuples or NumPy values
+    return tuple(float(v) for v in values)
+
+
+def chart_fingerprint(kind, fmt, dpi, *series):
+    """Stable hash of a chart's kind, output format and the series it plots."""
+    import hashlib
+    import json
+    import struct
+
+    digest = hashlib.sha256(json.dumps([kind, fmt, dpi, [len(values) for values in series]]).encode())
+    # The values as packed doubles: formatting every float as text costs more than the layout
+    for values in series:
+        digest.update(struct.pack(f"<{len(values)}d", *values))
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """Bounded LRU of rendered charts (bytes, SVG text or layouts) keyed by chart_fingerprint."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build, *args):
+        """The entry for `key`, or `build(*args)` stored under it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = build(*args)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_or_render(self, key, draw, fmt, dpi, *series):
+        """Bytes of `draw(fig, *series)` on a new figure, rendered on a miss."""
+        def render():
+            fig = new_figure()
+            draw(fig, *series)
+            return figure_bytes(fig, fmt, dpi)
+
+        return self.get_or_build(key, render)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "bytes": sum(len(value) for value in self._entries.values() if isinstance(value, (bytes, str))),
+            }
+
+
+# Process-wide cache shared by every session and by the PDF generators
+default_chart_cache = ChartCache(maxsize=int(os.getenv("CHART_CACHE_SIZE", "256")))
+
+
+# --- Drawing ---
+
+def draw_hold_year(fig, irr_by_year):
+    """IRR if the property were sold after each year of the horizon."""
+    ax = fig.subplots()
+    ax.plot(range(1, len(irr_by_year) + 1), irr_by_year, marker="o")
+    ax.set_xlabel("Sell after year")
+    ax.set_ylabel("IRR (%)")
+    ax.grid(True)
+
+
+CHARTS = {
+    "hold_year": draw_hold_year,
+}
+
+
+def render_chart(kind, *series, fmt="png", dpi=DPI, cache=None):
+    """Bytes of chart `kind` for the given series, rendered on first use and cached after."""
+    cache = cache or default_chart_cache
+    series = tuple(_series(values) for values in series)
+    key = chart_fingerprint(kind, fmt, dpi, *series)
+    return cache.get_or_render(key, CHARTS[kind], fmt, dpi, *series)
+
+
+def hold_year_chart(irr_by_year, fmt="png", dpi=DPI):
+    """IRR by hold year for one property."""
+    return render_chart("hold_year", irr_by_year, fmt=fmt, dpi=dpi)
+
+
+# --- Projection and comparison charts (pages and PDF reports) ---
+
+# A chart laid out in points from its bottom-left corner. `paths` are painted in order,
+# then `labels` on top.
+ChartLayout = namedtuple("ChartLayout", "width height paths labels")
+
+# Polylines, ((x, y), ...), stroked in one style: color is (r, g, b) in 0..1 and dash a
+# dash pattern or None. The lines carry no point markers; color and dash tell them apart.
+ChartPath = namedtuple("ChartPath", "color width dash lines")
+
+# (x, y) is where the text starts: centred and right-aligned labels are already shifted
+# back along their baseline. angle is 0, or 90 / -90 for a vertical label.
+ChartLabel = namedtuple("ChartLabel", "x y text font size color angle")
+
+# Points: a letter page's frame width with 1" margins, less its padding. Short enough that
+# the comparison report still fits on one page; the pages scale the SVG to their width.
+CHART_SIZE = (456, 200)
+
+# Plot area inside the chart, in points from each edge (room for the title above, tick
+# labels and axis titles around it, and the legend below)
+_PLOT_LEFT, _PLOT_BOTTOM, _PLOT_RIGHT, _PLOT_TOP = 60, 60, 60, 24
+
+_BLACK, _GRID, _GREEN = (0, 0, 0), (0.83, 0.83, 0.83), (0, 0.5, 0)
+# matplotlib's first two default colors, which the projection chart has always used
+_BLUE, _ORANGE = (0.12, 0.47, 0.71), (1, 0.5, 0.05)
+
+
+def _nice_ticks(lo, hi, max_ticks=5):
+    """Round tick values covering [lo, hi] (steps of 1, 2, 2.5 or 5 x 10^n)."""
+    if hi - lo < 1e-9:
+        lo, hi = lo - 1, hi + 1
+    raw = (hi - lo) / max_ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw)
+    first = math.floor(lo / step) * step
+    count = math.ceil(round((hi - first) / step, 9))
+    return [first + i * step for i in range(count + 1)]
+
+
+def _tick_label(value, step):
+    return f"{value:,.1f}" if step % 1 else f"{value:,.0f}"
+
+
+def _comb(color, at, first, last, step, length, thickness, vertical=False):
+    """Evenly spaced marks (ticks or grid lines) across the line `at`, from `first` to `last`.
+
+    The marks are the dashes of one thick dashed stroke: `length` wide, dashes `thickness`
+    long and `step` apart, so a set of ticks or grid lines is one segment rather than one each.
+    """
+    ends = [(at, first - thickness / 2), (at, last + thickness / 2)]
+    line = ends if vertical else [(x, y) for y, x in ends]
+    return ChartPath(color, length, (thickness, step - thickness), (line,))
+
+
+@lru_cache(maxsize=4096)
+def _text_width(text, font, size):
+    """stringWidth, memoized: titles, legend names, years and round tick values recur across charts."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    return stringWidth(text, font, size)
+
+
+def _label(x, y, text, size=7, color=_BLACK, anchor="start", angle=0, font="Helvetica"):
+    if anchor != "start":
+        shift = _text_width(text, font, size) * (0.5 if anchor == "middle" else 1)
+        x, y = (x - shift, y) if not angle else (x, y - shift * angle / 90)
+    return ChartLabel(x, y, text, font, size, color, angle)
+
+
+@lru_cache(maxsize=256)
+def _chart_frame(title, names, left_label, right_label, size, last_year):
+    """The parts of a _dual_axis_chart that don't depend on the values plotted, memoized as they
+    repeat across charts: (x grid, frame and x ticks paths, labels, year x positions, legend samples)."""
+    width, height = size
+    x0, y0, x1, y1 = _PLOT_LEFT, _PLOT_BOTTOM, width - _PLOT_RIGHT, height - _PLOT_TOP
+    x_scale = (x1 - x0) / last_year
+    xs = tuple(x0 + (year - 0.5) * x_scale for year in range(1, last_year + 1))
+    labels = [_label(width / 2, height - 12, title, size=10, anchor="middle", font="Helvetica-Bold")]
+
+    year_step = last_year // 8 + 1
+    years = range(1, last_year + 1, year_step)
+    x_first, x_last, x_step = xs[0], xs[years[-1] - 1], year_step * x_scale
+    paths = (
+        _comb(_GRID, (y0 + y1) / 2, x_first, x_last, x_step, y1 - y0, 0.5),
+        ChartPath(_BLACK, 1, None, (((x0, y1), (x0, y0), (x1, y0), (x1, y1)),)),
+        _comb(_BLACK, y0 - 2, x_first, x_last, x_step, 4, 1),
+    )
+    labels += [_label(xs[year - 1], y0 - 11, str(year), anchor="middle") for year in years]
+
+    # Axis titles
+    middle = (y0 + y1) / 2
+    labels.append(_label((x0 + x1) / 2, y0 - 22, "Year", size=8, anchor="middle"))
+    labels.append(_label(16, middle, left_label, size=8, anchor="middle", angle=90))
+    labels.append(_label(width - 16, middle, right_label, size=8, color=_GREEN, anchor="middle", angle=-90))
+
+    # A legend in two rows below the plot
+    legends = []
+    for i, name in enumerate(names):
+        legend_x, legend_y = x0 + (i // 2) * 130, 18 - (i % 2) * 12
+        legends.append(((legend_x, legend_y), (legend_x + 18, legend_y)))
+        labels.append(_label(legend_x + 24, legend_y - 2.5, name))
+    return paths, tuple(labels), xs, tuple(legends)
+
+
+def _dual_axis_chart(title, left, right, left_label, right_label, size):
+    """Lines on a left and a right y-axis; each line is (label, series, color, dashed)."""
+    width, height = size
+    x0, y0, x1, y1 = _PLOT_LEFT, _PLOT_BOTTOM, width - _PLOT_RIGHT, height - _PLOT_TOP
+    last_year = max([len(series) for _, series, *_ in left + right] + [1])
+    names = tuple(name for name, *_ in left + right)
+    (x_grid, frame, x_ticks), labels, xs, legends = _chart_frame(
+        title, names, left_label, right_label, tuple(size), last_year)
+    labels = list(labels)
+
+    def y_axis(lines):
+        values = [v for _, series, *_ in lines for v in series if math.isfinite(v)] or [0]
+        ticks = _nice_ticks(min(values), max(values))
+        return ticks, ticks[0], (y1 - y0) / (ticks[-1] - ticks[0])
+
+    # Grid, axes, ticks and tick labels
+    left_ticks, left_lo, left_scale = y_axis(left)
+    right_ticks, right_lo, right_scale = y_axis(right)
+    left_step, right_step = left_ticks[1] - left_ticks[0], right_ticks[1] - right_ticks[0]
+    paths = [
+        x_grid,
+        _comb(_GRID, (x0 + x1) / 2, y0, y1, left_step * left_scale, x1 - x0, 0.5, vertical=True),
+        frame,
+        x_ticks,
+        _comb(_BLACK, x0 - 2, y0, y1, left_step * left_scale, 4, 1, vertical=True),
+        _comb(_BLACK, x1 + 2, y0, y1, right_step * right_scale, 4, 1, vertical=True),
+    ]
+    for tick in left_ticks:
+        labels.append(_label(x0 - 6, y0 + (tick - left_lo) * left_scale - 2.5, _tick_label(tick, left_step), anchor="end"))
+    for tick in right_ticks:
+        labels.append(_label(x1 + 6, y0 + (tick - right_lo) * right_scale - 2.5, _tick_label(tick, right_step), color=_GREEN))
+
+    # The lines, each drawn with its legend sample
+    lines = [(line, left_lo, left_scale) for line in left] + [(line, right_lo, right_scale) for line in right]
+    for ((name, series, color, dashed), lo, scale), legend in zip(lines, legends):
+        points = tuple((x, y0 + (value - lo) * scale) for x, value in zip(xs, series) if math.isfinite(value))
+        paths.append(ChartPath(color, 1.2, (4, 2) if dashed else None, (points, legend) if len(points) > 1 else (legend,)))
+    # Grouped by font and color, so whoever draws the labels switches text state a few times, not per label
+    labels.sort(key=lambda label: (label.font, label.size, label.color))
+    return ChartLayout(width, height, tuple(paths), tuple(labels))
+
+
+def _projection_layout(size, cash_flow, rents, roi):
+    """Single-property cash flow and rent, with ROI on a second y-axis."""
+    n = len(cash_flow)
+    return _dual_axis_chart(
+        "Multi - Year Projected Cash Flow & ROI",
+        [("Multi-Year Cash Flow ($)", cash_flow, _BLUE, False),
+         ("Projected Rent ($)", rents[:n], _ORANGE, True)],
+        [("ROI (%)", roi[:n], _GREEN, False)],
+        "Projected Cash Flow / Rent ($)", "ROI (%)", size,
+    )
+
+
+def _comparison_layout(size, cf_a, cf_b, rent_a, rent_b, roi_a, roi_b):
+    """6-curve dual-axis plot: cash flow and rent for A and B, ROI on a second y-axis."""
+    # ✅ Defensive trim to avoid x/y mismatch (each property plots the years all its series cover)
+    n_a, n_b = min(len(cf_a), len(rent_a), len(roi_a)), min(len(cf_b), len(rent_b), len(roi_b))
+    return _dual_axis_chart(
+        "Projected Cash Flow, Rent, and ROI Over Time",
+        [("Cash Flow A ($)", cf_a[:n_a], (0, 0, 1), False),
+         ("Cash Flow B ($)", cf_b[:n_b], (0.53, 0.81, 0.92), False),
+         ("Rent A ($)", rent_a[:n_a], (1, 0.65, 0), True),
+         ("Rent B ($)", rent_b[:n_b], (0.85, 0.65, 0.13), True)],
+        [("ROI A (%)", roi_a[:n_a], _GREEN, False),
+         ("ROI B (%)", roi_b[:n_b], (0, 0.39, 0), True)],
+        "Cash Flow / Rent ($)", "ROI (%)", size,
+    )
+
+
+LAYOUTS = {
+    "projection": _projection_layout,
+    "comparison": _comparison_layout,
+}
+
+
+def chart_layout(kind, *series, size=CHART_SIZE, cache=None):
+    """The ChartLayout of chart `kind` for the given series, laid out on first use and cached after."""
+    cache = cache or default_chart_cache
+    series = tuple(_series(values) for values in series)
+    key = chart_fingerprint(kind, "layout", list(size), *series)
+    return cache.get_or_build(key, LAYOUTS[kind], tuple(size), *series)
+
+
+def layout_drawing(layout):
+    """`layout` as a ReportLab graphics Drawing (what chart_svg exports)."""
+    from reportlab.graphics.shapes import Drawing, Group, Path, String
+    from reportlab.lib.colors import Color
+
+    drawing = Drawing(layout.width, layout.height)
+    for style in layout.paths:
+        path = Path(strokeColor=Color(*style.color), strokeWidth=style.width, fillColor=None,
+                    strokeDashArray=list(style.dash) if style.dash else None)
+        for points in style.lines:
+            path.moveTo(*points[0])
+            for point in points[1:]:
+                path.lineTo(*point)
+        drawing.add(path)
+    for label in layout.labels:
+        text = String(0, 0, label.text, fontName=label.font, fontSize=label.size, fillColor=Color(*label.color))
+        if label.angle:
+            text = Group(text)
+            text.translate(label.x, label.y)
+            text.rotate(label.angle)
+        else:
+            text.x, text.y = label.x, label.y
+        drawing.add(text)
+    return drawing
+
+
+# The layout's PDF base fonts as browser font stacks (renderSVG would name them as is, and
+# browsers know no "Helvetica-Bold")
+_SVG_FONTS = {
+    "Helvetica": {"family": "Helvetica, Arial, sans-serif"},
+    "Helvetica-Bold": {"family": "Helvetica, Arial, sans-serif", "weight": "bold"},
+}
+
+
+def chart_svg(kind, *series, size=CHART_SIZE, cache=None):
+    """Chart `kind` as an SVG document (str) for the pages, exported from the same cached layout the reports draw."""
+    cache = cache or default_chart_cache
+    series = tuple(_series(values) for values in series)
+    key = chart_fingerprint(kind, "svg", list(size), *series)
+
+    def export():
+        from reportlab.graphics import renderSVG
+
+        layout = chart_layout(kind, *series, size=size, cache=cache)
+        svg = renderSVG.drawToString(layout_drawing(layout), fontHacks=_SVG_FONTS)
+        # From the <svg> element on: st.image takes an SVG string only without the XML prolog
+        return svg[svg.index("<svg"):]
+
+    return cache.get_or_build(key, export)
+
+
+def projection_chart(cash_flow, rents, roi):
+    """The multi-year projected cash flow & ROI chart for one property, as SVG."""
+    return chart_svg("projection", cash_flow, rents, roi)
+
+
+def comparison_chart(cf_a, cf_b, rent_a, rent_b, roi_a, roi_b):
+    """Cash flow, rent and ROI for properties A and B on one chart, as SVG."""
+    return chart_svg("comparison", cf_a, cf_b, rent_a, rent_b, roi_a, roi_b)
+
+
+def projection_layout(cash_flow, rents, roi):
+    """projection_chart's layout, for the PDF reports."""
+    return chart_layout("projection", cash_flow, rents, roi)
+
+
+def comparison_layout(cf_a, cf_b, rent_a, rent_b, roi_a, roi_b):
+    """comparison_chart's layout, for the PDF reports."""
+    return chart_layout("comparison", cf_a, cf_b, rent_a, rent_b, roi_a, roi_b)
@@ -0,0 +1,111 @@
+"""Import-time budget check for the modules loaded before and around the login page.
+
+    python check_import_time.py              # exits 1 if any module is over budget
+    python check_import_time.py --verbose    # also shows each module's slowest imports
+    python check_import_time.py --scale 2    # looser budgets for a slow machine
+
+Each module is imported in a fresh interpreter under `python -X importtime`, several times,
+and the median cumulative import time is compared with IMPORT_BUDGETS_MS, so one noisy run
+doesn't decide the result. Timing alone depends on the machine, so the check also fails
+when a module pulls in a library listed for it in FORBIDDEN_IMPORTS, e.g.
+ReportLab sneaking back into pdf_generator_single's module-level imports.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Cumulative import time budget per module, in milliseconds
+IMPORT_BUDGETS_MS = {
+    "warmup": 15,
+    "report_cache": 30,
+    "pdf_generator_single": 15,
+    "pdf_generator_dual": 15,
+    "mail_queue": 80,
+    "charts": 15,
+    "grading": 15,
+    "calculations": 200,
+    "metrics_cache": 220,
+}
+
+# Heavy libraries each module must not load at import time (NumPy is fine for the math modules)
+HEAVY = ("scipy", "numpy_financial", "pandas", "matplotlib", "plotly", "reportlab")
+FORBIDDEN_IMPORTS = {
+    "warmup": HEAVY + ("numpy",),
+    "report_cache": HEAVY + ("numpy",),
+    "pdf_generator_single": HEAVY + ("numpy",),
+    "pdf_generator_dual": HEAVY + ("numpy",),
+    "mail_queue": HEAVY + ("numpy",),
+    "charts": HEAVY + ("numpy",),
+    "grading": HEAVY + ("numpy",),
+    "calculations": HEAVY,
+    "metrics_cache": HEAVY,
+}
+
+
+def measure(module, cwd=None):
+    """(cumulative import time in ms, set of every module imported) for one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip(), len(name) - len(name.lstrip())))
+
+    # The module's own row comes after its whole import subtree (the more-indented rows above it);
+    # anything before that is interpreter startup
+    end = max(i for i, (_, name, _) in enumerate(rows) if name == module)
+    cumulative_us, _, depth = rows[end]
+    start = end
+    while start > 0 and rows[start - 1][2] > depth:
+        start -= 1
+    subtree = rows[start:end]
+    imported = {name for _, name, _ in subtree} | {module}
+    return cumulative_us / 1000, imported, sorted(((c, name) for c, name, _ in subtree), reverse=True)
+
+
+def check(modules=None, repeat=5, scale=1.0, verbose=False, cwd=None, log=sys.stdout):
+    """Measure every budgeted module; returns a list of failure messages (empty when all pass)."""
+    failures = []
+    for module in modules or IMPORT_BUDGETS_MS:
+        runs = sorted((measure(module, cwd) for _ in range(repeat)), key=lambda run: run[0])
+        median_ms, imported, rows = runs[len(runs) // 2]
+        imported = set().union(*(run[1] for run in runs))
+        budget = IMPORT_BUDGETS_MS.get(module, float("inf")) * scale
+        heavy = sorted({name.split(".")[0] for name in imported} & set(FORBIDDEN_IMPORTS.get(module, ())))
+        ok = median_ms <= budget and not heavy
+        print(f"{'ok  ' if ok else 'FAIL'} {module:24s} {median_ms:7.1f} ms  (budget {budget:.0f} ms)"
+              + (f"  imports {', '.join(heavy)}" if heavy else ""), file=log)
+        if verbose:
+            for cumulative_us, name in rows[:5]:
+                print(f"       {cumulative_us / 1000:7.1f} ms  {name}", file=log)
+        if median_ms > budget:
+            failures.append(f"{module}: {median_ms:.1f} ms > {budget:.0f} ms")
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy)} at module load")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when a module's cold import time exceeds its budget")
+    parser.add_argument("modules", nargs="*", help="modules to check (default: every budgeted module)")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh-interpreter runs per module; the median counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow CI machines)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    failures = check(args.modules, args.repeat, args.scale, args.verbose, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if failures:
+        print("\nimport-time budget exceeded:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Streaming top-k ranking of a listings feed.
+
+    python deal_ranker.py listings.csv --k 200 --group-by zip --out top_deals.csv \
+        --set interest_rate=6.5 --set loan_term=30
+
+The feed is read in chunks (batch_evaluate.read_chunks), each chunk is evaluated in one
+batch, and only the best k deals per (group, ranking key) are kept in bounded min-heaps,
+so memory is O(k x groups x keys) no matter how long the feed is. Each chunk is trimmed
+to its own top k per group with one vectorized sort before anything touches a heap.
+With --out, the current leaderboard is rewritten after every chunk.
+"""
+import argparse
+import heapq
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_evaluate import _parse_defaults, evaluate_chunk, read_chunks
+
+# Ranking key -> evaluated column (see batch_evaluate.OUTPUT_COLUMNS)
+RANK_KEYS = {
+    "irr": "irr",
+    "coc": "coc_return",
+    "cap_rate": "cap_rate",
+    "score": "score",
+}
+
+# Composite score: fixed weights so it can be computed per deal without seeing the whole feed
+SCORE_WEIGHTS = {"irr": 0.5, "coc_return": 0.3, "cap_rate": 0.2}
+
+# Metric columns carried along with each ranked deal
+RESULT_COLUMNS = ("cap_rate", "coc_return", "irr", "score", "verdict_grade")
+
+# The one group of every deal whose group_by value is missing (NaN or None, in any chunk)
+MISSING_GROUP = "(missing)"
+
+
+def composite_score(frame):
+    return sum(weight * frame[column].to_numpy(dtype=float) for column, weight in SCORE_WEIGHTS.items())
+
+
+class TopKRanker:
+    """Bounded heaps of the best `k` deals per (group, key).
+
+    push() takes an evaluated chunk (evaluate_chunk output). Groups come from the
+    `group_by` column (None ranks the whole feed as one group); deals missing it are
+    ranked together under MISSING_GROUP.
+    """
+
+    def __init__(self, k=100, keys=tuple(RANK_KEYS), group_by=None, keep_columns=None):
+        unknown = [key for key in keys if key not in RANK_KEYS]
+        if unknown:
+            raise ValueError(f"unknown ranking keys: {', '.join(unknown)}")
+        self.k = k
+        self.keys = tuple(keys)
+        self.group_by = group_by
+        self.keep_columns = keep_columns
+        self.columns = None  # fixed on the first push; records are tuples in this order
+        self.rows_seen = 0
+        self._heaps = {}
+        self._order = itertools.count()
+
+    def push(self, frame):
+        """Fold one evaluated chunk into the heaps; returns the number of heap changes."""
+        frame = frame.reset_index(drop=True)
+        if "score" not in frame.columns:
+            frame = frame.assign(score=composite_score(frame))
+        if self.group_by:
+            # Missing keys get one fixed label first: NaN never equals itself, so each chunk's
+            # NaN would otherwise start a group of its own
+            keys = frame[self.group_by]
+            if keys.isna().any():
+                keys = keys.astype(object).where(keys.notna(), MISSING_GROUP)
+            codes, groups = pd.factorize(keys)
+            groups = groups.tolist()
+        else:
+            codes, groups = np.zeros(len(frame), dtype=np.int64), [None]
+        if self.columns is None:
+            columns = list(self.keep_columns or [c for c in frame.columns if c not in RESULT_COLUMNS])
+            self.columns = list(dict.fromkeys(c for c in columns + list(RESULT_COLUMNS) if c in frame.columns))
+
+        changes = 0
+        for key in self.keys:
+            values = frame[RANK_KEYS[key]].to_numpy(dtype=float)
+            # Deals that can't beat the current k-th best of their group never leave NumPy
+            floor = np.full(len(groups), -np.inf)
+            for code, group in enumerate(groups):
+                heap = self._heaps.get((group, key))
+                if heap is not None and len(heap) >= self.k:
+                    floor[code] = heap[0][0]
+            valid = np.flatnonzero(np.isfinite(values) & (values >= floor[codes]))
+
+            # Sort by (group, value desc) and keep each group's first k rows of this chunk
+            order = valid[np.lexsort((-values[valid], codes[valid]))]
+            sorted_codes = codes[order]
+            starts = np.searchsorted(sorted_codes, sorted_codes, side="left")
+            candidates = order[np.arange(len(order)) - starts < self.k]
+            if not len(candidates):
+                continue
+
+            records = zip(*(frame[c].to_numpy()[candidates].tolist() for c in self.columns))
+            for row, value, record in zip(candidates.tolist(), values[candidates].tolist(), records):
+                heap = self._heaps.setdefault((groups[codes[row]], key), [])
+                # Ties keep the earlier deal: later arrivals get a smaller tiebreak
+                item = (value, -next(self._order), record)
+                if len(heap) < self.k:
+                    heapq.heappush(heap, item)
+                    changes += 1
+                elif item[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, item)
+                    changes += 1
+        self.rows_seen += len(frame)
+        return changes
+
+    def groups(self):
+        return sorted({group for group, _ in self._heaps}, key=str)
+
+    def top(self, key, group=None):
+        """Ranked records (best first) for one key and group."""
+        heap = self._heaps.get((group, key), [])
+        ranked = sorted(heap, key=lambda item: item[:2], reverse=True)
+        return [dict(zip(self.columns, record)) for _, _, record in ranked]
+
+    def to_frame(self):
+        """Every leaderboard as one long DataFrame: group, key, rank, then the deal's columns."""
+        rows = []
+        for (group, key) in sorted(self._heaps, key=lambda gk: (str(gk[0]), gk[1])):
+            for rank, record in enumerate(self.top(key, group), start=1):
+                rows.append({"group": group, "key": key, "rank": rank, **record})
+        return pd.DataFrame(rows)
+
+
+def rank_feed(path, k=100, keys=tuple(RANK_KEYS), group_by=None, chunksize=50000, input_format=None,
+              defaults=None):
+    """Yield the ranker after each chunk of `path`, so callers can publish partial leaderboards."""
+    ranker = TopKRanker(k, keys, group_by)
+    for chunk in read_chunks(path, chunksize, input_format):
+        if group_by and group_by not in chunk.columns:
+            raise ValueError(f"input has no {group_by!r} column to group by")
+        ranker.push(evaluate_chunk(chunk, defaults))
+        yield ranker
+
+
+def _write_snapshot(frame, path):
+    tmp_path = path + ".tmp"
+    frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep the top-k deals of a listings feed, per group")
+    parser.add_argument("input", help="listings file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--key", dest="keys", action="append", choices=list(RANK_KEYS),
+                        help="ranking key (repeatable; default: all)")
+    parser.add_argument("--group-by", help="column to rank within, e.g. zip or market")
+    parser.add_argument("--chunksize", type=int, default=50000)
+    parser.add_argument("--input-format", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument("--out", help="CSV leaderboard, rewritten after every chunk")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE",
+                        help="default for an input column missing from the feed (repeatable)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    ranker = None
+    for ranker in rank_feed(args.input, args.k, tuple(args.keys or RANK_KEYS), args.group_by, args.chunksize,
+                            args.input_format, _parse_defaults(args.set)):
+        elapsed = time.perf_counter() - started
+        print(f"{ranker.rows_seen} rows ranked, {len(ranker.groups())} groups, "
+              f"{ranker.rows_seen / elapsed:,.0f} rows/s", file=sys.stderr)
+        if args.out:
+            _write_snapshot(ranker.to_frame(), args.out)
+
+    if ranker is not None and not args.out:
+        ranker.to_frame().to_csv(sys.stdout, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Goal seek: solve one calculate_metrics input for a target metric value.
+
+    goal_seek(deal, "purchase_price", "irr (%)", 8.0)       # max price for an 8% IRR
+    goal_seek(listings_df, "monthly_rent", "Cash-on-Cash Return (%)", 10.0)
+
+Each target is rewritten as a residual that is zero when the target is hit and that is
+affine in purchase price and in rent (the mortgage payment is proportional to the loan,
+and the loan and down payment are proportional to the price). For those two inputs one
+secant step between two batch evaluations is the exact answer. Down payment and interest
+rate enter non-linearly and are solved with a vectorized Illinois (bracketed regula
+falsi) iteration. All rows of a batch are solved together.
+"""
+import numpy as np
+
+from amortization import annual_debt_service, remaining_balance
+from calculations import (
+    DEFAULT_SELLING_COST_PCT, METRIC_INPUTS, calculate_metrics_batch, mortgage_payment, project_cash_flows,
+)
+from irr_solver import npv_and_derivative
+
+SOLVABLE_INPUTS = ("purchase_price", "monthly_rent", "down_payment_pct", "interest_rate")
+TARGET_METRICS = ("Cap Rate (%)", "Cash-on-Cash Return (%)", "irr (%)", "Final Year ROI (%)")
+
+# Inputs the residuals are affine in (solved exactly with one secant step)
+_AFFINE_INPUTS = ("purchase_price", "monthly_rent")
+
+# Search brackets for the non-linear inputs
+DEFAULT_BOUNDS = {
+    "down_payment_pct": (0.01, 100.0),
+    "interest_rate": (0.0, 30.0),
+}
+
+
+def _columns(inputs, n_rows=None):
+    if hasattr(inputs, "columns") or isinstance(inputs, dict):
+        values = [np.atleast_1d(np.asarray(inputs[name], dtype=float)) for name in METRIC_INPUTS]
+    else:
+        raise TypeError("inputs must be a dict or DataFrame keyed by calculate_metrics argument names")
+    if n_rows is not None:
+        values.append(np.zeros(n_rows))
+    arrays = np.broadcast_arrays(*values)[:len(METRIC_INPUTS)]
+    return {name: np.array(a, dtype=float) for name, a in zip(METRIC_INPUTS, arrays)}
+
+
+def target_residual(columns, metric, target):
+    """Residual of `metric` against `target` per row; zero exactly when the target is met."""
+    price = columns["purchase_price"]
+    down = columns["down_payment_pct"] / 100
+    annual_expenses = columns["monthly_expenses"] * 12
+    annual_rent = columns["monthly_rent"] * (1 - columns["vacancy_rate"] / 100) * 12
+    monthly_mortgage = mortgage_payment(price * (1 - down), columns["interest_rate"], columns["loan_term"])
+    annual_mortgage = monthly_mortgage * 12
+
+    if metric == "Cap Rate (%)":
+        return (annual_rent - annual_expenses) - target / 100 * price
+    if metric == "Cash-on-Cash Return (%)":
+        return (annual_rent - annual_expenses - annual_mortgage) - target / 100 * price * down
+
+    horizon = columns["time_horizon"].astype(int)
+    debt_service = annual_debt_service(monthly_mortgage, columns["loan_term"], int(horizon.max()))
+    projection = project_cash_flows(columns["monthly_rent"], columns["vacancy_rate"], columns["rent_growth_rate"],
+                                    annual_expenses, debt_service, price, columns["appreciation_rate"],
+                                    price * down, horizon)
+    cash_flows = np.where(projection["in_horizon"], projection["cash_flows"], 0.0)
+
+    if metric == "Final Year ROI (%)":
+        final_return = projection["cumulative_return"][np.arange(len(horizon)), horizon - 1]
+        return final_return - target / 100 * price * down
+    if metric == "irr (%)":
+        # Exit at the horizon: appreciated price less selling costs and the loan payoff
+        sale_price = price * (1 + columns["appreciation_rate"] / 100) ** horizon
+        balance = remaining_balance(price * (1 - down), columns["interest_rate"], columns["loan_term"], horizon)
+        cash_flows[np.arange(len(horizon)), horizon - 1] += sale_price * (1 - DEFAULT_SELLING_COST_PCT / 100) - balance
+        rates = np.broadcast_to(target / 100, price.shape)
+        npv, _ = npv_and_derivative(np.column_stack([-price * down, cash_flows]), rates)
+        return npv
+    raise ValueError(f"can't goal-seek {metric!r}; choose one of {', '.join(TARGET_METRICS)}")
+
+
+def _residual_at(columns, solve_for, values, metric, target):
+    trial = dict(columns)
+    trial[solve_for] = values
+    return target_residual(trial, metric, target)
+
+
+def _illinois(columns, solve_for, metric, target, low, high, tol, maxiter):
+    f_low = _residual_at(columns, solve_for, low, metric, target)
+    f_high = _residual_at(columns, solve_for, high, metric, target)
+    bracketed = np.sign(f_low) * np.sign(f_high) <= 0
+    x = np.where(f_low == 0, low, high)
+    side = np.zeros_like(low)
+
+    for _ in range(maxiter):
+        x = np.where(bracketed, (low * f_high - high * f_low) / (f_high - f_low), np.nan)
+        x = np.where(np.isfinite(x), x, (low + high) / 2)
+        f_x = _residual_at(columns, solve_for, x, metric, target)
+
+        move_high = np.sign(f_x) == np.sign(f_high)
+        # Illinois step: halve the stale endpoint's residual when the same side moves twice
+        f_low = np.where(move_high & (side == 1), f_low / 2, f_low)
+        f_high = np.where(~move_high & (side == -1), f_high / 2, f_high)
+        high, f_high = np.where(move_high, x, high), np.where(move_high, f_x, f_high)
+        low, f_low = np.where(move_high, low, x), np.where(move_high, f_low, f_x)
+        side = np.where(move_high, 1, -1)
+
+        if np.all(~bracketed | (np.abs(high - low) < tol) | (f_x == 0)):
+            break
+    return x, bracketed
+
+
+def goal_seek(inputs, solve_for, metric, target, bounds=None, tol=1e-6, maxiter=100):
+    """Value of `solve_for` that makes `metric` equal `target`, for one deal or a batch.
+
+    `inputs` is a dict (scalars or arrays) or a DataFrame with the calculate_metrics
+    argument names; `target` is a scalar or one value per row. Returns a dict of arrays:
+    "value" (NaN where no solution exists within bounds), "converged", and "achieved",
+    the metric as calculate_metrics reports it at the solved value.
+    """
+    if solve_for not in SOLVABLE_INPUTS:
+        raise ValueError(f"can't solve for {solve_for!r}; choose one of {', '.join(SOLVABLE_INPUTS)}")
+    if metric == "Cap Rate (%)" and solve_for in ("down_payment_pct", "interest_rate"):
+        raise ValueError("cap rate doesn't depend on financing; solve for purchase_price or monthly_rent")
+
+    target = np.atleast_1d(np.asarray(target, dtype=float))
+    columns = _columns(inputs, n_rows=target.size if target.size > 1 else None)
+    target = np.broadcast_to(target, columns["purchase_price"].shape)
+
+    with np.errstate(all="ignore"):
+        if solve_for in _AFFINE_INPUTS:
+            x0 = columns[solve_for]
+            x1 = np.where(x0 != 0, x0 * 1.1, 1.0)
+            f0 = _residual_at(columns, solve_for, x0, metric, target)
+            f1 = _residual_at(columns, solve_for, x1, metric, target)
+            value = x0 - f0 * (x1 - x0) / (f1 - f0)
+            converged = np.isfinite(value) & (value > 0)
+        else:
+            low, high = (bounds or DEFAULT_BOUNDS[solve_for])
+            low = np.full(target.shape, float(low))
+            high = np.full(target.shape, float(high))
+            value, converged = _illinois(columns, solve_for, metric, target, low, high, tol, maxiter)
+            converged &= np.isfinite(value)
+
+    value = np.where(converged, value, np.nan)
+    solved = dict(columns)
+    solved[solve_for] = np.where(converged, value, columns[solve_for])
+    achieved = np.where(converged, np.asarray(calculate_metrics_batch(solved, irr_curve=False)[metric], dtype=float), np.nan)
+    return {"value": value, "converged": converged, "achieved": achieved}
+
+
+def max_purchase_price(inputs, metric, target):
+    """Highest price that still reaches `target` (metrics fall as price rises)."""
+    return goal_seek(inputs, "purchase_price", metric, target)
+
+
+def min_monthly_rent(inputs, metric, target):
+    """Lowest rent that reaches `target` (metrics rise with rent)."""
+    return goal_seek(inputs, "monthly_rent", metric, target)
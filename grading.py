@@ -0,0 +1,361 @@
+"""Rule-based deal grading from declarative rulesets.
+
+    python grading.py listings.csv --policy candidate.json                  # A/B against the current verdict
+    python grading.py results/ --policy candidate.json --baseline old.json  # regrade batch_evaluate output
+
+A ruleset is plain data (a dict, or a JSON file of the same shape): grades are tried in
+order and the first whose conditions all hold wins, otherwise the default applies.
+
+    {"name": "verdict",
+     "rules": [{"grade": "A", "summary": "...",
+                "when": [["final_year_roi", ">", 200], ["coc_return", ">=", 5]]},
+               ...],
+     "default": {"grade": "F", "summary": "..."}}
+
+Conditions compare the numeric metrics in METRICS directly. A ruleset grades one deal in
+plain Python (deal_verdict) or a whole batch as NumPy masks (grade / verdicts), so both
+paths share one set of thresholds and a policy change can be tried on a million deals in
+seconds. A NaN metric fails every condition but "!=", so such deals fall to the default;
+deal_metrics and batch_metrics read a missing or NaN metric as 0, as the report verdict
+always has.
+
+NumPy, pandas and the command-line parser are imported inside the functions that need
+them, so the PDF modules can import this one to grade a single deal without loading them.
+"""
+import json
+import math
+import operator
+import os
+import sys
+import time
+
+# Metrics a condition can test: name -> key in calculate_metrics / calculate_metrics_batch
+# (also the column names batch_evaluate writes, so its output can be regraded as is)
+METRICS = {
+    "cap_rate": "Cap Rate (%)",
+    "coc_return": "Cash-on-Cash Return (%)",
+    "final_year_roi": "Final Year ROI (%)",
+    "first_year_cash_flow": "First Year Cash Flow ($)",
+    "monthly_mortgage": "Monthly Mortgage ($)",
+    "irr": "irr (%)",
+    "equity_multiple": "equity_multiple",
+    "net_sale_proceeds": "Net Sale Proceeds ($)",
+    "total_cash_flow": "Multi-Year Cash Flow",  # summed over the horizon
+}
+
+OPERATORS = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+    "==": operator.eq, "!=": operator.ne,
+}
+
+
+# --- Built-in policies ---
+
+# The A–F verdict shown on the pages and in the PDF reports
+VERDICT_POLICY = {
+    "name": "verdict",
+    "rules": [
+        {"grade": "A", "summary": "This is an A-grade investment with high returns and strong cash flow.",
+         "when": [["final_year_roi", ">", 200], ["total_cash_flow", ">", 20000], ["coc_return", ">=", 5]]},
+        {"grade": "B", "summary": "This is a B-grade investment with solid performance and good ROI.",
+         "when": [["final_year_roi", ">", 100], ["total_cash_flow", ">", 10000], ["coc_return", ">=", 0]]},
+        {"grade": "C", "summary": "This is a C-grade investment with modest returns.",
+         "when": [["final_year_roi", ">", 50], ["total_cash_flow", ">", 5000], ["coc_return", ">=", -5]]},
+        {"grade": "D", "summary": "This is a D-grade investment with marginal upside potential.",
+         "when": [["final_year_roi", ">", 0], ["total_cash_flow", ">", 0], ["coc_return", ">=", 6]]},
+    ],
+    "default": {"grade": "F", "summary": "This is an F-grade rental with upside potential."},
+}
+
+# The cash-on-cash grade calculate_metrics returns as "Grade"
+COC_POLICY = {
+    "name": "coc",
+    "rules": [
+        {"grade": "A", "when": [["coc_return", ">=", 15]]},
+        {"grade": "B", "when": [["coc_return", ">=", 12]]},
+        {"grade": "C", "when": [["coc_return", ">=", 9]]},
+        {"grade": "D", "when": [["coc_return", ">=", 6]]},
+    ],
+    "default": {"grade": "F"},
+}
+
+
+# --- Rulesets ---
+
+class Ruleset:
+    """A compiled grading policy: ordered rules, first match wins, else the default grade."""
+
+    def __init__(self, name, rules, default):
+        self.name = name
+        self.rules = [(rule["grade"], rule.get("summary", ""), _conditions(name, rule)) for rule in rules]
+        self.default = (default["grade"], default.get("summary", ""))
+        outcomes = [(grade, summary) for grade, summary, _ in self.rules] + [self.default]
+        # Distinct grades in policy order; several rules may award the same grade
+        self.labels = tuple(dict.fromkeys(grade for grade, _ in outcomes))
+        self._outcome_labels = [self.labels.index(grade) for grade, _ in outcomes]
+        self._outcome_summaries = [summary for _, summary in outcomes]
+        self.metrics = tuple(sorted({metric for _, _, conditions in self.rules for metric, _, _ in conditions}))
+
+    def __repr__(self):
+        return f"Ruleset({self.name!r}, grades={'/'.join(self.labels)})"
+
+    def _values(self, values):
+        missing = [metric for metric in self.metrics if metric not in values]
+        if missing:
+            raise ValueError(f"ruleset {self.name!r} needs metric(s) {', '.join(missing)}")
+        return values
+
+    def deal_verdict(self, values):
+        """(summary, grade) for one deal's metric values (plain floats)."""
+        values = self._values(values)
+        for grade, summary, conditions in self.rules:
+            if all(compare(values[metric], threshold) for metric, compare, threshold in conditions):
+                return summary, grade
+        return self.default[1], self.default[0]
+
+    def outcome_index(self, values):
+        """Index of the winning rule per deal (len(rules) for the default), as an int array."""
+        import numpy as np
+
+        values = self._values(values)
+        columns = {metric: np.asarray(values[metric], dtype=float) for metric in self.metrics}
+        matches = [np.logical_and.reduce([compare(columns[metric], threshold)
+                                          for metric, compare, threshold in conditions])
+                   for _, _, conditions in self.rules]
+        return np.select(matches, np.arange(len(self.rules)), default=len(self.rules))
+
+    def grade_codes(self, values):
+        """Index into self.labels of each deal's grade."""
+        import numpy as np
+
+        return np.asarray(self._outcome_labels, dtype=np.intp)[self.outcome_index(values)]
+
+    def grade(self, values):
+        """Grade of every deal, as an object array (values: metric name -> array)."""
+        import numpy as np
+
+        return np.asarray(self.labels, dtype=object)[self.grade_codes(values)]
+
+    def verdicts(self, values):
+        """(summaries, grades) object arrays for a batch of deals."""
+        import numpy as np
+
+        outcome = self.outcome_index(values)
+        summaries = np.asarray(self._outcome_summaries, dtype=object)[outcome]
+        grades = np.asarray(self.labels, dtype=object)[np.asarray(self._outcome_labels, dtype=np.intp)[outcome]]
+        return summaries, grades
+
+
+def _conditions(name, rule):
+    if "grade" not in rule:
+        raise ValueError(f"ruleset {name!r}: every rule needs a grade")
+    if not rule.get("when"):
+        raise ValueError(f"ruleset {name!r}, grade {rule['grade']}: a rule needs at least one condition")
+    conditions = []
+    for condition in rule["when"]:
+        try:
+            metric, op, threshold = condition
+        except (TypeError, ValueError):
+            raise ValueError(f"ruleset {name!r}, grade {rule['grade']}: conditions are [metric, operator, value], "
+                             f"got {condition!r}") from None
+        if metric not in METRICS:
+            raise ValueError(f"ruleset {name!r}: unknown metric {metric!r} (expected one of {', '.join(METRICS)})")
+        if op not in OPERATORS:
+            raise ValueError(f"ruleset {name!r}: unknown operator {op!r} (expected one of {' '.join(OPERATORS)})")
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+            raise ValueError(f"ruleset {name!r}: threshold for {metric} must be a number, got {threshold!r}")
+        conditions.append((metric, OPERATORS[op], float(threshold)))
+    return conditions
+
+
+def load_ruleset(source):
+    """A Ruleset from a policy dict, a Ruleset (returned as is), or the path of a JSON policy file."""
+    if isinstance(source, Ruleset):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8") as f:
+            policy = json.load(f)
+        policy.setdefault("name", os.path.splitext(os.path.basename(source))[0])
+    else:
+        policy = source
+    if not policy.get("rules") or "default" not in policy:
+        raise ValueError(f"ruleset {policy.get('name')!r} needs at least one rule and a default grade")
+    return Ruleset(policy.get("name", "policy"), policy["rules"], policy["default"])
+
+
+VERDICT_RULES = load_ruleset(VERDICT_POLICY)
+COC_RULES = load_ruleset(COC_POLICY)
+
+
+# --- Metric values ---
+
+def _number(value):
+    """A metric value as a float, like the reports always parsed it: "1,234" counts, anything else is 0."""
+    try:
+        number = float(str(value).replace(",", "").strip())
+    except ValueError:
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+
+def deal_metrics(metrics):
+    """Rule inputs for one deal from a calculate_metrics-style display dict (missing or NaN ones are 0)."""
+    values = {}
+    for name, key in METRICS.items():
+        value = metrics.get(key)
+        if name == "total_cash_flow":
+            if isinstance(value, str):
+                value = value.split(",")
+            try:
+                values[name] = sum(_number(x) for x in value)
+            except TypeError:  # missing, or not a list
+                values[name] = 0.0
+        else:
+            values[name] = _number(value)
+    # Dicts that carry a plain "ROI (%)" (older callers) fall back to it when the final-year ROI is 0
+    if values["final_year_roi"] == 0:
+        values["final_year_roi"] = _number(metrics.get("ROI (%)"))
+    return values
+
+
+def batch_metrics(batch):
+    """Rule inputs for every deal of a calculate_metrics_batch result (or any subset of its keys); NaN is 0."""
+    import numpy as np
+
+    values = {}
+    for name, key in METRICS.items():
+        if key in batch and name != "total_cash_flow":
+            column = np.asarray(batch[key], dtype=float)
+            values[name] = np.where(np.isnan(column), 0.0, column)
+    if "Multi-Year Cash Flow" in batch:
+        values["total_cash_flow"] = np.nansum(np.atleast_2d(batch["Multi-Year Cash Flow"]), axis=1)
+    if "ROI (%)" in batch:  # same fallback as deal_metrics
+        final_roi = values.get("final_year_roi", 0.0)
+        roi = np.asarray(batch["ROI (%)"], dtype=float)
+        values["final_year_roi"] = np.where(final_roi == 0, np.where(np.isnan(roi), 0.0, roi), final_roi)
+    return values
+
+
+# --- A/B comparison ---
+
+def grade_transitions(baseline, candidate, values):
+    """(len(baseline.labels), len(candidate.labels)) matrix counting deals per pair of grades."""
+    import numpy as np
+
+    before, after = baseline.grade_codes(values), candidate.grade_codes(values)
+    shape = (len(baseline.labels), len(candidate.labels))
+    return np.bincount(before * shape[1] + after, minlength=shape[0] * shape[1]).reshape(shape)
+
+
+def format_transitions(baseline, candidate, counts):
+    """A plain-text report of a grade_transitions matrix: grade mix under each policy, then moves."""
+    total = int(counts.sum())
+    lines = [f"{total:,} deals: {baseline.name} (rows) vs {candidate.name} (columns)"]
+    width = max(8, len(f"{total:,}") + 1)
+    lines.append(" " * 6 + "".join(f"{label:>{width}}" for label in candidate.labels) + f"{'total':>{width}}")
+    for label, row in zip(baseline.labels, counts):
+        lines.append(f"{label:<6}" + "".join(f"{int(n):>{width},}" for n in row) + f"{int(row.sum()):>{width},}")
+    lines.append(f"{'total':<6}" + "".join(f"{int(n):>{width},}" for n in counts.sum(axis=0)) + f"{total:>{width},}")
+
+    same = sum(int(counts[i, candidate.labels.index(label)])
+               for i, label in enumerate(baseline.labels) if label in candidate.labels)
+    changed = total - same
+    lines.append(f"{changed:,} deals ({changed / max(total, 1):.1%}) change grade")
+    return "\n".join(lines)
+
+
+def _input_files(path):
+    """A listings file, or every part file of a batch_evaluate output directory."""
+    if not os.path.isdir(path):
+        return [path]
+    parts = sorted(name for name in os.listdir(path) if name.startswith("part-") and not name.endswith(".tmp"))
+    if not parts:
+        raise SystemExit(f"{path} has no part files")
+    return [os.path.join(path, name) for name in parts]
+
+
+def _chunk_values(chunk, metrics, defaults):
+    """Rule inputs for one chunk: read straight from metric columns when present, else computed.
+
+    Either way they go through batch_metrics, so a regrade reads NaN metrics as 0 exactly as
+    batch_evaluate did when it graded them.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if all(metric in chunk.columns for metric in metrics):
+        if "verdict_grade" in chunk.columns:  # batch_evaluate output: leave out the rows it couldn't evaluate
+            chunk = chunk[chunk["verdict_grade"].notna()]
+        if chunk.empty:
+            return None
+        batch = {METRICS[metric]: pd.to_numeric(chunk[metric], errors="coerce").to_numpy(dtype=float)
+                 for metric in metrics}
+        if "total_cash_flow" in metrics:
+            # Already summed over the horizon: one year's worth, as far as batch_metrics can tell
+            batch["Multi-Year Cash Flow"] = batch["Multi-Year Cash Flow"][:, None]
+        return batch_metrics(batch)
+
+    from calculations import METRIC_INPUTS, calculate_metrics_batch, evaluable
+
+    columns = {}
+    for name in METRIC_INPUTS:
+        if name in chunk.columns:
+            columns[name] = pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=float)
+        elif defaults and name in defaults:
+            columns[name] = np.full(len(chunk), defaults[name], dtype=float)
+        else:
+            raise ValueError(f"input has neither the metric columns nor a {name!r} column "
+                             f"(pass --set {name}=VALUE for a default)")
+    valid = evaluable(columns)
+    if not valid.any():
+        return None
+    return batch_metrics(calculate_metrics_batch({name: v[valid] for name, v in columns.items()}, irr_curve=False))
+
+
+def run(input_path, candidate, baseline=VERDICT_RULES, chunksize=200000, input_format=None, defaults=None,
+        log=sys.stderr):
+    """Grade every deal under both policies; returns the grade_transitions matrix."""
+    import numpy as np
+
+    from batch_evaluate import read_chunks
+
+    baseline, candidate = load_ruleset(baseline), load_ruleset(candidate)
+    metrics = sorted(set(baseline.metrics) | set(candidate.metrics))
+    counts = np.zeros((len(baseline.labels), len(candidate.labels)), dtype=np.int64)
+    started = time.perf_counter()
+    for path in _input_files(input_path):
+        for chunk in read_chunks(path, chunksize, input_format):
+            values = _chunk_values(chunk, metrics, defaults)
+            if values is not None:
+                counts += grade_transitions(baseline, candidate, values)
+            elapsed = time.perf_counter() - started
+            print(f"{int(counts.sum()):,} deals graded, {counts.sum() / elapsed:,.0f}/s", file=log)
+    return counts
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare two grading policies over a listings feed")
+    parser.add_argument("input", help="listings file (.csv, .jsonl or .parquet) or a batch_evaluate output directory")
+    parser.add_argument("--policy", required=True, help="candidate ruleset (JSON file)")
+    parser.add_argument("--baseline", help="ruleset to compare against (JSON file; default: the current verdict)")
+    parser.add_argument("--chunksize", type=int, default=200000)
+    parser.add_argument("--input-format", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE",
+                        help="default for an input column missing from the feed (repeatable)")
+    args = parser.parse_args(argv)
+
+    from batch_evaluate import _parse_defaults
+
+    try:
+        candidate = load_ruleset(args.policy)
+        baseline = load_ruleset(args.baseline) if args.baseline else VERDICT_RULES
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"can't load ruleset: {e}")
+    counts = run(args.input, candidate, baseline, args.chunksize, args.input_format, _parse_defaults(args.set))
+    print(format_transitions(baseline, candidate, counts))
+
+
+if __name__ == "__main__":
+    main()
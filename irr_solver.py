@@ -0,0 +1,116 @@
+import numpy as np
+
+# Search interval for the bracketing fallback: -99% .. +1000% per period
+DEFAULT_BRACKET = (-0.99, 10.0)
+
+
+def npv_and_derivative(cash_flows, rate):
+    """NPV of every row of `cash_flows` at the matching `rate`, plus dNPV/drate.
+
+    Evaluated with Horner's rule in x = 1 / (1 + rate), so each call is one pass over
+    the periods with no powers: NPV = cf0 + x*(cf1 + x*(cf2 + ...)).
+    """
+    x = 1 / (1 + rate)
+    npv = cash_flows[:, -1].copy()
+    d_npv_dx = np.zeros_like(npv)
+    for period in range(cash_flows.shape[1] - 2, -1, -1):
+        d_npv_dx = d_npv_dx * x + npv
+        npv = npv * x + cash_flows[:, period]
+    return npv, -d_npv_dx * x * x
+
+
+def _newton(cash_flows, rate, tol, maxiter):
+    converged = np.zeros(rate.shape[0], dtype=bool)
+    active = np.arange(rate.shape[0])
+    for _ in range(maxiter):
+        npv, d_npv = npv_and_derivative(cash_flows[active], rate[active])
+        step = npv / d_npv
+        rate[active] -= np.where(np.isfinite(step), step, 0.0)
+        done = np.abs(step) < tol
+        converged[active[done]] = True
+        # Rows that diverge or leave the valid domain are dropped and left to bisection
+        active = active[~done & np.isfinite(step) & (rate[active] > -1)]
+        if active.size == 0:
+            break
+    return rate, converged & (rate > -1)
+
+
+def _find_brackets(cash_flows, guess, bracket, n_grid=64):
+    """For each row, the sign-changing grid interval closest to `guess` (NaN where none exists)."""
+    low, high = bracket
+    # Grid is dense near zero, where real-estate IRRs live, and sparse towards the upper bound
+    grid = np.unique(np.concatenate([
+        np.linspace(low, 0.5, n_grid),
+        np.geomspace(0.5, high, n_grid // 4),
+    ]))
+    values = np.column_stack([npv_and_derivative(cash_flows, np.full(cash_flows.shape[0], r))[0] for r in grid])
+
+    sign_change = np.sign(values[:, :-1]) * np.sign(values[:, 1:]) <= 0
+    distance = np.where(sign_change, np.abs(grid[:-1] - guess), np.inf)
+    best = distance.argmin(axis=1)
+    found = np.isfinite(distance[np.arange(len(best)), best])
+    return np.where(found, grid[best], np.nan), np.where(found, grid[best + 1], np.nan)
+
+
+def _bisect(cash_flows, low, high, tol, maxiter):
+    npv_low, _ = npv_and_derivative(cash_flows, low)
+    for _ in range(maxiter):
+        mid = (low + high) / 2
+        npv_mid, _ = npv_and_derivative(cash_flows, mid)
+        same_side = np.sign(npv_mid) == np.sign(npv_low)
+        low = np.where(same_side, mid, low)
+        npv_low = np.where(same_side, npv_mid, npv_low)
+        high = np.where(same_side, high, mid)
+        if np.nanmax(high - low, initial=0.0) < tol:
+            break
+    return (low + high) / 2
+
+
+def solve_irr(cash_flows, guess=0.1, tol=1e-10, maxiter=50, bracket=DEFAULT_BRACKET):
+    """Solve the IRR of many cash-flow vectors at once.
+
+    `cash_flows` is a 2-D array with one deal per row and one period per column
+    (shorter vectors can be right-padded with zeros). Returns `(rates, converged)`:
+    per-row rates as fractions (0.07 == 7%) and a boolean mask. Rows with no IRR
+    inside `bracket` come back as NaN with `converged` False rather than a made-up 0.
+
+    Newton runs on every row first; rows that fail to converge (or wander outside
+    `bracket`) fall back to bisection inside a sign-changing interval.
+    """
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    n_rows = cash_flows.shape[0]
+    if cash_flows.shape[1] < 2:
+        return np.full(n_rows, np.nan), np.zeros(n_rows, dtype=bool)
+
+    # An IRR needs at least one inflow and one outflow
+    has_root = (cash_flows > 0).any(axis=1) & (cash_flows < 0).any(axis=1)
+    rate = np.full(n_rows, np.nan)
+    converged = np.zeros(n_rows, dtype=bool)
+
+    with np.errstate(all="ignore"):
+        rate[has_root], converged[has_root] = _newton(
+            cash_flows[has_root], np.full(int(has_root.sum()), float(guess)), tol, maxiter)
+        converged &= (rate >= bracket[0]) & (rate <= bracket[1])
+
+        retry = ~converged & has_root
+        if retry.any():
+            rows = cash_flows[retry]
+            low, high = _find_brackets(rows, guess, bracket)
+            found = np.isfinite(low)
+            if found.any():
+                root = _bisect(rows[found], low[found], high[found], tol, maxiter=200)
+                retry_rate = np.full(rows.shape[0], np.nan)
+                retry_rate[found] = root
+                rate[retry] = retry_rate
+                converged[retry] = found
+            else:
+                rate[retry] = np.nan
+
+    rate = np.where(converged, rate, np.nan)
+    return rate, converged
+
+
+def irr_percent(cash_flows, guess=0.1):
+    """`solve_irr` in percent rounded to 2 decimals, the way the metrics report IRR."""
+    rates, converged = solve_irr(cash_flows, guess=guess)
+    return np.round(rates * 100, 2), converged
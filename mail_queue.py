@@ -0,0 +1,567 @@
+"""Outbound email: a persistent queue, a background sender and a local SMTP sink.
+
+    queue = start_mail_worker()          # once per process (the pages wrap it in st.cache_resource)
+    job_id = queue.enqueue("you@example.com", "Your report", "See attached.", attachment=pdf_bytes)
+    queue.status(job_id)                 # {"status": "queued" | "sending" | "sent" | "failed", ...}
+
+Messages are written to SQLite (MAIL_QUEUE_DB, default mail_queue.db) before anything is
+sent, so a page returns as soon as the row is stored and queued mail survives restarts.
+MailWorker threads each borrow an authenticated connection from an SMTPPool and send a
+whole batch over it, so the STARTTLS + login handshake happens once per connection rather
+than once per message. Temporary failures (4xx replies, dropped connections) are retried
+with exponential backoff; permanent 5xx rejections fail the job straight away.
+
+SMTP settings come from the environment: MAIL_HOST (smtp.gmail.com), MAIL_PORT (587),
+MAIL_STARTTLS (1), EMAIL_USER / EMAIL_PASSWORD, MAIL_FROM (EMAIL_USER), MAIL_POOL_SIZE (2).
+Set MAIL_WORKER=0 to only enqueue, when a standalone worker does the sending.
+
+    python mail_queue.py sink --port 1025 --maildir outbox/    # local stand-in SMTP server
+    MAIL_HOST=127.0.0.1 MAIL_PORT=1025 MAIL_STARTTLS=0 streamlit run main.py
+    python mail_queue.py worker                                 # standalone sender
+    python mail_queue.py status
+"""
+import argparse
+import base64
+import os
+import random
+import smtplib
+import socketserver
+import sqlite3
+import ssl
+import sys
+import threading
+import time
+import traceback
+from email.message import EmailMessage
+
+DEFAULT_PATH = os.getenv("MAIL_QUEUE_DB", "mail_queue.db")
+
+# A job still "sending" this long after it was claimed (or its claim was last renewed)
+# belongs to a worker that died; workers renew the claims of a batch as they work through it
+CLAIM_LEASE_SECONDS = 300
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS mail_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    subject TEXT,
+    message BLOB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    sent_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+)""",
+    "CREATE INDEX IF NOT EXISTS idx_mail_jobs_due ON mail_jobs (status, next_attempt_at)",
+)
+
+_STATUS_COLUMNS = ("job_id", "status", "recipient", "subject", "attempts", "last_error", "created_at", "sent_at")
+
+
+def default_sender():
+    return os.getenv("MAIL_FROM") or os.getenv("EMAIL_USER") or "reports@localhost"
+
+
+def normalize_address(address):
+    """`address` with an IDNA-encoded domain; ValueError if it isn't one smtplib can send to.
+
+    smtplib only speaks ASCII without SMTPUTF8, so a non-ASCII domain is IDNA-encoded and a
+    non-ASCII mailbox name (josé@example.com) is rejected.
+    """
+    local, at, domain = address.strip().rpartition("@")
+    if not at or not local or not domain or any(c.isspace() or c in "<>," for c in local + domain):
+        raise ValueError(f"not an email address: {address!r}")
+    if not local.isascii():
+        raise ValueError(f"non-ASCII mailbox names aren't supported: {address!r}")
+    try:
+        domain = domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        raise ValueError(f"invalid domain in email address: {address!r}") from None
+    return f"{local}@{domain}"
+
+
+def build_message(sender, recipient, subject, body, attachment=None, filename="report.pdf"):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = recipient
+    msg.set_content(body)
+    if attachment is not None:
+        msg.add_attachment(attachment, maintype="application", subtype="pdf", filename=filename)
+    return msg
+
+
+# --- Queue ---
+
+class MailQueue:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self.conn.execute(statement)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def close(self):
+        self.conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def enqueue(self, recipient, subject, body, attachment=None, filename="report.pdf", sender=None):
+        """Store one message for delivery and return its job id (no network I/O).
+
+        Raises ValueError for an address the worker couldn't send to (see normalize_address).
+        """
+        recipient = normalize_address(recipient)
+        sender = normalize_address(sender or default_sender())
+        msg = build_message(sender, recipient, subject, body, attachment, filename)
+        now = time.time()
+        rows = self._execute(
+            "INSERT INTO mail_jobs (status, sender, recipient, subject, message, next_attempt_at, created_at) "
+            "VALUES ('queued', ?, ?, ?, ?, ?, ?) RETURNING job_id",
+            (sender, recipient, subject, msg.as_bytes(), now, now),
+        )
+        self._wakeup.set()
+        return rows[0][0]
+
+    def status(self, job_id):
+        rows = self._execute(f"SELECT {', '.join(_STATUS_COLUMNS)} FROM mail_jobs WHERE job_id = ?", (job_id,))
+        return dict(zip(_STATUS_COLUMNS, rows[0])) if rows else None
+
+    def counts(self):
+        return dict(self._execute("SELECT status, COUNT(*) FROM mail_jobs GROUP BY status"))
+
+    def claim(self, limit):
+        """Mark up to `limit` due jobs as sending; returns [(job_id, sender, recipient, message, attempts)]."""
+        now = time.time()
+        return self._execute(
+            "UPDATE mail_jobs SET status = 'sending', claimed_at = ?, attempts = attempts + 1 "
+            "WHERE job_id IN (SELECT job_id FROM mail_jobs "
+            "WHERE (status = 'queued' AND next_attempt_at <= ?) OR (status = 'sending' AND claimed_at <= ?) "
+            "ORDER BY next_attempt_at LIMIT ?) "
+            "RETURNING job_id, sender, recipient, message, attempts",
+            (now, now, now - CLAIM_LEASE_SECONDS, limit),
+        )
+
+    def renew(self, job_ids):
+        """Push back the lease on jobs this worker is still sending."""
+        job_ids = list(job_ids)
+        self._execute(f"UPDATE mail_jobs SET claimed_at = ? WHERE status = 'sending' "
+                      f"AND job_id IN ({', '.join('?' * len(job_ids))})", (time.time(), *job_ids))
+
+    def mark_sent(self, job_id):
+        # The message (attachment included) isn't needed once delivered; an empty blob frees its
+        # pages for reuse (the column is NOT NULL in existing databases)
+        self._execute("UPDATE mail_jobs SET status = 'sent', sent_at = ?, last_error = NULL, message = X'' "
+                      "WHERE job_id = ?", (time.time(), job_id))
+
+    def retry_later(self, job_id, error, delay):
+        self._execute("UPDATE mail_jobs SET status = 'queued', next_attempt_at = ?, last_error = ? WHERE job_id = ?",
+                      (time.time() + delay, error, job_id))
+
+    def mark_failed(self, job_id, error):
+        self._execute("UPDATE mail_jobs SET status = 'failed', last_error = ? WHERE job_id = ?", (error, job_id))
+
+    def wait(self, timeout):
+        """Sleep until something is enqueued in this process or `timeout` passes."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+
+# --- SMTP connection pool ---
+
+class SMTPPool:
+    """Up to `size` logged-in SMTP connections, reused across messages.
+
+    Connections idle for longer than `max_idle` seconds are checked with NOOP before
+    reuse (servers drop quiet sessions) and closed by prune().
+    """
+
+    def __init__(self, host, port, user=None, password=None, starttls=True, size=2, timeout=30, max_idle=60):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.connects = 0
+        self._idle = []  # [(connection, last used)]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.getenv("MAIL_HOST", "smtp.gmail.com"),
+            port=int(os.getenv("MAIL_PORT", "587")),
+            user=os.getenv("EMAIL_USER"),
+            password=os.getenv("EMAIL_PASSWORD"),
+            starttls=os.getenv("MAIL_STARTTLS", "1") != "0",
+            size=int(os.getenv("MAIL_POOL_SIZE", "2")),
+        )
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                conn.starttls(context=ssl.create_default_context())
+            if self.user:
+                conn.login(self.user, self.password or "")
+        except BaseException:
+            _quit(conn)
+            raise
+        self.connects += 1
+        return conn
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    conn, last_used = self._idle.pop() if self._idle else (None, None)
+                if conn is None:
+                    return self._connect()
+                if time.monotonic() - last_used < self.max_idle or _alive(conn):
+                    return conn
+                _quit(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    def discard(self, conn):
+        _quit(conn)
+        self._slots.release()
+
+    def prune(self):
+        """Close connections that have been idle longer than max_idle."""
+        cutoff = time.monotonic() - self.max_idle
+        with self._lock:
+            stale = [conn for conn, last_used in self._idle if last_used < cutoff]
+            self._idle = [(conn, last_used) for conn, last_used in self._idle if last_used >= cutoff]
+        for conn in stale:
+            _quit(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _quit(conn)
+
+
+def _alive(conn):
+    try:
+        return conn.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _reset(conn):
+    try:
+        return conn.rset()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _quit(conn):
+    try:
+        conn.quit()
+    except (smtplib.SMTPException, OSError):
+        conn.close()
+
+
+# --- Worker ---
+
+class MailWorker:
+    """Background threads that drain a MailQueue through an SMTPPool, one batch per connection."""
+
+    def __init__(self, queue, pool, threads=None, batch_size=20, max_attempts=5, backoff=30.0, max_backoff=3600.0,
+                 poll_interval=2.0):
+        self.queue = queue
+        self.pool = pool
+        self.threads = threads or pool.size
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"mail-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self.queue._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.pool.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.run_once()
+            except sqlite3.Error as e:
+                print(f"mail worker: queue error: {e}", file=sys.stderr)
+                sent = 0
+            except Exception:
+                # A bug must not stop delivery for good: log it and keep polling
+                print("mail worker: unexpected error", file=sys.stderr)
+                traceback.print_exc()
+                sent = 0
+            if not sent:
+                self.pool.prune()
+                self.queue.wait(self.poll_interval)
+
+    def run_once(self):
+        """Claim and send one batch; returns the number of jobs handled."""
+        jobs = self.queue.claim(self.batch_size)
+        if jobs:
+            self._send_batch(jobs)
+        return len(jobs)
+
+    def _retry(self, job_id, attempts, error):
+        if attempts >= self.max_attempts:
+            self.queue.mark_failed(job_id, error)
+        else:
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            self.queue.retry_later(job_id, error, delay)
+
+    def _send_batch(self, jobs):
+        renewed = time.monotonic()
+        try:
+            conn = self.pool.acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            # Can't reach or log in to the server: the whole batch waits
+            for job_id, _, _, _, attempts in jobs:
+                self._retry(job_id, attempts, f"connect: {e}")
+            return
+
+        try:
+            for index, (job_id, sender, recipient, message, attempts) in enumerate(jobs):
+                # A slow server can stretch a batch past the lease; keep the jobs still waiting claimed
+                if time.monotonic() - renewed > CLAIM_LEASE_SECONDS / 4:
+                    self.queue.renew(job[0] for job in jobs[index:])
+                    renewed = time.monotonic()
+                try:
+                    conn.sendmail(sender, [recipient], message)
+                except smtplib.SMTPRecipientsRefused as e:
+                    code, reason = e.recipients.get(recipient, (550, b"refused"))
+                    self._reject(job_id, attempts, code, reason)
+                except smtplib.SMTPResponseException as e:
+                    self._reject(job_id, attempts, e.smtp_code, e.smtp_error)
+                except (smtplib.SMTPException, OSError) as e:
+                    # Connection is gone: retry this job, hand the rest back for the next pass
+                    self.pool.discard(conn)
+                    conn = None
+                    for later_id, _, _, _, later_attempts in jobs[index:]:
+                        self._retry(later_id, later_attempts, f"connection lost: {e}")
+                    return
+                except ValueError as e:
+                    # The message itself can't be sent (e.g. UnicodeEncodeError for a non-ASCII address
+                    # queued before enqueue checked them); no retry will help. smtplib may have left
+                    # the transaction open, so reset it before the next message.
+                    self.queue.mark_failed(job_id, f"can't send: {e}")
+                    if not _reset(conn):
+                        self.pool.discard(conn)
+                        conn = None
+                        for later_id, _, _, _, later_attempts in jobs[index + 1:]:
+                            self._retry(later_id, later_attempts, "connection lost after a failed message")
+                        return
+                else:
+                    self.queue.mark_sent(job_id)
+        except BaseException:
+            # Unknown connection state: don't return it to the pool, but free its slot
+            if conn is not None:
+                self.pool.discard(conn)
+            raise
+        self.pool.release(conn)
+
+    def _reject(self, job_id, attempts, code, reason):
+        error = f"{code} {reason.decode(errors='replace') if isinstance(reason, bytes) else reason}"
+        if code >= 500:
+            self.queue.mark_failed(job_id, error)
+        else:
+            self._retry(job_id, attempts, error)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_mail_worker(path=None, **worker_options):
+    """The process-wide MailQueue, with its background worker running (unless MAIL_WORKER=0)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            queue = MailQueue(path or DEFAULT_PATH)
+            _worker = MailWorker(queue, SMTPPool.from_env(), **worker_options)
+            if os.getenv("MAIL_WORKER", "1") != "0":
+                _worker.start()
+    return _worker.queue
+
+
+# --- Local SMTP sink (development and tests) ---
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, code, text):
+        self.wfile.write(f"{code} {text}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.record_connection()
+        self.reply(220, "localhost mail sink ready")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", "replace").rstrip("\r\n").partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.wfile.write(b"250-localhost\r\n250-8BITMIME\r\n250 AUTH PLAIN\r\n")
+            elif command == "HELO":
+                self.reply(250, "localhost")
+            elif command == "AUTH":
+                mechanism, _, credentials = argument.partition(" ")
+                if mechanism.upper() != "PLAIN":
+                    self.reply(504, "only AUTH PLAIN is supported")
+                    continue
+                server.logins.append(base64.b64decode(credentials or "").split(b"\0")[1].decode())
+                self.reply(235, "authenticated")
+            elif command == "MAIL":
+                failure = server.take_failure()
+                if failure:
+                    self.reply(*failure)
+                    continue
+                sender, recipients = argument.partition(":")[2].strip("<> "), []
+                self.reply(250, "OK")
+            elif command == "RCPT":
+                recipients.append(argument.partition(":")[2].strip("<> "))
+                self.reply(250, "OK")
+            elif command == "DATA":
+                self.reply(354, "end data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b".\n", b""):
+                    lines.append(data[1:] if data.startswith(b".") else data)
+                server.deliver(sender, recipients, b"".join(lines))
+                sender, recipients = None, []
+                self.reply(250, "queued")
+            elif command == "RSET":
+                sender, recipients = None, []
+                self.reply(250, "OK")
+            elif command == "NOOP":
+                self.reply(250, "OK")
+            elif command == "QUIT":
+                self.reply(221, "bye")
+                return
+            else:
+                self.reply(502, "command not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Plain-text SMTP server that accepts everything and keeps it in memory (and `maildir`).
+
+        sink = LocalSMTPServer(port=0).start()      # port 0 picks a free port: sink.port
+        sink.fail_next(2, 451)                       # next two messages get a temporary failure
+        sink.messages                                # [(sender, [recipients], raw bytes)]
+
+    No STARTTLS, so point the pool at it with starttls=False / MAIL_STARTTLS=0.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=1025, maildir=None):
+        super().__init__((host, port), _SinkHandler)
+        self.maildir = maildir
+        self.messages = []
+        self.logins = []
+        self.connections = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        if maildir:
+            os.makedirs(maildir, exist_ok=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def fail_next(self, count, code=451, text="temporary failure, try again later"):
+        with self._lock:
+            self._failures += [(code, text)] * count
+
+    def take_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def deliver(self, sender, recipients, data):
+        with self._lock:
+            self.messages.append((sender, recipients, data))
+            number = len(self.messages)
+        if self.maildir:
+            with open(os.path.join(self.maildir, f"{number:06d}.eml"), "wb") as f:
+                f.write(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Outbound mail queue tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sink = commands.add_parser("sink", help="run a local SMTP server that accepts and stores every message")
+    sink.add_argument("--host", default="127.0.0.1")
+    sink.add_argument("--port", type=int, default=1025)
+    sink.add_argument("--maildir", help="directory to write received messages to as .eml files")
+    worker = commands.add_parser("worker", help="send queued mail until interrupted")
+    worker.add_argument("--db", default=DEFAULT_PATH)
+    status = commands.add_parser("status", help="print job counts by status")
+    status.add_argument("--db", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "sink":
+        server = LocalSMTPServer(args.host, args.port, args.maildir)
+        print(f"SMTP sink listening on {args.host}:{server.port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    elif args.command == "worker":
+        worker = MailWorker(MailQueue(args.db), SMTPPool.from_env()).start()
+        try:
+            while True:
+                time.sleep(60)
+                print(f"mail queue: {worker.queue.counts()}", file=sys.stderr)
+        except KeyboardInterrupt:
+            worker.stop(timeout=30)
+    else:
+        print(MailQueue(args.db).counts())
+
+
+if __name__ == "__main__":
+    main()
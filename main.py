@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
+from warmup import start_warmup
 
 # ✅ Must come before any st.* calls
 #st.set_page_config(
@@ -53,6 +54,7 @@ if not st.session_state.authenticated:
         st.rerun()
     elif password:
         st.error("❌ Incorrect password. Please try again.")
+    start_warmup()  # 🔥 Preload the heavy libraries in the background while the user types
     st.stop()
 
 # ---------------------
@@ -63,11 +65,11 @@ if not st.session_state.authenticated:
 
 st.markdown("""
     <h1 style='text-align: center;'>🏡 Real Estate Investment Evaluator</h1>
-    <p style='text-align: center;'>Analyze single properties or compare two side-by-side with AI-enhanced metrics and cash flow projections.</p>
+    <p style='text-align: center;'>Analyze single properties, compare two side-by-side, or rank a whole portfolio with AI-enhanced metrics and cash flow projections.</p>
 """, unsafe_allow_html=True)
 
 # 👇 Option Cards for Navigation
-col1, col2 = st.columns(2)
+col1, col2, col3 = st.columns(3)
 
 with col1:
     st.subheader("🔍 Single Property Evaluator")
@@ -81,6 +83,12 @@ with col2:
     if st.button("Go to Dual Comparison", key="dual_btn"):
         st.switch_page("pages/Dual_Property_Comparison_Evaluator.py")
 
+with col3:
+    st.subheader("🏘️ Portfolio Comparison Evaluator")
+    st.write("Rank 2–500 properties and find the Pareto-best deals.")
+    if st.button("Go to Portfolio Comparison", key="portfolio_btn"):
+        st.switch_page("pages/Portfolio_Comparison_Evaluator.py")
+
 st.markdown("""
     <hr style="margin-top: 2rem; margin-bottom: 1rem;">
     <div style='text-align: center; font-size: 0.9em;'>
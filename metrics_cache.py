@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import warnings
+from collections import OrderedDict
+
+from calculations import METRIC_INPUTS, calculate_metrics_result
+from metrics_result import MetricsResult
+
+# Bump when calculate_metrics output changes so stale disk entries are ignored
+CACHE_VERSION = "4"
+
+# Inputs are quantized before hashing: dollars to cents, percentages to basis points,
+# and loan term / horizon to whole years. Each value is stored as an integer count of units
+# (value * scale), and turned back into a float with a single division.
+_INPUT_SCALES = {
+    "purchase_price": 100,
+    "monthly_rent": 100,
+    "down_payment_pct": 100,
+    "interest_rate": 100,
+    "loan_term": 1,
+    "monthly_expenses": 100,
+    "vacancy_rate": 100,
+    "appreciation_rate": 100,
+    "rent_growth_rate": 100,
+    "time_horizon": 1,
+}
+
+
+def normalize_inputs(*args, **kwargs):
+    """Map calculate_metrics arguments to {name: integer count of units}."""
+    values = dict(zip(METRIC_INPUTS, args))
+    values.update(kwargs)
+    missing = [name for name in METRIC_INPUTS if name not in values]
+    if missing:
+        raise TypeError(f"missing metric inputs: {', '.join(missing)}")
+    return {name: int(round(float(values[name]) * _INPUT_SCALES[name])) for name in METRIC_INPUTS}
+
+
+def canonical_key(normalized):
+    """Content hash of a normalize_inputs() result."""
+    payload = "|".join(f"{name}={normalized[name]}" for name in METRIC_INPUTS)
+    return hashlib.sha256(f"v{CACHE_VERSION}|{payload}".encode()).hexdigest()
+
+
+def _row_hashes(columns, prefix):
+    import numpy as np
+
+    counts = [np.rint(np.asarray(columns[name], dtype=float) * _INPUT_SCALES[name]).astype(np.int64).tolist()
+              for name in METRIC_INPUTS]
+    template = prefix + "|".join(f"{name}={{}}" for name in METRIC_INPUTS)
+    return [hashlib.sha256(template.format(*row).encode()).hexdigest() for row in zip(*counts)]
+
+
+def canonical_keys(columns):
+    """canonical_key for every row of a dict/DataFrame of input columns (quantized with NumPy)."""
+    return _row_hashes(columns, f"v{CACHE_VERSION}|")
+
+
+def input_keys(columns):
+    """Content hash of every row's quantized inputs, without CACHE_VERSION.
+
+    Unlike the cache keys these don't change when calculate_metrics does, so they can
+    serve as stable ids for stored deals.
+    """
+    return _row_hashes(columns, "inputs|")
+
+
+def thaw_metrics(result):
+    """Fresh, mutable display dict for a cached MetricsResult (what the pages and PDF generators expect)."""
+    return result.to_display_dict()
+
+
+class MetricsCache:
+    """Bounded LRU cache in front of calculate_metrics, with an optional shared disk tier.
+
+    The in-memory tier is per process; pointing several workers at the same `disk_dir`
+    lets them reuse each other's results. Entries are immutable MetricsResult objects, so
+    they can be shared between callers without copying.
+    """
+
+    def __init__(self, maxsize=1024, disk_dir=None):
+        self.maxsize = maxsize
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, *args, **kwargs):
+        normalized = normalize_inputs(*args, **kwargs)
+        key = canonical_key(normalized)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        result = self._read_disk(key)
+        if result is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            inputs = {name: count / _INPUT_SCALES[name] for name, count in normalized.items()}
+            result = calculate_metrics_result(**inputs)
+            self._write_disk(key, result)
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+
+    # --- Disk tier ---
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return MetricsResult.from_record(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write_disk(self, key, result):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result.to_record(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # The disk tier is best-effort; the result is still cached in memory
+            warnings.warn(f"Metrics cache write failed: {e}", RuntimeWarning, stacklevel=2)
+
+
+# Process-wide cache used by the Streamlit pages
+default_cache = MetricsCache(
+    maxsize=int(os.getenv("METRICS_CACHE_SIZE", "1024")),
+    disk_dir=os.getenv("METRICS_CACHE_DIR") or None,
+)
+
+
+def cached_calculate_metrics(*args, **kwargs):
+    """calculate_metrics through default_cache; returns a MetricsResult (thaw_metrics gives the dict)."""
+    return default_cache.get(*args, **kwargs)
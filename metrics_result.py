@@ -0,0 +1,107 @@
+"""Compact, immutable per-deal result of the metrics engine.
+
+A MetricsResult holds the scalar metrics as plain fields and every per-year series as
+one row of a single read-only float64 block, so a deal costs a few hundred bytes and
+pickles as one array. to_display_dict() rebuilds the display-keyed dict that the pages
+and PDF generators expect.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+# (field, display key) for the scalar metrics, in display order
+SCALAR_FIELDS = (
+    ("cap_rate", "Cap Rate (%)"),
+    ("coc_return", "Cash-on-Cash Return (%)"),
+    ("final_year_roi", "Final Year ROI (%)"),
+    ("first_year_cash_flow", "First Year Cash Flow ($)"),
+    ("monthly_mortgage", "Monthly Mortgage ($)"),
+)
+
+# Rows of MetricsResult.series (same order as calculations.SERIES_KEYS)
+SERIES_FIELDS = (
+    ("cash_flows", "Multi-Year Cash Flow"),
+    ("annual_roi", "Annual ROI % (by year)"),
+    ("rents", "Annual Rents $ (by year)"),
+    ("loan_balance", "Loan Balance $ (by year)"),
+    ("equity", "Equity $ (by year)"),
+    ("irr_by_hold_year", "IRR % by Hold Year"),
+)
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class MetricsResult:
+    cap_rate: float
+    coc_return: float
+    final_year_roi: float
+    first_year_cash_flow: float
+    monthly_mortgage: float
+    grade: str
+    irr: float
+    irr_converged: bool
+    equity_multiple: float
+    net_sale_proceeds: float
+    series: np.ndarray  # (len(SERIES_FIELDS), horizon), read-only
+
+    def __post_init__(self):
+        series = np.array(self.series, dtype=np.float64, order="C")
+        series.flags.writeable = False
+        object.__setattr__(self, "series", series)
+
+    @property
+    def horizon(self):
+        return self.series.shape[1]
+
+    # Series rows as read-only views
+    cash_flows = property(lambda self: self.series[0])
+    annual_roi = property(lambda self: self.series[1])
+    rents = property(lambda self: self.series[2])
+    loan_balance = property(lambda self: self.series[3])
+    equity = property(lambda self: self.series[4])
+    irr_by_hold_year = property(lambda self: self.series[5])
+
+    def to_display_dict(self):
+        """The display-keyed dict calculate_metrics has always returned (fresh lists, safe to edit)."""
+        display = {key: float(getattr(self, field)) for field, key in SCALAR_FIELDS}
+        display["Grade"] = self.grade
+        series = {key: row.tolist() for (_, key), row in zip(SERIES_FIELDS, self.series)}
+        display["10yr Cash Flow"] = series["Multi-Year Cash Flow"]
+        display["Multi-Year Cash Flow"] = list(series["Multi-Year Cash Flow"])
+        for _, key in SERIES_FIELDS[1:]:
+            display[key] = series[key]
+        display["Net Sale Proceeds ($)"] = float(self.net_sale_proceeds)
+        display["irr (%)"] = float(self.irr)
+        display["irr_converged"] = bool(self.irr_converged)
+        display["equity_multiple"] = float(self.equity_multiple)
+        return display
+
+    def to_record(self):
+        """JSON-friendly form (used by the disk cache); from_record() reverses it."""
+        record = {field: float(getattr(self, field)) for field, _ in SCALAR_FIELDS}
+        record.update(grade=self.grade, irr=float(self.irr), irr_converged=bool(self.irr_converged),
+                      equity_multiple=float(self.equity_multiple), net_sale_proceeds=float(self.net_sale_proceeds),
+                      series=self.series.tolist())
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(**record)
+
+
+def result_from_batch(batch, index):
+    """One deal of a calculate_metrics_batch result as a MetricsResult."""
+    horizon = int(batch["Time Horizon"][index])
+    return MetricsResult(
+        **{field: float(batch[key][index]) for field, key in SCALAR_FIELDS},
+        grade=str(batch["Grade"][index]),
+        irr=float(batch["irr (%)"][index]),
+        irr_converged=bool(batch["irr_converged"][index]),
+        equity_multiple=float(batch["equity_multiple"][index]),
+        net_sale_proceeds=float(batch["Net Sale Proceeds ($)"][index]),
+        series=np.stack([batch[key][index, :horizon] for _, key in SERIES_FIELDS]),
+    )
+
+
+def results_from_batch(batch):
+    """Every deal of a calculate_metrics_batch result as a list of MetricsResult."""
+    return [result_from_batch(batch, i) for i in range(len(batch["Time Horizon"]))]
@@ -0,0 +1,442 @@
+"""Monte Carlo risk simulation over appreciation, rent growth and vacancy.
+
+calculate_metrics treats those three drivers as constants. Here every path draws its own
+year-by-year values from configurable distributions, and the IRR / ROI / cash-flow results
+are folded into streaming aggregates block by block, so memory stays flat no matter how
+many paths are simulated.
+"""
+import math
+
+import numpy as np
+
+from amortization import annual_debt_service, remaining_balance
+from calculations import DEFAULT_SELLING_COST_PCT, METRIC_INPUTS, mortgage_payment
+from irr_solver import solve_irr
+
+# Spread used when a driver is not configured: normal around the deal's own input
+DEFAULT_DRIVERS = {
+    "appreciation_rate": {"dist": "normal", "std": 2.0},
+    "rent_growth_rate": {"dist": "normal", "std": 1.5},
+    "vacancy_rate": {"dist": "normal", "std": 3.0, "min": 0.0, "max": 100.0},
+}
+
+DEFAULT_QUANTILES = (5, 25, 50, 75, 95)
+
+# Per-path outputs summarized by simulate_deal
+SIMULATED_METRICS = ("irr (%)", "Final Year ROI (%)", "Total Cash Flow ($)", "First Year Cash Flow ($)")
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch-style, dense layout).
+
+    Values are counted in logarithmic buckets, so any reported quantile is within
+    `relative_accuracy` of a true sample value. Magnitudes below `min_value` count as zero
+    and magnitudes above `max_value` land in the last bucket. All state is one fixed-size
+    float64 array (`counts`), ordered from most negative to most positive bucket, so two
+    sketches with the same parameters merge by adding their arrays.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-4, max_value=1e9, counts=None):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._min_key = math.floor(math.log(min_value) / self._log_gamma)
+        self.n_keys = math.ceil(math.log(max_value) / self._log_gamma) - self._min_key + 1
+        self.counts = np.zeros(2 * self.n_keys + 1) if counts is None else counts
+
+    @property
+    def count(self):
+        return float(self.counts.sum())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        magnitude = np.abs(values)
+        is_zero = magnitude < self.min_value
+        keys = np.ceil(np.log(np.maximum(magnitude, self.min_value)) / self._log_gamma) - self._min_key
+        keys = np.clip(keys, 0, self.n_keys - 1).astype(np.intp)
+
+        positive = ~is_zero & (values > 0)
+        negative = ~is_zero & (values < 0)
+        self.counts[self.n_keys + 1:] += np.bincount(keys[positive], minlength=self.n_keys)
+        self.counts[:self.n_keys] += np.bincount(keys[negative], minlength=self.n_keys)[::-1]
+        self.counts[self.n_keys] += is_zero.sum()
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    def _bucket_values(self):
+        keys = np.arange(self.n_keys) + self._min_key
+        magnitude = 2 * self.gamma ** keys / (self.gamma + 1)
+        return np.concatenate([-magnitude[::-1], [0.0], magnitude])
+
+    def quantile(self, q):
+        """Value at quantile(s) q in [0, 1]; NaN while the sketch is empty."""
+        q = np.asarray(q, dtype=float)
+        total = self.count
+        if total == 0:
+            return np.full(q.shape, np.nan)
+        cumulative = np.cumsum(self.counts)
+        positions = np.searchsorted(cumulative, q * (total - 1), side="right")
+        return self._bucket_values()[np.minimum(positions, self.counts.size - 1)]
+
+
+class StreamingStats:
+    """Count / sum / min / max plus a QuantileSketch, updated one block of values at a time."""
+
+    def __init__(self, **sketch_options):
+        self.sketch = QuantileSketch(**sketch_options)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        self.sketch.add(values)
+        self.count += values.size
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def summary(self, quantiles=DEFAULT_QUANTILES):
+        if self.count == 0:
+            return {"count": 0, "mean": None, "min": None, "max": None, **{f"p{q:g}": None for q in quantiles}}
+        values = self.sketch.quantile(np.asarray(quantiles) / 100)
+        # Bucket midpoints can overshoot the observed range slightly; clamp to it
+        values = np.clip(values, self.min, self.max)
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2),
+            "min": round(self.min, 2),
+            "max": round(self.max, 2),
+            **{f"p{q:g}": round(float(v), 2) for q, v in zip(quantiles, values)},
+        }
+
+
+def draw_driver(spec, base, rng, shape):
+    """Sample a (paths, years) matrix of a driver, in %.
+
+    `spec` is a number (constant) or a dict with "dist" in normal / uniform / triangular /
+    constant and optional "min"/"max" clipping. Missing centers default to `base`, the
+    deal's own input, e.g. {"dist": "normal", "std": 2} is normal around the base rate.
+    """
+    if spec is None:
+        return np.full(shape, float(base))
+    if not isinstance(spec, dict):
+        return np.full(shape, float(spec))
+
+    dist = spec.get("dist", "normal")
+    if dist == "constant":
+        values = np.full(shape, float(spec.get("value", base)))
+    elif dist == "normal":
+        values = rng.normal(spec.get("mean", base), spec.get("std", 0.0), shape)
+    elif dist == "uniform":
+        values = rng.uniform(spec["low"], spec["high"], shape)
+    elif dist == "triangular":
+        values = rng.triangular(spec["low"], spec.get("mode", base), spec["high"], shape)
+    else:
+        raise ValueError(f"unknown distribution {dist!r}")
+
+    if "min" in spec or "max" in spec:
+        values = np.clip(values, spec.get("min", -np.inf), spec.get("max", np.inf))
+    return values
+
+
+def simulate_block(deal, drivers, rng, n_paths):
+    """Simulate `n_paths` paths of one deal; returns per-path arrays for SIMULATED_METRICS."""
+    horizon = int(deal["time_horizon"])
+    purchase_price = float(deal["purchase_price"])
+    initial_investment = purchase_price * deal["down_payment_pct"] / 100
+    loan_amount = purchase_price * (1 - deal["down_payment_pct"] / 100)
+    monthly_mortgage = mortgage_payment(loan_amount, deal["interest_rate"], deal["loan_term"])
+    annual_expenses = deal["monthly_expenses"] * 12
+
+    shape = (n_paths, horizon)
+    appreciation = draw_driver(drivers.get("appreciation_rate"), deal["appreciation_rate"], rng, shape)
+    rent_growth = draw_driver(drivers.get("rent_growth_rate"), deal["rent_growth_rate"], rng, shape)
+    vacancy = draw_driver(drivers.get("vacancy_rate"), deal["vacancy_rate"], rng, shape)
+
+    # Year 1 rent is the input rent; each year's growth applies to the following year
+    rent_factor = np.ones(shape)
+    rent_factor[:, 1:] = np.cumprod(1 + rent_growth[:, :-1] / 100, axis=1)
+    annual_rent = deal["monthly_rent"] * rent_factor * (1 - vacancy / 100) * 12
+    debt_service = annual_debt_service(monthly_mortgage, deal["loan_term"], horizon)
+    cash_flows = annual_rent - annual_expenses - debt_service
+
+    sale_price = purchase_price * np.prod(1 + appreciation / 100, axis=1)
+    appreciation_value = sale_price - purchase_price
+    total_cash_flow = cash_flows.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        final_roi = (total_cash_flow + appreciation_value) / initial_investment * 100
+
+    # IRR sells at the horizon, net of selling costs and the loan payoff
+    balance = remaining_balance(loan_amount, deal["interest_rate"], deal["loan_term"], horizon)
+    exit_flows = cash_flows.copy()
+    exit_flows[:, -1] += sale_price * (1 - DEFAULT_SELLING_COST_PCT / 100) - balance
+    irr_rates, _ = solve_irr(np.column_stack([np.full(n_paths, -initial_investment), exit_flows]))
+
+    return {
+        "irr (%)": irr_rates * 100,
+        "Final Year ROI (%)": final_roi,
+        "Total Cash Flow ($)": total_cash_flow,
+        "First Year Cash Flow ($)": cash_flows[:, 0],
+        "any_negative_year": (cash_flows < 0).any(axis=1),
+    }
+
+
+class SimulationAccumulator:
+    """Streaming aggregates for one deal's simulation; merge() combines shards."""
+
+    def __init__(self, **sketch_options):
+        self.stats = {name: StreamingStats(**sketch_options) for name in SIMULATED_METRICS}
+        self.paths = 0
+        self.negative_year_paths = 0
+        self.negative_total_paths = 0
+        self.irr_failures = 0
+
+    def update(self, block):
+        for name in SIMULATED_METRICS:
+            self.stats[name].update(block[name])
+        self.paths += block["irr (%)"].size
+        self.negative_year_paths += int(block["any_negative_year"].sum())
+        self.negative_total_paths += int((block["Total Cash Flow ($)"] < 0).sum())
+        self.irr_failures += int(np.isnan(block["irr (%)"]).sum())
+
+    def merge(self, other):
+        for name in SIMULATED_METRICS:
+            self.stats[name].merge(other.stats[name])
+        self.paths += other.paths
+        self.negative_year_paths += other.negative_year_paths
+        self.negative_total_paths += other.negative_total_paths
+        self.irr_failures += other.irr_failures
+
+    def summary(self, quantiles=DEFAULT_QUANTILES):
+        paths = max(self.paths, 1)
+        return {
+            "paths": self.paths,
+            **{name: self.stats[name].summary(quantiles) for name in SIMULATED_METRICS},
+            "prob_negative_cash_flow": round(self.negative_year_paths / paths, 4),
+            "prob_negative_total_cash_flow": round(self.negative_total_paths / paths, 4),
+            "irr_failure_rate": round(self.irr_failures / paths, 4),
+        }
+
+
+def _normalize_deal(deal):
+    missing = [name for name in METRIC_INPUTS if name not in deal]
+    if missing:
+        raise ValueError(f"deal is missing inputs: {', '.join(missing)}")
+    deal = {name: float(deal[name]) for name in METRIC_INPUTS}
+    if deal["time_horizon"] < 1:
+        raise ValueError("time_horizon must be at least 1 year")
+    return deal
+
+
+def simulate_deal(deal, drivers=None, n_paths=100_000, seed=0, block_size=10_000,
+                  quantiles=DEFAULT_QUANTILES, accumulator=None):
+    """Monte Carlo summary for one deal (a dict with the calculate_metrics input names).
+
+    `drivers` maps any of appreciation_rate / rent_growth_rate / vacancy_rate to a
+    distribution spec (see draw_driver); unspecified drivers use DEFAULT_DRIVERS.
+    Results are reproducible for a given (seed, block_size). Only `block_size` paths are
+    materialized at a time; everything else lives in fixed-size streaming aggregates.
+    """
+    deal = _normalize_deal(deal)
+    drivers = {**DEFAULT_DRIVERS, **(drivers or {})}
+    rng = np.random.default_rng(seed)
+    accumulator = accumulator or SimulationAccumulator()
+
+    remaining = n_paths
+    while remaining > 0:
+        size = min(block_size, remaining)
+        accumulator.update(simulate_block(deal, drivers, rng, size))
+        remaining -= size
+
+    return {"seed": seed, **accumulator.summary(quantiles)}
+
+
+# --- Parallel portfolio simulation ---
+#
+# Each deal's paths are cut into fixed-size shards, and every shard gets its own seed from
+# SeedSequence(seed) -> per-deal -> per-shard spawn. Which worker runs a shard doesn't change
+# what it draws, so results are identical for any worker count. Workers write into
+# multiprocessing.shared_memory buffers instead of returning pickled results:
+#   counts       (deals, metrics, sketch bins)  quantile sketch counts, added under a lock
+#   shard_stats  (shards, metrics, 4)           count / sum / min / max per shard
+#   shard_flags  (shards, 4)                    paths / negative-year / negative-total / IRR failures
+# Sketch counts are integers, so adding them in any order is exact; the float sums are
+# combined in shard order at the end so means are deterministic too.
+# The buffers hold one group of deals (~100 KB of sketch counts per deal) and are reused
+# group after group, so memory doesn't grow with the portfolio. Workers attach to them only
+# while writing a shard's results.
+
+_SHARD_FLAGS = ("paths", "negative_year_paths", "negative_total_paths", "irr_failures")
+_LOCK_STRIPES = 64
+
+# Deals simulated per pass over the shared buffers
+DEAL_GROUP_SIZE = 64
+
+_worker_locks = None
+
+
+def _init_worker(locks):
+    global _worker_locks
+    _worker_locks = locks
+
+
+def _open_segment(name):
+    from multiprocessing import shared_memory
+
+    try:
+        # Python 3.13+: the creating process owns the segment, so don't track the attachment
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Older versions register it, but pool workers share the parent's resource tracker,
+        # which files it under the parent's entry; the parent's unlink() clears that
+        return shared_memory.SharedMemory(name=name)
+
+
+def _write_shard(buffers, deal_index, shard_index, accumulator):
+    segments = {key: _open_segment(name) for key, (name, _) in buffers.items()}
+    views = {}
+    try:
+        views.update({key: np.ndarray(shape, dtype=np.float64, buffer=segments[key].buf)
+                      for key, (_, shape) in buffers.items()})
+        local_counts = np.stack([accumulator.stats[name].sketch.counts for name in SIMULATED_METRICS])
+        with _worker_locks[deal_index % len(_worker_locks)]:
+            views["counts"][deal_index] += local_counts
+
+        for m, name in enumerate(SIMULATED_METRICS):
+            stats = accumulator.stats[name]
+            views["shard_stats"][shard_index, m] = (stats.count, stats.total, stats.min, stats.max)
+        views["shard_flags"][shard_index] = (accumulator.paths, accumulator.negative_year_paths,
+                                             accumulator.negative_total_paths, accumulator.irr_failures)
+    finally:
+        # Views must be gone before their segment can close
+        views.clear()
+        for segment in segments.values():
+            segment.close()
+
+
+def _run_shard(task):
+    (deal_index, shard_index, deal, drivers, n_paths, seed_seq, block_size, buffers) = task
+    rng = np.random.default_rng(seed_seq)
+    accumulator = SimulationAccumulator()
+    remaining = n_paths
+    while remaining > 0:
+        size = min(block_size, remaining)
+        accumulator.update(simulate_block(deal, drivers, rng, size))
+        remaining -= size
+    _write_shard(buffers, deal_index, shard_index, accumulator)
+
+
+def _summaries(arrays, n_deals, shards_per_deal, seed, quantiles):
+    """simulate_deal-style summaries of the first `n_deals` deals held in the shared buffers."""
+    summaries = []
+    for d in range(n_deals):
+        accumulator = SimulationAccumulator()
+        shard_range = range(d * shards_per_deal, (d + 1) * shards_per_deal)
+        for m, name in enumerate(SIMULATED_METRICS):
+            stats = accumulator.stats[name]
+            stats.sketch.counts = arrays["counts"][d, m].copy()
+            for shard in shard_range:
+                count, total, low, high = arrays["shard_stats"][shard, m].tolist()
+                if count:
+                    stats.count += int(count)
+                    stats.total += total
+                    stats.min = min(stats.min, low)
+                    stats.max = max(stats.max, high)
+        for shard in shard_range:
+            paths, negative_year, negative_total, failures = arrays["shard_flags"][shard].tolist()
+            accumulator.paths += int(paths)
+            accumulator.negative_year_paths += int(negative_year)
+            accumulator.negative_total_paths += int(negative_total)
+            accumulator.irr_failures += int(failures)
+        summaries.append({"seed": seed, **accumulator.summary(quantiles)})
+    return summaries
+
+
+def simulate_portfolio(deals, drivers=None, n_paths=100_000, seed=0, shard_size=25_000, block_size=10_000,
+                       workers=None, quantiles=DEFAULT_QUANTILES, group_size=DEAL_GROUP_SIZE):
+    """Monte Carlo summaries for many deals, sharded across a process pool.
+
+    `drivers` is one spec dict for every deal or a list with one per deal. Returns one
+    simulate_deal-style summary per deal. Results depend on (seed, shard_size, block_size)
+    but not on `workers` or `group_size` (deals per pass over the shared buffers);
+    workers=1 runs in-process.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    deals = [_normalize_deal(deal) for deal in deals]
+    if drivers is None or isinstance(drivers, dict):
+        drivers = [drivers] * len(deals)
+    drivers = [{**DEFAULT_DRIVERS, **(d or {})} for d in drivers]
+
+    deal_seeds = np.random.SeedSequence(seed).spawn(len(deals))
+    shards_per_deal = math.ceil(n_paths / shard_size)
+    group_size = max(1, min(group_size, len(deals)))
+    sketch_len = QuantileSketch().counts.size
+
+    shapes = {
+        "counts": (group_size, len(SIMULATED_METRICS), sketch_len),
+        "shard_stats": (group_size * shards_per_deal, len(SIMULATED_METRICS), 4),
+        "shard_flags": (group_size * shards_per_deal, len(_SHARD_FLAGS)),
+    }
+    segments = {key: shared_memory.SharedMemory(create=True, size=max(8, int(np.prod(shape)) * 8))
+                for key, shape in shapes.items()}
+    arrays = {}
+    try:
+        arrays.update({key: np.ndarray(shapes[key], dtype=np.float64, buffer=segments[key].buf) for key in shapes})
+        buffers = {key: (segments[key].name, shapes[key]) for key in shapes}
+        locks = [multiprocessing.Lock() for _ in range(_LOCK_STRIPES)]
+        if workers == 1:
+            _init_worker(locks)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(locks,))
+
+        summaries = []
+        try:
+            for first in range(0, len(deals), group_size):
+                group = range(first, min(first + group_size, len(deals)))
+                for array in arrays.values():
+                    array[...] = 0
+
+                # Deal and shard indexes are positions within the group's buffers
+                tasks = []
+                for d, deal_index in enumerate(group):
+                    for s, shard_seed in enumerate(deal_seeds[deal_index].spawn(shards_per_deal)):
+                        paths = min(shard_size, n_paths - s * shard_size)
+                        tasks.append((d, d * shards_per_deal + s, deals[deal_index], drivers[deal_index], paths,
+                                      shard_seed, block_size, buffers))
+                if pool is None:
+                    for task in tasks:
+                        _run_shard(task)
+                else:
+                    for _ in pool.map(_run_shard, tasks, chunksize=max(1, len(tasks) // (4 * (workers or 8)))):
+                        pass
+                summaries += _summaries(arrays, len(group), shards_per_deal, seed, quantiles)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return summaries
+    finally:
+        # Drop every view of the segments before closing them
+        arrays.clear()
+        for segment in segments.values():
+            segment.close()
+            segment.unlink()
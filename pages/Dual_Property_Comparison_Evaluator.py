@@ -1,16 +1,10 @@
 
 import streamlit as st
-from io import BytesIO
 import os
 import sys  # ✅ Move this before using sys
 sys.path.append(os.path.abspath(".."))  # ✅ Now valid
 from dotenv import load_dotenv
-import smtplib
-from email.message import EmailMessage
-import matplotlib.pyplot as plt
-import pandas as pd
-from calculations import calculate_metrics
-from pdf_generator_dual import generate_pdf , generate_comparison_pdf , generate_comparison_pdf_table_style
+from warmup import start_warmup
 load_dotenv()
 
 #from pdf_generator import generate_comparison_pdf_table_style
@@ -20,7 +14,6 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-from pdf_generator_dual import generate_ai_verdict
 
 # 🔐 Password Gate — load from .env or fallback
 load_dotenv()
@@ -41,9 +34,39 @@ if not st.session_state.authenticated:
         st.rerun()  # 🔁 Clear the password input and reload
     elif password:
         st.error("❌ Incorrect password. Please try again.")
+    start_warmup()  # 🔥 Preload the heavy libraries in the background while the user types
     st.stop()  # 🔒 Block access until correct
 
-    
+
+# Heavy imports live below the gate so the login form renders without them
+from metrics_cache import cached_calculate_metrics, thaw_metrics
+from pdf_generator_dual import generate_pdf , generate_comparison_pdf , generate_comparison_pdf_table_style
+from pdf_generator_dual import generate_ai_verdict
+from mail_queue import start_mail_worker
+from report_cache import deferred_report
+from charts import comparison_chart
+
+# --- Cached stages: inputs → metrics (per property) → verdict → chart → report ---
+# Keyed on their own inputs, so editing Property A never recomputes Property B, and widgets
+# that feed no calculation (the email box) rerun only their fragment. The comparison chart
+# comes from charts.py, which caches it for every session: the same layout the PDF report
+# draws, shown as SVG.
+
+@st.cache_data(show_spinner=False)
+def user_guide_pdf():
+    with open("pages/Investment_Metrics_User_Guide.pdf", "rb") as f:
+        return f.read()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def property_metrics(deal_inputs):
+    """Display metrics for one property's calculate_metrics arguments (a tuple, in order)."""
+    return thaw_metrics(cached_calculate_metrics(*deal_inputs))
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def comparison_verdict(inputs_a, inputs_b):
+    return generate_ai_verdict(property_metrics(inputs_a), property_metrics(inputs_b))
+
+
 # ✅ Titles shown only after succesful login
 st.markdown("## 🏡 Real Estate Deal Evaluator")
 #st.markdown("### 📈 Multi-Year Cash Flow Projection")
@@ -58,15 +81,14 @@ st.markdown(
     unsafe_allow_html=True
 )
 st.markdown("---")
-with open("pages/Investment_Metrics_User_Guide.pdf", "rb") as f:
-    st.download_button(
-        label="📘 Download User Manual (PDF)",
-        data=f,
-        file_name="Investment_Metrics_User_Guide.pdf",
-        mime="application/pdf"
-    )
+st.download_button(
+    label="📘 Download User Manual (PDF)",
+    data=user_guide_pdf(),
+    file_name="Investment_Metrics_User_Guide.pdf",
+    mime="application/pdf"
+)
 
-    # Sidebar Title
+# Sidebar Title
 #sidebar.markdown("## 🧾 Shared Financial Inputs")
 st.sidebar.markdown("<h2 style='color:white; font-size:24px;'>🧾 Shared Financial Inputs</h2>", unsafe_allow_html=True)
 
@@ -110,9 +132,10 @@ with col2:
     time_horizon_b = st.slider("Time Horizon A (Years)", 1, 30, value=10, key="time_horizon_b")
     # ...same structure
 
-# Calculate metrics
+# Calculate metrics (cached per property; each call returns a private copy, so the
+# Grade/Verdict edits below stay local to this run)
 # ---- Property A Metrics ----
-metrics_a = calculate_metrics(
+inputs_a = (
     purchase_price_a,
     rent_a,
     down_payment_pct_a,
@@ -122,11 +145,12 @@ metrics_a = calculate_metrics(
     vacancy_rate,
     appreciation_rate_a,
     rent_growth_rate_a,
-    time_horizon_a
+    time_horizon_a,
 )
+metrics_a = property_metrics(inputs_a)
 
 # ---- Property B Metrics ----
-metrics_b = calculate_metrics(
+inputs_b = (
     purchase_price_b,
     rent_b,
     down_payment_pct_b,
@@ -136,12 +160,14 @@ metrics_b = calculate_metrics(
     vacancy_rate,
     appreciation_rate_b,
     rent_growth_rate_b,
-    time_horizon_b
+    time_horizon_b,
 )
+metrics_b = property_metrics(inputs_b)
 
 
 if metrics_a and metrics_b:
-    comparison_pdf = generate_comparison_pdf_table_style(metrics_a, metrics_b)
+    # Built on click only; inputs are snapshotted here, before Grade/Verdict are overwritten below
+    comparison_pdf = deferred_report("comparison", generate_comparison_pdf_table_style, metrics_a, metrics_b)
     st.download_button(
         label="📄 Download Comparison PDF",
         data=comparison_pdf,
@@ -154,20 +180,7 @@ if metrics_a and metrics_b:
 # Title
 #st.markdown("""<div style='text-align: center; margin-top: -40px;'><h1>🏡 Real Estate Deal Evaluator</h1></div>""", unsafe_allow_html=True)
 
-load_dotenv()
-
-# Prepare inputs and call AI verdict generator
-verdict_input = {
-    "ROI (%)": f"{metrics_a.get('ROI (%)', 0)} vs {metrics_b.get('ROI (%)', 0)}",
-    "Multi-Year Cash Flow A": metrics_a.get("Multi-Year Cash Flow", []),
-    "Multi-Year Cash Flow B": metrics_b.get("Multi-Year Cash Flow", []),
-    "Cap Rate (%) A": metrics_a.get("Cap Rate (%)", 0),
-    "Cap Rate (%) B": metrics_b.get("Cap Rate (%)", 0),
-    "Cash-on-Cash Return (%) A": metrics_a.get("Cash-on-Cash Return (%)", 0),
-    "Cash-on-Cash Return (%) B": metrics_b.get("Cash-on-Cash Return (%)", 0),
-}
-
-summary_text, grade = generate_ai_verdict(metrics_a, metrics_b)
+summary_text, grade = comparison_verdict(inputs_a, inputs_b)
 
 # Add verdict to metrics so pdf_generator can consume it
 metrics_a["AI Verdict"] = summary_text
@@ -197,20 +210,9 @@ property_data = {
     "Vacancy Rate (%)": vacancy_rate,
 }
 
-# Generate PDF
+# PDF is only built when the email action asks for it (cached per input fingerprint)
 summary_text = f"Property A is a {metrics_a['Grade']}-grade rental, and Property B is a {metrics_b['Grade']}-grade rental with upside potential"
-pdf_bytes = generate_pdf(property_data, metrics_a, metrics_b, summary_text)
-
-# ✅ Extract cash flow lists from metrics for plotting
-cf_a = metrics_a.get("Multi-Year Cash Flow", [])
-cf_b = metrics_b.get("Multi-Year Cash Flow", [])
-
-# Ensure they are lists of numbers
-if isinstance(cf_a, str):
-    cf_a = [float(x.strip()) for x in cf_a.strip("[]").split(",") if x.strip()]
-if isinstance(cf_b, str):
-    cf_b = [float(x.strip()) for x in cf_b.strip("[]").split(",") if x.strip()]
-
+pdf_report = deferred_report("dual", generate_pdf, property_data, metrics_a, metrics_b, summary_text)
 
 # 📊 New 6-Curve Dual-Y Comparison Plot
 st.subheader("📈 Multi-Year ROI, Rent & Cash Flow Comparison (A vs B)")
@@ -220,101 +222,63 @@ st.subheader("📈 Long-Term Metrics")
 col1, col2 = st.columns(2)
 
 with col1:
-    st.metric("IRR A (%)", f"{metrics_a.get('irr (%)', 0):.2f}")
+    st.metric("IRR A (%)", f"{metrics_a['irr (%)']:.2f}" if metrics_a.get("irr_converged") else "N/A")
     st.metric("Equity Multiple A", f"{metrics_a.get('equity_multiple', 0):.2f}")
 
 with col2:
-    st.metric("IRR B (%)", f"{metrics_b.get('irr (%)', 0):.2f}")
+    st.metric("IRR B (%)", f"{metrics_b['irr (%)']:.2f}" if metrics_b.get("irr_converged") else "N/A")
     st.metric("Equity Multiple B", f"{metrics_b.get('equity_multiple', 0):.2f}")
 
-# Extract data from metrics
-# Pad shorter cash flow list with None or 0
-max_years = max(len(cf_a), len(cf_b))
-cf_a += [0] * (max_years - len(cf_a))
-cf_b += [0] * (max_years - len(cf_b))
-
-rent_a = metrics_a.get("Annual Rents $ (by year)", [])
-rent_b = metrics_b.get("Annual Rents $ (by year)", [])
-roi_a = metrics_a.get("Annual ROI % (by year)", [])
-roi_b = metrics_b.get("Annual ROI % (by year)", [])
-
-# Use longest time horizon
-#years = list(range(1, max(len(cf_a), len(cf_b)) + 1))
-fig, ax1 = plt.subplots()
-#fig, ax1 = plt.subplots(figsize=(10, 5))  # ✅ Create figure and axes
-years_a = list(range(1, len(cf_a) + 1))
-years_b = list(range(1, len(cf_b) + 1))
-
-# ✅ Step 3: Defensive trim to avoid x/y mismatch
-years_a = years_a[:min(len(years_a), len(rent_a), len(roi_a), len(cf_a))]
-years_b = years_b[:min(len(years_b), len(rent_b), len(roi_b), len(cf_b))]
-cf_a = cf_a[:len(years_a)]
-cf_b = cf_b[:len(years_b)]
-rent_a = rent_a[:len(years_a)]
-rent_b = rent_b[:len(years_b)]
-roi_a = roi_a[:len(years_a)]
-roi_b = roi_b[:len(years_b)]
-
-#ax1.plot(years_a, cf_a, marker='o', label="Cash Flow A ($)", color='blue')
-#ax1.plot(years_b, cf_b, marker='o', label="Cash Flow B ($)", color='skyblue')
-
-
-# Primary Y-axis: Cash Flow & Rent
-ax1.plot(years_a, cf_a, marker='o', label="Cash Flow A ($)", color='blue')
-ax1.plot(years_b, cf_b, marker='o', label="Cash Flow B ($)", color='skyblue')
-ax1.plot(years_a, rent_a, marker='s', linestyle='--', label="Rent A ($)", color='orange')
-ax1.plot(years_b, rent_b, marker='s', linestyle='--', label="Rent B ($)", color='goldenrod')
-ax1.set_xlabel("Year")
-ax1.set_ylabel("Cash Flow / Rent ($)")
-ax1.grid(True)
-
-# Secondary Y-axis: ROI
-ax2 = ax1.twinx()
-ax2.plot(years_a, roi_a, marker='^', linestyle='-', label="ROI A (%)", color='green')
-ax2.plot(years_b, roi_b, marker='^', linestyle='--', label="ROI B (%)", color='darkgreen')
-ax2.set_ylabel("ROI (%)", color='green')
-ax2.tick_params(axis='y', labelcolor='green')
-
-# Merge legends from both y-axes
-lines1, labels1 = ax1.get_legend_handles_labels()
-lines2, labels2 = ax2.get_legend_handles_labels()
-ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
-
-# Final layout
-ax1.set_title("Projected Cash Flow, Rent, and ROI Over Time")
-st.pyplot(fig)
+# 📊 Cash flow, rent and ROI for both properties (SVG, cached per series)
+st.image(comparison_chart(
+    tuple(metrics_a.get("Multi-Year Cash Flow", [])),
+    tuple(metrics_b.get("Multi-Year Cash Flow", [])),
+    tuple(metrics_a.get("Annual Rents $ (by year)", [])),
+    tuple(metrics_b.get("Annual Rents $ (by year)", [])),
+    tuple(metrics_a.get("Annual ROI % (by year)", [])),
+    tuple(metrics_b.get("Annual ROI % (by year)", [])),
+), width="stretch")
 
 
 # Email Section
-st.markdown("### 📨 Email This Report")
-recipient_email = st.text_input("Enter email address to send the report", placeholder="you@example.com")
-
-# Debug diagnostics
-
-if st.button("Send Email Report") and recipient_email:
-    # ✅ UI-level validation of malformed email inputs
-    import re
-    if not re.match(r"[^@]+@[^@]+\.[^@]+", recipient_email):
-        st.error("❌ Please enter a valid email address.")
-        st.stop()
-    try:
-        st.write("📤 Attempting to send email...")
-        msg = EmailMessage()
-        msg["Subject"] = "Your Real Estate Evaluation Report"
-        msg["From"] = os.getenv("EMAIL_USER")  # ✅ From address
-        msg["To"] = recipient_email
-        msg.set_content("Please find attached your real estate evaluation report.")
-        pdf_bytes.seek(0)
-        msg.add_attachment(pdf_bytes.read(), maintype='application', subtype='pdf', filename="real_estate_report.pdf")
-
-        with smtplib.SMTP("smtp.gmail.com", 587) as smtp:
-            smtp.starttls()
-                # ✅ Debug prints BEFORE login
-            #st.write("🔐 EMAIL_USER:", os.getenv("EMAIL_USER"))
-            #st.write("🔐 EMAIL_PASSWORD present:", bool(os.getenv("EMAIL_PASSWORD")))
-            smtp.login(os.getenv("EMAIL_USER"), os.getenv("EMAIL_PASSWORD")) # GMAIL was changed to EMAIL!!!
-            smtp.send_message(msg)
-
-        st.success(f"✅ Report sent to {recipient_email}!")
-    except Exception as e:
-        st.error(f"❌ Failed to send email: {e}")
+@st.cache_resource
+def mail_queue():
+    return start_mail_worker()
+
+@st.fragment
+def email_section(pdf_report):
+    st.markdown("### 📨 Email This Report")
+    recipient_email = st.text_input("Enter email address to send the report", placeholder="you@example.com")
+
+    if st.button("Send Email Report") and recipient_email:
+        # ✅ UI-level validation of malformed email inputs
+        import re
+        if not re.match(r"[^@]+@[^@]+\.[^@]+", recipient_email):
+            st.error("❌ Please enter a valid email address.")
+            return
+        # 📬 Queued and sent in the background, so the page doesn't wait on SMTP
+        try:
+            job_id = mail_queue().enqueue(
+                recipient_email,
+                "Your Real Estate Evaluation Report",
+                "Please find attached your real estate evaluation report.",
+                attachment=pdf_report(),
+                filename="real_estate_report.pdf",
+            )
+        except ValueError as e:
+            st.error(f"❌ Can't send to that address: {e}")
+            return
+        st.session_state.setdefault("mail_jobs", []).append(job_id)
+        st.success(f"📬 Report queued for {recipient_email} (job #{job_id}).")
+
+    # 📬 Delivery status of the emails sent from this session
+    jobs = st.session_state.get("mail_jobs", [])[-5:]
+    for job_id in jobs:
+        job = mail_queue().status(job_id)
+        if job:
+            note = f" — {job['last_error']}" if job["last_error"] and job["status"] != "sent" else ""
+            st.caption(f"Job #{job_id} to {job['recipient']}: {job['status']}{note}")
+    if jobs:
+        st.button("🔄 Refresh status")
+
+email_section(pdf_report)
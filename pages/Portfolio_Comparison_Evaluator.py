@@ -0,0 +1,165 @@
+
+import streamlit as st
+import os
+from dotenv import load_dotenv
+from warmup import start_warmup
+
+st.set_page_config(
+    page_title="Portfolio Comparison Evaluator",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# 🔐 Password Gate — load from .env or fallback
+load_dotenv()
+APP_PASSWORD = os.getenv("APP_PASSWORD", "SmartInvest1!")
+
+if "authenticated" not in st.session_state:
+    st.session_state.authenticated = False
+
+if not st.session_state.authenticated:
+    st.title("🏠 Real Estate Deal Evaluator")
+    password = st.text_input("🔒 Please enter access password", type="password")
+
+    if password == APP_PASSWORD:
+        st.session_state.authenticated = True
+        st.rerun()  # 🔁 Clear the password input and reload
+    elif password:
+        st.error("❌ Incorrect password. Please try again.")
+    start_warmup()  # 🔥 Preload the heavy libraries in the background while the user types
+    st.stop()  # 🔒 Block access until correct
+
+# Heavy imports live below the gate so the login form renders without them
+import pandas as pd
+from charts import figure_bytes, new_figure
+from portfolio_compare import compare_portfolio, comparison_summary
+
+st.markdown("## 🏡 Real Estate Deal Evaluator")
+st.header("🏘️ Portfolio Comparison")
+st.write("Compare anywhere from 2 to 500 properties at once. Edit the table, paste rows, or upload a CSV.")
+
+# Editor column label -> calculate_metrics argument (one widget for every property)
+INPUT_COLUMNS = {
+    "Purchase Price ($)": "purchase_price",
+    "Monthly Rent ($)": "monthly_rent",
+    "Down Payment (%)": "down_payment_pct",
+    "Interest Rate (%)": "interest_rate",
+    "Loan Term (years)": "loan_term",
+    "Monthly Expenses ($)": "monthly_expenses",
+    "Vacancy Rate (%)": "vacancy_rate",
+    "Appreciation Rate (%)": "appreciation_rate",
+    "Rent Growth Rate (%)": "rent_growth_rate",
+    "Time Horizon (years)": "time_horizon",
+}
+MAX_PROPERTIES = 500
+
+DEFAULT_PROPERTIES = pd.DataFrame([
+    ["Property A", 300000, 2000, 20, 6.5, 30, 400, 5, 3, 3, 10],
+    ["Property B", 350000, 2500, 25, 6.5, 30, 500, 5, 3, 3, 10],
+    ["Property C", 250000, 1800, 20, 7.0, 30, 350, 8, 2, 2, 10],
+], columns=["Property"] + list(INPUT_COLUMNS))
+
+# 📥 Optional CSV upload (columns may use either the labels above or the argument names)
+uploaded = st.file_uploader("Upload properties (CSV)", type="csv")
+if uploaded is not None:
+    try:
+        properties = pd.read_csv(uploaded).rename(columns={v: k for k, v in INPUT_COLUMNS.items()})
+    except (ValueError, UnicodeDecodeError) as e:
+        st.error(f"❌ Couldn't read that CSV: {e}")
+        st.stop()
+    missing = [label for label in INPUT_COLUMNS if label not in properties.columns]
+    if missing:
+        st.error(f"❌ The CSV is missing these columns: {', '.join(missing)}")
+        st.stop()
+    if "Property" not in properties.columns:
+        properties.insert(0, "Property", [f"Property {i + 1}" for i in range(len(properties))])
+else:
+    properties = DEFAULT_PROPERTIES
+
+edited = st.data_editor(properties, num_rows="dynamic", width="stretch", key="portfolio_editor")
+
+# 🧹 Coerce inputs to numbers; blank rows are dropped, incomplete or invalid ones flagged and left out
+values = edited[list(INPUT_COLUMNS)].apply(pd.to_numeric, errors="coerce")
+blank = edited[list(INPUT_COLUMNS)].isna().all(axis=1)
+horizon, term = values["Time Horizon (years)"], values["Loan Term (years)"]
+valid = (values.notna().all(axis=1) & (horizon >= 1) & (horizon == horizon.round()) & (term > 0))
+invalid = edited[~valid & ~blank]
+if len(invalid):
+    names = invalid["Property"].fillna("").astype(str) if "Property" in invalid.columns else invalid.index.astype(str)
+    st.error(f"❌ Skipping {len(invalid)} row(s) with missing or non-numeric inputs, a time horizon under "
+             f"1 year or a loan term of 0: {', '.join(names.head(10))}" + (" …" if len(invalid) > 10 else ""))
+edited = edited[valid].assign(**{label: values.loc[valid, label] for label in INPUT_COLUMNS})
+if len(edited) > MAX_PROPERTIES:
+    over = edited.iloc[MAX_PROPERTIES:]
+    names = over["Property"].fillna("").astype(str) if "Property" in over.columns else over.index.astype(str)
+    st.warning(f"⚠️ Comparing the first {MAX_PROPERTIES} properties; leaving out the other {len(over)}: "
+               f"{', '.join(names.head(10))}" + (" …" if len(over) > 10 else ""))
+    edited = edited.head(MAX_PROPERTIES)
+
+if len(edited) < 2:
+    st.info("Add at least two complete properties to compare.")
+    st.stop()
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def run_comparison(frame):
+    inputs = {INPUT_COLUMNS[label]: frame[label] for label in INPUT_COLUMNS}
+    labels = frame["Property"].fillna("").astype(str).tolist()
+    labels = [label or f"Property {i + 1}" for i, label in enumerate(labels)]
+    return compare_portfolio(inputs, labels)
+
+try:
+    comparison = run_comparison(edited.reset_index(drop=True))
+except ValueError as e:
+    st.error(f"❌ Couldn't compare these properties: {e}")
+    st.stop()
+table = comparison.table
+
+# 🤖 Verdict
+st.subheader("🤖 AI Verdict")
+st.success(comparison_summary(comparison))
+
+# 📊 Ranked table — frontier first, then by IRR
+st.subheader("📊 Ranked Properties")
+ranked = table.sort_values(["Pareto Layer", "IRR (%)"], ascending=[True, False])
+st.dataframe(
+    ranked.style.apply(
+        lambda row: ["background-color: rgba(0, 128, 0, 0.25)" if row["Pareto Frontier"] else "" for _ in row],
+        axis=1),
+    width="stretch",
+    hide_index=True,
+)
+st.download_button(
+    label="⬇️ Download Comparison (CSV)",
+    data=ranked.to_csv(index=False).encode(),
+    file_name="portfolio_comparison.csv",
+    mime="text/csv",
+)
+
+# 🎯 Risk vs return — frontier highlighted
+st.subheader("🎯 Return vs Risk")
+fig = new_figure()
+ax = fig.subplots()
+others = table[~table["Pareto Frontier"]]
+frontier = table[table["Pareto Frontier"]]
+ax.scatter(others["Break-even Occupancy (%)"], others["IRR (%)"], color="grey", alpha=0.6, label="Dominated")
+ax.scatter(frontier["Break-even Occupancy (%)"], frontier["IRR (%)"], color="green", label="Pareto frontier")
+if len(table) <= 25:
+    for _, row in table.iterrows():
+        ax.annotate(row["Property"], (row["Break-even Occupancy (%)"], row["IRR (%)"]), fontsize=8)
+ax.set_xlabel("Break-even Occupancy (%) — lower is safer")
+ax.set_ylabel("IRR (%)")
+ax.grid(True)
+ax.legend()
+st.image(figure_bytes(fig), width="stretch")
+
+# 🧮 Pairwise dominance (readable up to a few dozen properties)
+if len(table) <= 40:
+    with st.expander("🧮 Dominance Matrix (row dominates column)"):
+        dom_fig = new_figure(figsize=(max(4, len(table) * 0.4), max(3, len(table) * 0.4)))
+        dom_ax = dom_fig.subplots()
+        dom_ax.imshow(comparison.dominance, cmap="Greens", vmin=0, vmax=1)
+        dom_ax.set_xticks(range(len(table)))
+        dom_ax.set_yticks(range(len(table)))
+        dom_ax.set_xticklabels(comparison.labels, rotation=90, fontsize=8)
+        dom_ax.set_yticklabels(comparison.labels, fontsize=8)
+        st.image(figure_bytes(dom_fig))
@@ -2,12 +2,7 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-import smtplib
-from email.message import EmailMessage
-import matplotlib.pyplot as plt
-from calculations import calculate_metrics
-from pdf_generator_single import generate_pdf
-from pdf_generator_single import generate_ai_verdict
+from warmup import start_warmup
 
 # 🔐 Password Gate — load from .env or fallback
 load_dotenv()
@@ -28,28 +23,53 @@ if not st.session_state.authenticated:
         st.rerun()  # 🔁 Clear the password input and reload
     elif password:
         st.error("❌ Incorrect password. Please try again.")
+    start_warmup()  # 🔥 Preload the heavy libraries in the background while the user types
     st.stop()  # 🔒 Block access until correct
     
 # ✅ MAIN APP STARTS HERE — only shown after password is correct
-#st.title("🏠 Real Estate Deal Evaluator")    
+
+# Heavy imports live below the gate so the login form renders without them
+from calculations import DEFAULT_SELLING_COST_PCT
+from metrics_cache import cached_calculate_metrics, thaw_metrics
+from pdf_generator_single import generate_pdf
+from portfolio_store import PortfolioStore
+from pdf_generator_single import generate_ai_verdict
+from mail_queue import start_mail_worker
+from report_cache import deferred_report
+from sensitivity import SWEEP_METRICS, default_range, sweep_grid, tornado
+from charts import figure_bytes, hold_year_chart, new_figure, projection_chart
+
+# --- Cached stages: inputs → metrics + verdict → charts → report ---
+# Each stage is keyed on its own inputs, so a rerun only recomputes what a widget change
+# actually feeds into; everything else comes back from cache. Sections with their own
+# widgets (sensitivity, save, email) are fragments and rerun on their own. The hold-year and
+# projection charts come from charts.py, which caches them for every session; the projection
+# chart is the same layout the PDF report draws, shown as SVG.
+
+@st.cache_data(show_spinner=False)
+def user_guide_pdf():
+    with open("pages/Investment_Metrics_User_Guide.pdf", "rb") as f:
+        return f.read()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def evaluate_deal(deal_inputs):
+    """Display metrics for a tuple of (input, value) pairs, with the AI verdict and grade added."""
+    metrics = thaw_metrics(cached_calculate_metrics(**dict(deal_inputs)))
+    summary_text, grade = generate_ai_verdict(metrics)
+    metrics["AI Verdict"] = summary_text
+    metrics["Grade"] = grade
+    return metrics
 
 
-# Title
-#st.markdown("<h1 style='text-align: center;'>🏡 Real Estate Deal Evaluator</h1>", unsafe_allow_html=True)
 st.markdown("""<div style='text-align: center; margin-top: -40px;'><h1>🏡 Real Estate Deal Evaluator</h1></div>""", unsafe_allow_html=True)
-#st.markdown("""<div style='width: 100%; padding-left: 10%;'><h1 style='text-align: left;'>🏡 Real Estate Deal Evaluator</h1></div>""", unsafe_allow_html=True)
-#st.markdown("### 🧾 Property & Loan Inputs")
 
 st.markdown("---")
-with open("pages/Investment_Metrics_User_Guide.pdf", "rb") as f:
-    st.download_button(
-        label="📘 Download User Manual (PDF)",
-        data=f,
-        file_name="Investment_Metrics_User_Guide.pdf",
-        mime="application/pdf"
-    )
-
-load_dotenv()
+st.download_button(
+    label="📘 Download User Manual (PDF)",
+    data=user_guide_pdf(),
+    file_name="Investment_Metrics_User_Guide.pdf",
+    mime="application/pdf"
+)
 
 # Sidebar inputs
 st.sidebar.header("📊 Property, Loan & Investment Settings")
@@ -64,36 +84,15 @@ appreciation_rate = st.sidebar.slider("Annual Appreciation Rate (%)", min_value=
 rent_growth_rate = st.sidebar.slider("Annual Rent Growth Rate (%)", min_value=0, max_value=10, value=3)
 time_horizon = st.sidebar.slider("⏳ Investment Time Horizon (Years)", min_value=1, max_value=30, value=10)
 
-# Calculate metrics
-metrics = calculate_metrics(
-    purchase_price,
-    monthly_rent,
-    down_payment_pct,
-    interest_rate,
-    loan_term,
-    monthly_expenses,
-    vacancy_rate,
-    appreciation_rate,
-    rent_growth_rate,
-    time_horizon
+base_inputs = (
+    ("purchase_price", purchase_price), ("monthly_rent", monthly_rent), ("down_payment_pct", down_payment_pct),
+    ("interest_rate", interest_rate), ("loan_term", loan_term), ("monthly_expenses", monthly_expenses),
+    ("vacancy_rate", vacancy_rate), ("appreciation_rate", appreciation_rate),
+    ("rent_growth_rate", rent_growth_rate), ("time_horizon", time_horizon),
 )
-irr_value = metrics.get("irr (%)", 0)
-#st.metric("IRR (%)", round(irr_value, 2))
-
-# Prepare inputs and call AI verdict generator
-verdict_input = {
-    "ROI (%)": metrics.get("ROI (%)"),
-    "Multi-Year Cash Flow": metrics.get("Multi-Year Cash Flow", []),
-    "Cap Rate (%)": metrics.get("Cap Rate (%)"),
-    "Cash-on-Cash Return (%)": metrics.get("Cash-on-Cash Return (%)"),
-    # this dict can be expanded as needed for future AI grading refinements
-}
-
-summary_text, grade = generate_ai_verdict(metrics)
 
-# Add verdict to metrics so pdf_generator can consume it
-metrics["AI Verdict"] = summary_text
-metrics["Grade"] = grade
+# Metrics + AI verdict (cached per input set; st.cache_data hands back a private copy)
+metrics = evaluate_deal(base_inputs)
 
 # Prepare property_data
 property_data = {
@@ -108,85 +107,180 @@ property_data = {
     "Rent Growth Rate (%)": rent_growth_rate
 }
 
-# Generate PDF
+# PDF is only built when the download or email action asks for it (cached per input fingerprint)
 summary_text = f"This is a {metrics['Grade']}-grade rental with upside potential"
-pdf_bytes = generate_pdf(property_data, metrics, summary_text)
+pdf_report = deferred_report("single", generate_pdf, property_data, metrics, summary_text)
 
 # IRR and Equity Multiple
 st.subheader("📈 Long-Term Metrics")
-col1, col2 = st.columns(2)
-col1.metric("IRR (%)", f"{metrics.get('irr (%)', 0):.2f}")
+col1, col2, col3 = st.columns(3)
+col1.metric("IRR (%)", f"{metrics['irr (%)']:.2f}" if metrics.get("irr_converged") else "N/A")
 col2.metric("Equity Multiple", f"{metrics.get('equity_multiple', 0):.2f}")
+col3.metric("Net Sale Proceeds ($)", f"{metrics['Net Sale Proceeds ($)']:,.0f}")
+st.caption(f"IRR assumes a sale at the end of the horizon, net of {DEFAULT_SELLING_COST_PCT:g}% selling costs "
+           "and the loan payoff.")
+
+# 🏁 IRR if the property were sold after each year instead (drawn only while shown)
+if st.toggle("📉 IRR by Hold Year"):
+    st.image(hold_year_chart(tuple(metrics["IRR % by Hold Year"])), width="stretch")
 
-# Plotting
-# 📈 10-Year Cash Flow Projection
+# 📈 Multi-Year Cash Flow Projection (SVG of the chart the report draws)
 st.subheader("📈 Multi-Year Cash Flow Projection")
-fig, ax = plt.subplots()
+st.image(projection_chart(
+    tuple(metrics["Multi-Year Cash Flow"]),
+    tuple(metrics["Annual Rents $ (by year)"]),
+    tuple(metrics["Annual ROI % (by year)"]),
+), width="stretch")
 
-# Define common x-axis values — always based on time_horizon
-years = list(range(1, time_horizon + 1))
+# 🎯 Sensitivity Analysis — one batched sweep per axis pair; the sliders below only index into it
+SWEEPABLE_INPUTS = {
+    "Interest Rate (%)": "interest_rate",
+    "Expected Monthly Rent ($)": "monthly_rent",
+    "Purchase Price ($)": "purchase_price",
+    "Monthly Expenses ($)": "monthly_expenses",
+    "Down Payment (%)": "down_payment_pct",
+    "Vacancy Rate (%)": "vacancy_rate",
+    "Annual Appreciation Rate (%)": "appreciation_rate",
+    "Annual Rent Growth Rate (%)": "rent_growth_rate",
+}
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def sensitivity_cube(base_items, x_name, y_name):
+    base = dict(base_items)
+    return sweep_grid(base, {
+        x_name: default_range(x_name, base[x_name], steps=17),
+        y_name: default_range(y_name, base[y_name], steps=17),
+    })
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def tornado_rows(base_items, metric):
+    return tornado(dict(base_items), metric=metric)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def sensitivity_heatmap(base_items, x_label, y_label, metric, what_if_x, what_if_y):
+    x_name, y_name = SWEEPABLE_INPUTS[x_label], SWEEPABLE_INPUTS[y_label]
+    cube = sensitivity_cube(base_items, x_name, y_name)
+    heat_fig = new_figure()
+    heat_ax = heat_fig.subplots()
+    image = heat_ax.imshow(
+        cube.values[metric].T, origin="lower", aspect="auto", cmap="RdYlGn",
+        extent=[float(cube.coords[x_name][0]), float(cube.coords[x_name][-1]),
+                float(cube.coords[y_name][0]), float(cube.coords[y_name][-1])],
+    )
+    heat_ax.plot([what_if_x], [what_if_y], marker="x", color="black", markersize=10)
+    heat_ax.set_xlabel(x_label)
+    heat_ax.set_ylabel(y_label)
+    heat_ax.set_title(f"{metric} sensitivity")
+    heat_fig.colorbar(image, ax=heat_ax)
+    return figure_bytes(heat_fig)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def tornado_chart(base_items, metric):
+    rows = tornado_rows(base_items, metric)
+    labels = {v: k for k, v in SWEEPABLE_INPUTS.items()}
+    labels.update({"loan_term": "Loan Term (years)", "time_horizon": "Investment Time Horizon (Years)"})
+    torn_fig = new_figure()
+    torn_ax = torn_fig.subplots()
+    for i, row in enumerate(reversed(rows)):
+        torn_ax.barh(i, row["low"] - row["base"], left=row["base"], color="indianred")
+        torn_ax.barh(i, row["high"] - row["base"], left=row["base"], color="seagreen")
+    torn_ax.set_yticks(range(len(rows)))
+    torn_ax.set_yticklabels([labels.get(row["input"], row["input"]) for row in reversed(rows)])
+    torn_ax.axvline(rows[0]["base"] if rows else 0, color="black", linewidth=1)
+    torn_ax.set_xlabel(metric)
+    torn_ax.set_title("Tornado: low (red) / high (green) input")
+    return figure_bytes(torn_fig)
 
-# Plot primary y-axis: Cash Flow & Rent
-ax.plot(years, metrics["Multi-Year Cash Flow"], marker='o', linestyle='-', label="Multi-Year Cash Flow ($)")
-ax.plot(years, metrics["Annual Rents $ (by year)"], marker='s', linestyle='--', label="Projected Rent ($)")
-ax.set_xlabel("Year")
-ax.set_ylabel("Projected Cash Flow / Rent ($)")
-ax.grid(True)
+@st.fragment
+def sensitivity_section(base_inputs):
+    st.subheader("🎯 Sensitivity Analysis")
+    # A toggle rather than an expander: nothing below is swept or drawn until it's switched on
+    if st.toggle("What if rates, rents or prices change?"):
+        sc1, sc2, sc3 = st.columns(3)
+        x_label = sc1.selectbox("Horizontal axis", list(SWEEPABLE_INPUTS), index=0)
+        y_label = sc2.selectbox("Vertical axis", [k for k in SWEEPABLE_INPUTS if k != x_label], index=0)
+        sweep_metric = sc3.selectbox("Metric", SWEEP_METRICS, index=SWEEP_METRICS.index("irr (%)"))
+        x_name, y_name = SWEEPABLE_INPUTS[x_label], SWEEPABLE_INPUTS[y_label]
+        cube = sensitivity_cube(base_inputs, x_name, y_name)
 
-# Add second y-axis for ROI
-ax2 = ax.twinx()
-ax2.plot(years, metrics["Annual ROI % (by year)"], color='green', marker='^', linestyle='-', label="ROI (%)")
-ax2.set_ylabel("ROI (%)", color='green')
-ax2.tick_params(axis='y', labelcolor='green')
+        # What-if lookup: picks a grid point, no recompute
+        x_options = [round(float(v), 2) for v in cube.coords[x_name]]
+        y_options = [round(float(v), 2) for v in cube.coords[y_name]]
+        base_point = cube.index_of(**{x_name: dict(base_inputs)[x_name], y_name: dict(base_inputs)[y_name]})
+        what_if_x = st.select_slider(f"What if {x_label} were", options=x_options, value=x_options[base_point[0]])
+        what_if_y = st.select_slider(f"What if {y_label} were", options=y_options, value=y_options[base_point[1]])
+        what_if_value = cube.sel(sweep_metric, **{x_name: what_if_x, y_name: what_if_y})
+        base_value = float(cube.values[sweep_metric][base_point])
+        st.metric(sweep_metric, f"{what_if_value:,.2f}", delta=f"{what_if_value - base_value:,.2f} vs. current inputs")
 
-# Combine legends from both axes
-lines, labels = ax.get_legend_handles_labels()
-lines2, labels2 = ax2.get_legend_handles_labels()
-ax.legend(lines + lines2, labels + labels2, loc="upper left")
+        st.image(sensitivity_heatmap(base_inputs, x_label, y_label, sweep_metric, what_if_x, what_if_y),
+                 width="stretch")
+        st.image(tornado_chart(base_inputs, sweep_metric), width="stretch")
 
-# Title and Show Plot
-ax.set_title("Multi - Year Projected Cash Flow & ROI")
-st.pyplot(fig)
+sensitivity_section(base_inputs)
 
 # PDF Download Button
-if pdf_bytes is not None:
-    st.download_button(
-        label="📄 Download PDF Report",
-        data=pdf_bytes,
-        file_name="real_estate_report.pdf",
-        mime="application/pdf",
-        key="download_pdf_unique"   # ✅ Prevents collision
-    )
-else:
-    st.error("⚠️ PDF generation failed. Please check your input or logs.")
+st.download_button(
+    label="📄 Download PDF Report",
+    data=pdf_report,
+    file_name="real_estate_report.pdf",
+    mime="application/pdf",
+    key="download_pdf_unique"   # ✅ Prevents collision
+)
+
+# 💾 Save to Portfolio — persists inputs + metrics so the deal outlives this session
+@st.cache_resource
+def portfolio_store():
+    return PortfolioStore()
+
+@st.fragment
+def save_section(base_inputs):
+    deal_label = st.text_input("Deal name (optional)", placeholder="123 Main St")
+    if st.button("💾 Save to Portfolio"):
+        portfolio_store().upsert(dict(base_inputs), labels=[deal_label or None])
+        st.success(f"✅ Saved — {portfolio_store().count()} deals in your portfolio.")
+
+save_section(base_inputs)
 
 # Email Section
-st.markdown("### 📨 Email This Report")
-recipient_email = st.text_input("Enter email address to send the report", placeholder="you@example.com")
-
-# Debug diagnostics
-
-if st.button("Send Email Report") and recipient_email:
-    # ✅ UI-level validation of malformed email inputs
-    import re
-    if not re.match(r"[^@]+@[^@]+\.[^@]+", recipient_email):
-        st.error("❌ Please enter a valid email address.")
-        st.stop()
-    try:
-        st.write("📤 Attempting to send email...")
-        msg = EmailMessage()
-        msg["Subject"] = "Your Real Estate Evaluation Report"
-        msg["From"] = os.getenv("EMAIL_USER")  # ✅ From address
-        msg["To"] = recipient_email
-        msg.set_content("Please find attached your real estate evaluation report.")
-        pdf_bytes.seek(0)
-        msg.add_attachment(pdf_bytes.read(), maintype='application', subtype='pdf', filename="real_estate_report.pdf")
-
-        with smtplib.SMTP("smtp.gmail.com", 587) as smtp:
-            smtp.starttls()
-            smtp.login(os.getenv("EMAIL_USER"), os.getenv("EMAIL_PASSWORD")) # GMAIL was changed to EMAIL!!!
-            smtp.send_message(msg)
-
-        st.success(f"✅ Report sent to {recipient_email}!")
-    except Exception as e:
-        st.error(f"❌ Failed to send email: {e}")
+@st.cache_resource
+def mail_queue():
+    return start_mail_worker()
+
+@st.fragment
+def email_section(pdf_report):
+    st.markdown("### 📨 Email This Report")
+    recipient_email = st.text_input("Enter email address to send the report", placeholder="you@example.com")
+
+    if st.button("Send Email Report") and recipient_email:
+        # ✅ UI-level validation of malformed email inputs
+        import re
+        if not re.match(r"[^@]+@[^@]+\.[^@]+", recipient_email):
+            st.error("❌ Please enter a valid email address.")
+            return
+        # 📬 Queued and sent in the background, so the page doesn't wait on SMTP
+        try:
+            job_id = mail_queue().enqueue(
+                recipient_email,
+                "Your Real Estate Evaluation Report",
+                "Please find attached your real estate evaluation report.",
+                attachment=pdf_report(),
+                filename="real_estate_report.pdf",
+            )
+        except ValueError as e:
+            st.error(f"❌ Can't send to that address: {e}")
+            return
+        st.session_state.setdefault("mail_jobs", []).append(job_id)
+        st.success(f"📬 Report queued for {recipient_email} (job #{job_id}).")
+
+    # 📬 Delivery status of the emails sent from this session
+    jobs = st.session_state.get("mail_jobs", [])[-5:]
+    for job_id in jobs:
+        job = mail_queue().status(job_id)
+        if job:
+            note = f" — {job['last_error']}" if job["last_error"] and job["status"] != "sent" else ""
+            st.caption(f"Job #{job_id} to {job['recipient']}: {job['status']}{note}")
+    if jobs:
+        st.button("🔄 Refresh status")
+
+email_section(pdf_report)
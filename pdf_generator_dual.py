@@ -1,10 +1,11 @@
 
+import math
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet , ParagraphStyle
-from reportlab.pdfgen import canvas
+
+from grading import deal_metrics
+
+# ReportLab (and report_templates, which builds on it) is imported inside the PDF builders,
+# so importing this module for generate_ai_verdict doesn't pay for it
 
 # ✅ Keys to skip (prevent duplicates like "10yr Cash Flow")
 skip_keys = {"10Yr Cash Flow", "10yr Cash Flow"}
@@ -36,7 +37,10 @@ preferred_order = [
 def format_display_value(key, value):
     """Format all numbers according to the agreed rules."""
     if isinstance(value, (float, int)):
-            # Rule-based rounding
+        if not math.isfinite(value):
+            # e.g. cash-on-cash at 0% down, or an IRR that doesn't exist
+            return "N/A"
+        # Rule-based rounding
         if abs(value) >= 1:
             # round to nearest integer, no decimals
             return str(int(round(value)))
@@ -49,20 +53,11 @@ def format_display_value(key, value):
 
 # ✅ Define AI Verdict function BEFORE generate_pdf
 
-def parse_numeric(value):
-    try:
-        return float(str(value).replace(",", "").strip())
-    except:
-        return 0.0
 def generate_ai_verdict(metrics_a: dict, metrics_b: dict) -> tuple[str, str]:
-    print("🗝️ Property A keys:", list(metrics_a.keys()))
-    print("🗝️ Property B keys:", list(metrics_b.keys()))
-
-    roi_a = parse_numeric(metrics_a.get("Final Year ROI (%)") or metrics_a.get("ROI (%)", 0))
-    roi_b = parse_numeric(metrics_b.get("Final Year ROI (%)") or metrics_b.get("ROI (%)", 0))
-
-    coc_a = parse_numeric(metrics_a.get("Cash-on-Cash Return (%)", 0))
-    coc_b = parse_numeric(metrics_b.get("Cash-on-Cash Return (%)", 0))
+    """(summary, "A" or "B") — the property with the higher final-year ROI wins."""
+    a, b = deal_metrics(metrics_a), deal_metrics(metrics_b)
+    roi_a, coc_a = a["final_year_roi"], a["coc_return"]
+    roi_b, coc_b = b["final_year_roi"], b["coc_return"]
 
     # Example combined verdict
     verdict = f"""
@@ -75,64 +70,29 @@ def generate_ai_verdict(metrics_a: dict, metrics_b: dict) -> tuple[str, str]:
 
     return verdict.strip(), grade
 
-    #roi = parse_numeric(metrics.get("Final Year ROI (%)") or metrics.get("ROI (%)", 0))
-    roi = parse_numeric(metrics.get("Final Year ROI (%)"))
-    if roi == 0.0:
-        roi = parse_numeric(metrics.get("ROI (%)", 0))
-    #cash_flow = parse_numeric(metrics.get("Annual Cash Flow ($)", 0))
-    coc_return = parse_numeric(metrics.get("Cash-on-Cash Return (%)", 0))
-
-    # ✅ Use Multi-Year Cash Flow to sum total
-    raw_cash_flow = metrics.get("Multi-Year Cash Flow", [])
-    print("🧾 Raw cash flow data (before processing):", raw_cash_flow)
-
-    #print("🧾 Raw cash flow data (before processing):", raw_cash_flow)  # Debug line
-
-   # ✅ Step 1: Handle case where it's a comma-separated string
-    if isinstance(raw_cash_flow, str):
-        try:
-            raw_cash_flow = [parse_numeric(x) for x in raw_cash_flow.split(",")]
-        except:
-            raw_cash_flow = []
-
-    elif isinstance(raw_cash_flow, list):
-        raw_cash_flow = [parse_numeric(x) for x in raw_cash_flow]
-    else:
-        raw_cash_flow = []
-
-    cash_flow = sum(raw_cash_flow)
-
-    print("🧾 Parsed cash flow list:", raw_cash_flow)
-    print(f"🧪 Debug: ROI={roi}, CashFlow={cash_flow}, CoC Return={coc_return}")
-    
-    # Sample grading logic
-    if roi > 200 and cash_flow > 20000 and coc_return >= 5:
-        grade = "A"
-        summary = "This is an A-grade investment with high returns and strong cash flow."
-    elif roi > 100 and cash_flow > 10000 and coc_return >= 0:
-        grade = "B"
-        summary = "This is a B-grade investment with solid performance and good ROI."
-    elif roi > 50 and cash_flow > 5000 and coc_return >= -5:
-        grade = "C"
-        summary = "This is a C-grade investment with modest returns."
-    elif roi > 0 and cash_flow > 0 and coc_return >= 6:
-        grade = "D"
-        summary = "This is a D-grade investment with marginal upside potential."
-    else:
-        grade = "F"
-        summary = "This is an F-grade rental with upside potential."
-
-    return summary, grade
-
-def generate_pdf(property_data, metrics_a, metrics_b, summary_text):
+# Yearly series plotted in the comparison chart, for A then B, in charts.comparison_chart order
+CHART_SERIES = ("Multi-Year Cash Flow", "Annual Rents $ (by year)", "Annual ROI % (by year)")
+
+def chart_flowable(metrics_a, metrics_b):
+    """The page's comparison chart as a vector ChartFlowable, or None if either property has no yearly series."""
+    series = [metrics.get(key) for key in CHART_SERIES for metrics in (metrics_a, metrics_b)]
+    if not all(isinstance(values, (list, tuple)) and len(values) for values in series):
+        return None
+    from charts import comparison_layout
+    from report_templates import ChartFlowable
+    return ChartFlowable(comparison_layout(*series))
+
+def generate_pdf(property_data, metrics_a, metrics_b, summary_text, include_charts=True):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    from report_templates import METRICS_TABLE, SIDE_BY_SIDE_TABLE, STYLES
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     elements = []
 
-    styles = getSampleStyleSheet()
-    title_style = styles["Heading1"]
-    title_style.alignment = 1
-    elements.append(Paragraph("🏘️ Property Comparison Summary", title_style))
+    styles = STYLES
+    elements.append(Paragraph("🏘️ Property Comparison Summary", styles["CenteredHeading1"]))
     elements.append(Spacer(1, 12))
 
     # Shared Property Data
@@ -148,12 +108,7 @@ def generate_pdf(property_data, metrics_a, metrics_b, summary_text):
         table_data.append([key, a_val, b_val])
 
     table = Table(table_data, colWidths=[180, 150, 150])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, -1), 10),
-    ]))
+    table.setStyle(SIDE_BY_SIDE_TABLE)
     elements.append(table)
     elements.append(Spacer(1, 12))
 
@@ -162,6 +117,11 @@ def generate_pdf(property_data, metrics_a, metrics_b, summary_text):
     elements.append(verdict_para)
     elements.append(Spacer(1, 24))
 
+    # 📈 Cash flow, rent and ROI for both properties (its layout is cached in charts.py)
+    chart = chart_flowable(metrics_a, metrics_b) if include_charts else None
+    if chart is not None:
+        elements.extend([chart, Spacer(1, 24)])
+
     # ✅ Metrics for A and B, cleaned and ordered
     preferred_order = [
         "Cap Rate (%)", "Cash-on-Cash Return (%)", "Final Year ROI (%)",
@@ -191,12 +151,7 @@ def generate_pdf(property_data, metrics_a, metrics_b, summary_text):
                     metrics_cleaned.append([key, value])
 
         table_metrics = Table(metrics_cleaned, colWidths=[200, 350])
-        table_metrics.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, -1), 10),
-        ]))
+        table_metrics.setStyle(METRICS_TABLE)
         elements.append(table_metrics)
         elements.append(Spacer(1, 12))
 
@@ -212,6 +167,9 @@ generate_pdf_report = generate_pdf
 #### ***** Full generate_comparison_pdf()  ******
 
 def generate_comparison_pdf(metrics_a, metrics_b):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
 
@@ -251,6 +209,9 @@ def generate_comparison_pdf(metrics_a, metrics_b):
 # ==============================
 
 def generate_comparison_pdf(metrics_a, metrics_b):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
     c.drawString(100, 750, "Comparison Report")
@@ -271,31 +232,21 @@ def generate_comparison_pdf(metrics_a, metrics_b):
     buffer.seek(0)
     return buffer.getvalue()
 
-def generate_comparison_pdf_table_style(metrics_a, metrics_b):
+def generate_comparison_pdf_table_style(metrics_a, metrics_b, include_charts=True):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    from report_templates import COMPARISON_GRID_TABLE, STYLES, TITLE_BANNER_TABLE, VERDICT_STYLES
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     elements = []
 
-    styles = getSampleStyleSheet()
-    normal_style = styles["Normal"]
-    verdict_styles = {
-        "A": ParagraphStyle('A', textColor=colors.darkgreen, fontSize=10, spaceAfter=4),
-        "B": ParagraphStyle('B', textColor=colors.green, fontSize=10, spaceAfter=4),
-        "C": ParagraphStyle('C', textColor=colors.orange, fontSize=10, spaceAfter=4),
-        "D": ParagraphStyle('D', textColor=colors.red, fontSize=10, spaceAfter=4),
-        "F": ParagraphStyle('F', textColor=colors.red, fontSize=10, spaceAfter=4),
-    }
+    normal_style = STYLES["Normal"]
 
     # Title Row
     title_data = [["📊 Property Comparison Summary", "", ""]]
     title_table = Table(title_data, colWidths=[200, 150, 150])
-    title_table.setStyle(TableStyle([
-        ('SPAN', (0, 0), (-1, 0)),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.darkblue),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-    ]))
+    title_table.setStyle(TITLE_BANNER_TABLE)
     elements.append(title_table)
 
     # Comparison Table
@@ -337,23 +288,8 @@ def generate_comparison_pdf_table_style(metrics_a, metrics_b):
     # Render the table
     col_widths = [200, 150, 150]
     comparison_table = Table(table_data, colWidths=col_widths)
-    comparison_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
-        # ✅ Center just the "Multi-Year Cash Flow" row label
-    for row_index, row in enumerate(table_data):
-        if row[0] == "Multi-Year Cash Flow":
-            table.setStyle(TableStyle([
-                ('ALIGN', (0, row_index), (0, row_index), 'CENTER'),
-            ]))
+    # ALIGN CENTER covers every cell, the "Multi-Year Cash Flow" label included
+    comparison_table.setStyle(COMPARISON_GRID_TABLE)
     elements.append(comparison_table)
     elements.append(Spacer(1, 12))
 
@@ -363,13 +299,18 @@ def generate_comparison_pdf_table_style(metrics_a, metrics_b):
     verdict_text = "(AI-generated grade based on estimated ROI, cash flow, and risk factors. Informational only.)"
 
     verdicts = [
-        Paragraph(f"■ AI Verdict for Property A:<br/><b>This is a {grade_a}-grade investment.</b>", verdict_styles.get(grade_a, normal_style)),
-        Paragraph(f"■ AI Verdict for Property B:<br/><b>This is a {grade_b}-grade investment.</b>", verdict_styles.get(grade_b, normal_style)),
+        Paragraph(f"■ AI Verdict for Property A:<br/><b>This is a {grade_a}-grade investment.</b>", VERDICT_STYLES.get(grade_a, normal_style)),
+        Paragraph(f"■ AI Verdict for Property B:<br/><b>This is a {grade_b}-grade investment.</b>", VERDICT_STYLES.get(grade_b, normal_style)),
         Spacer(1, 6),
-        Paragraph(verdict_text, ParagraphStyle('small', fontSize=10, textColor=colors.black))
+        Paragraph(verdict_text, STYLES["Disclaimer"])
     ]
     elements.extend(verdicts)
 
+    # 📈 Cash flow, rent and ROI for both properties
+    chart = chart_flowable(metrics_a, metrics_b) if include_charts else None
+    if chart is not None:
+        elements.extend([Spacer(1, 18), chart])
+
     doc.build(elements)
     buffer.seek(0)
     return buffer.getvalue()
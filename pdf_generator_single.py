@@ -1,9 +1,11 @@
 
+import math
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
+
+from grading import VERDICT_RULES, batch_metrics, deal_metrics
+
+# ReportLab (and report_templates, which builds on it) is imported inside generate_pdf, so
+# importing this module for the verdict functions doesn't pay for it
 
 # ✅ Keys to skip (prevent duplicates like "10yr Cash Flow")
 skip_keys = {"10Yr Cash Flow", "10yr Cash Flow"}
@@ -35,7 +37,10 @@ preferred_order = [
 def format_display_value(key, value):
     """Format all numbers according to the agreed rules."""
     if isinstance(value, (float, int)):
-            # Rule-based rounding
+        if not math.isfinite(value):
+            # e.g. cash-on-cash at 0% down, or an IRR that doesn't exist
+            return "N/A"
+        # Rule-based rounding
         if abs(value) >= 1:
             # round to nearest integer, no decimals
             return str(int(round(value)))
@@ -47,69 +52,41 @@ def format_display_value(key, value):
     return str(value)
 
 # ✅ Define AI Verdict function BEFORE generate_pdf
+# Thresholds and summaries live in grading.VERDICT_POLICY, shared with the batch path
 
-def parse_numeric(value):
-    try:
-        return float(str(value).replace(",", "").strip())
-    except:
-        return 0.0
 def generate_ai_verdict(metrics: dict) -> tuple[str, str]:
-    print("🗝️ Available metric keys:", list(metrics.keys()))
-
-    #roi = parse_numeric(metrics.get("Final Year ROI (%)") or metrics.get("ROI (%)", 0))
-    roi = parse_numeric(metrics.get("Final Year ROI (%)"))
-    if roi == 0.0:
-        roi = parse_numeric(metrics.get("ROI (%)", 0))
-    #cash_flow = parse_numeric(metrics.get("Annual Cash Flow ($)", 0))
-    coc_return = parse_numeric(metrics.get("Cash-on-Cash Return (%)", 0))
-
-    # ✅ Use Multi-Year Cash Flow to sum total
-    raw_cash_flow = metrics.get("Multi-Year Cash Flow", [])
-    print("🧾 Raw cash flow data (before processing):", raw_cash_flow)
-
-    #print("🧾 Raw cash flow data (before processing):", raw_cash_flow)  # Debug line
+    """(summary, grade) for one deal's calculate_metrics dict."""
+    return VERDICT_RULES.deal_verdict(deal_metrics(metrics))
+
+def generate_ai_verdict_batch(final_roi, multi_year_cash_flow, coc_return):
+    """Vectorized generate_ai_verdict: per-deal ROI/CoC arrays and an (n, years) NaN-padded cash-flow matrix."""
+    return VERDICT_RULES.verdicts(batch_metrics({
+        "Final Year ROI (%)": final_roi,
+        "Cash-on-Cash Return (%)": coc_return,
+        "Multi-Year Cash Flow": multi_year_cash_flow,
+    }))
+
+# Yearly series plotted in the report's projection chart, in charts.projection_chart order
+CHART_SERIES = ("Multi-Year Cash Flow", "Annual Rents $ (by year)", "Annual ROI % (by year)")
+
+def chart_flowable(metrics):
+    """The page's projection chart as a vector ChartFlowable, or None if the metrics have no yearly series."""
+    series = [metrics.get(key) for key in CHART_SERIES]
+    if not all(isinstance(values, (list, tuple)) and len(values) for values in series):
+        return None
+    from charts import projection_layout
+    from report_templates import ChartFlowable
+    return ChartFlowable(projection_layout(*series))
+
+def generate_pdf(property_data, metrics, summary_text, include_charts=True):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    from report_templates import INPUTS_TABLE, METRICS_TABLE, STYLES
 
-   # ✅ Step 1: Handle case where it's a comma-separated string
-    if isinstance(raw_cash_flow, str):
-        try:
-            raw_cash_flow = [parse_numeric(x) for x in raw_cash_flow.split(",")]
-        except:
-            raw_cash_flow = []
-
-    elif isinstance(raw_cash_flow, list):
-        raw_cash_flow = [parse_numeric(x) for x in raw_cash_flow]
-    else:
-        raw_cash_flow = []
-
-    cash_flow = sum(raw_cash_flow)
-
-    print("🧾 Parsed cash flow list:", raw_cash_flow)
-    print(f"🧪 Debug: ROI={roi}, CashFlow={cash_flow}, CoC Return={coc_return}")
-    
-    # Sample grading logic
-    if roi > 200 and cash_flow > 20000 and coc_return >= 5:
-        grade = "A"
-        summary = "This is an A-grade investment with high returns and strong cash flow."
-    elif roi > 100 and cash_flow > 10000 and coc_return >= 0:
-        grade = "B"
-        summary = "This is a B-grade investment with solid performance and good ROI."
-    elif roi > 50 and cash_flow > 5000 and coc_return >= -5:
-        grade = "C"
-        summary = "This is a C-grade investment with modest returns."
-    elif roi > 0 and cash_flow > 0 and coc_return >= 6:
-        grade = "D"
-        summary = "This is a D-grade investment with marginal upside potential."
-    else:
-        grade = "F"
-        summary = "This is an F-grade rental with upside potential."
-
-    return summary, grade
-
-def generate_pdf(property_data, metrics, summary_text):
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     elements = []
-    styles = getSampleStyleSheet()
+    styles = STYLES
 
     # Title
     elements.append(Paragraph("Real Estate Evaluator Report", styles["Title"]))
@@ -131,11 +108,7 @@ def generate_pdf(property_data, metrics, summary_text):
     elements.append(Paragraph("<b>🏠 Property & Loan Inputs</b>", styles["Heading3"]))
     inputs_data = [[k, str(v)] for k, v in property_data.items()]
     table_inputs = Table(inputs_data, colWidths=[200, 300])
-    table_inputs.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-    ]))
+    table_inputs.setStyle(INPUTS_TABLE)
     elements.append(table_inputs)
     elements.append(Spacer(1, 12))
 
@@ -166,14 +139,14 @@ def generate_pdf(property_data, metrics, summary_text):
                 metrics_cleaned.append([key, value])   
 
     table_metrics = Table(metrics_cleaned, colWidths=[200, 350])  # wider cell
-    table_metrics.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, -1), 10),
-    ]))
+    table_metrics.setStyle(METRICS_TABLE)
     elements.append(table_metrics)
 
+    # 📈 Projection chart (its layout is cached in charts.py)
+    chart = chart_flowable(metrics) if include_charts else None
+    if chart is not None:
+        elements.extend([Spacer(1, 18), chart])
+
     # Build PDF
     doc.build(elements)
     buffer.seek(0)
@@ -0,0 +1,119 @@
+"""Compare any number of properties at once.
+
+compare_portfolio evaluates every candidate in one calculate_metrics_batch call and ranks
+them by Pareto dominance over (IRR, cash-on-cash, total cash flow, risk), where risk is
+the break-even occupancy: the share of the rent needed to cover expenses and the mortgage.
+Property i dominates j when it is at least as good on every objective and strictly better
+on one; the Pareto frontier is every property nobody dominates.
+"""
+import numpy as np
+
+from calculations import METRIC_INPUTS, calculate_metrics_batch
+
+# (column, True when higher is better)
+OBJECTIVES = (
+    ("IRR (%)", True),
+    ("Cash-on-Cash Return (%)", True),
+    ("Total Cash Flow ($)", True),
+    ("Break-even Occupancy (%)", False),
+)
+
+
+class PortfolioComparison:
+    """Per-property table, dominance matrix (dominance[i, j]: i dominates j) and frontier."""
+
+    def __init__(self, labels, table, dominance):
+        self.labels = list(labels)
+        self.table = table
+        self.dominance = dominance
+
+    @property
+    def frontier(self):
+        return [label for label, on in zip(self.labels, self.table["Pareto Frontier"]) if on]
+
+    def dominance_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.dominance, index=self.labels, columns=self.labels)
+
+
+def break_even_occupancy(monthly_rent, monthly_expenses, monthly_mortgage):
+    """Occupancy (% of full rent) at which year-one rent covers expenses + mortgage."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(monthly_rent > 0, (monthly_expenses + monthly_mortgage) / monthly_rent * 100, np.inf)
+
+
+def dominance_matrix(objectives, maximize):
+    """(n, n) boolean matrix for an (n, k) objective array; NaN counts as the worst value."""
+    signed = np.where(maximize, objectives, -objectives)
+    signed = np.where(np.isnan(signed), -np.inf, signed)
+    at_least = (signed[:, None, :] >= signed[None, :, :]).all(axis=2)
+    better = (signed[:, None, :] > signed[None, :, :]).any(axis=2)
+    return at_least & better
+
+
+def pareto_layers(dominance):
+    """Non-dominated sorting: 1 for the frontier, 2 for the frontier once layer 1 is removed, ..."""
+    n = dominance.shape[0]
+    layer = np.zeros(n, dtype=int)
+    remaining = np.ones(n, dtype=bool)
+    current = 1
+    while remaining.any():
+        dominated = (dominance[remaining][:, remaining]).any(axis=0)
+        members = np.flatnonzero(remaining)[~dominated]
+        layer[members] = current
+        remaining[members] = False
+        current += 1
+    return layer
+
+
+def compare_portfolio(inputs, labels=None):
+    """Evaluate and rank a set of properties.
+
+    `inputs` is a DataFrame or dict of columns named like METRIC_INPUTS (one row per
+    property); `labels` defaults to "Property 1..N".
+    """
+    import pandas as pd
+
+    columns = {name: np.atleast_1d(np.asarray(inputs[name], dtype=float)) for name in METRIC_INPUTS}
+    n = len(columns["purchase_price"])
+    labels = list(labels) if labels is not None else [f"Property {i + 1}" for i in range(n)]
+    if len(labels) != n:
+        raise ValueError(f"got {len(labels)} labels for {n} properties")
+
+    batch = calculate_metrics_batch(columns, irr_curve=False)
+    table = pd.DataFrame({
+        "Property": labels,
+        "Purchase Price ($)": columns["purchase_price"],
+        "IRR (%)": np.where(batch["irr_converged"], batch["irr (%)"], np.nan),
+        "Cash-on-Cash Return (%)": batch["Cash-on-Cash Return (%)"],
+        "Total Cash Flow ($)": np.round(np.nansum(batch["Multi-Year Cash Flow"], axis=1), 2),
+        "Break-even Occupancy (%)": np.round(break_even_occupancy(
+            columns["monthly_rent"], columns["monthly_expenses"], batch["Monthly Mortgage ($)"]), 2),
+        "Cap Rate (%)": batch["Cap Rate (%)"],
+        "Grade": batch["Grade"],
+    })
+
+    objectives = table[[name for name, _ in OBJECTIVES]].to_numpy(dtype=float)
+    dominance = dominance_matrix(objectives, np.array([up for _, up in OBJECTIVES]))
+    table["Dominates"] = dominance.sum(axis=1)
+    table["Dominated By"] = dominance.sum(axis=0)
+    table["Pareto Layer"] = pareto_layers(dominance)
+    table["Pareto Frontier"] = table["Pareto Layer"] == 1
+    return PortfolioComparison(labels, table, dominance)
+
+
+def comparison_summary(comparison):
+    """Plain-language verdict for N properties (the N-way counterpart of the A-vs-B verdict)."""
+    table = comparison.table
+    frontier = comparison.frontier
+    best_irr = table.loc[table["IRR (%)"].idxmax(), "Property"] if table["IRR (%)"].notna().any() else None
+    safest = table.loc[table["Break-even Occupancy (%)"].idxmin(), "Property"]
+
+    summary = f"{len(frontier)} of {len(table)} properties are on the Pareto frontier: {', '.join(map(str, frontier))}."
+    if best_irr is not None:
+        summary += f" Highest IRR: {best_irr}."
+    summary += f" Lowest break-even occupancy: {safest}."
+    if len(frontier) == 1:
+        summary += f" {frontier[0]} is at least as good as every other property on all four measures."
+    return summary
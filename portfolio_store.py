@@ -0,0 +1,238 @@
+"""Embedded SQLite store for evaluated deals.
+
+    store = PortfolioStore("portfolio.db")
+    store.upsert(listings_df)                                   # evaluates + saves in bulk
+    store.query(grades="AB", max_price=400_000, order_by="irr", limit=50)
+
+Inputs and scalar metrics are plain indexed columns, so screens like "top 50 B-or-better
+deals under $400k" are index range scans. The grades screened on are the A-F verdict the
+pages and reports show (verdict_grade); grade keeps calculate_metrics' cash-on-cash grade. Each per-year series is stored as a float64
+blob (one per series column) and comes back as a MetricsResult. The hold-year IRR curve
+is the exception: it costs ~5x the rest of the evaluation, so bulk writes skip it and
+get() solves it for the one deal asked for. Deals are keyed by the content hash of their
+inputs (metrics_cache.input_keys, which doesn't change with CACHE_VERSION) unless ids are
+given, so re-saving the same deal updates it in place. The store's one connection is
+shared by every thread that uses it (the pages keep a single store per process), so each
+use of it holds a lock.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from calculations import METRIC_INPUTS, calculate_metrics_batch
+from metrics_cache import input_keys
+from metrics_result import SCALAR_FIELDS, SERIES_FIELDS, MetricsResult
+
+DEFAULT_PATH = os.getenv("PORTFOLIO_DB", "portfolio.db")
+
+# Scalar metric columns: (column, calculate_metrics_batch key)
+METRIC_COLUMNS = SCALAR_FIELDS + (
+    ("irr", "irr (%)"),
+    ("irr_converged", "irr_converged"),
+    ("equity_multiple", "equity_multiple"),
+    ("net_sale_proceeds", "Net Sale Proceeds ($)"),
+    ("grade", "Grade"),  # the cash-on-cash grade; the verdict is verdict_grade
+)
+# Stored series (every SERIES_FIELDS row but the hold-year IRR curve, which get() solves)
+STORED_SERIES = tuple((field, key) for field, key in SERIES_FIELDS if field != "irr_by_hold_year")
+SERIES_COLUMNS = tuple(field for field, _ in STORED_SERIES)
+
+# Metric columns SQLite may hold as NULL (it stores NaN that way)
+_NULLABLE = tuple(c for c, _ in METRIC_COLUMNS if c not in ("grade", "irr_converged"))
+
+# Deals graded per batch when a store from before verdict_grade is opened
+_BACKFILL_ROWS = 50_000
+
+# Refresh planner statistics after bulk writes this large, so filtered top-N queries
+# walk the sort index instead of sorting every match
+_ANALYZE_AFTER_ROWS = 10_000
+
+# Columns query() may sort or filter on (all indexed)
+INDEXED_COLUMNS = ("verdict_grade", "grade", "cap_rate", "coc_return", "irr", "purchase_price")
+
+_COLUMNS = (("deal_id", "label") + METRIC_INPUTS + tuple(c for c, _ in METRIC_COLUMNS) + ("verdict_grade",)
+            + SERIES_COLUMNS + ("updated_at",))
+
+
+def _schema():
+    types = {"deal_id": "TEXT PRIMARY KEY", "label": "TEXT", "grade": "TEXT", "irr_converged": "INTEGER",
+             "verdict_grade": "TEXT", "updated_at": "REAL"}
+    types.update({column: "BLOB" for column in SERIES_COLUMNS})
+    columns = ",\n    ".join(f"{c} {types.get(c, 'REAL')}" for c in _COLUMNS)
+    table = f"CREATE TABLE IF NOT EXISTS deals (\n    {columns}\n)"
+    return table, [f"CREATE INDEX IF NOT EXISTS idx_deals_{c} ON deals ({c})" for c in INDEXED_COLUMNS]
+
+
+def _verdict_grades(batch):
+    """The A-F verdict (grading.VERDICT_RULES) of every deal in a calculate_metrics_batch result."""
+    from grading import VERDICT_RULES, batch_metrics
+
+    return VERDICT_RULES.grade(batch_metrics(batch)).tolist()
+
+
+class PortfolioStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-131072")  # 128 MB, keeps index pages hot during bulk upserts
+        table, indexes = _schema()
+        with self.conn:
+            self.conn.execute(table)
+            if "verdict_grade" not in {row[1] for row in self.conn.execute("PRAGMA table_info(deals)")}:
+                self.conn.execute("ALTER TABLE deals ADD COLUMN verdict_grade TEXT")
+                self._grade_saved_deals()
+            for statement in indexes:
+                self.conn.execute(statement)
+        self._lock = threading.Lock()
+
+    def _grade_saved_deals(self):
+        """Fill in verdict_grade for a store saved before it had one, re-evaluating deals from their inputs."""
+        last_id = ""
+        while True:
+            rows = self.conn.execute(f"SELECT deal_id, {', '.join(METRIC_INPUTS)} FROM deals WHERE deal_id > ? "
+                                     f"ORDER BY deal_id LIMIT ?", (last_id, _BACKFILL_ROWS)).fetchall()
+            if not rows:
+                return
+            ids, *inputs = zip(*rows)
+            columns = {name: np.array(values, dtype=float) for name, values in zip(METRIC_INPUTS, inputs)}
+            grades = _verdict_grades(calculate_metrics_batch(columns, irr_curve=False))
+            self.conn.executemany("UPDATE deals SET verdict_grade = ? WHERE deal_id = ?", zip(grades, ids))
+            last_id = ids[-1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- Writes ---
+    def upsert(self, inputs, ids=None, labels=None, batch=None):
+        """Evaluate (unless `batch` is given) and save deals; returns their deal ids.
+
+        `inputs` is a DataFrame or dict of columns named like METRIC_INPUTS. Existing
+        rows with the same id are replaced.
+        """
+        columns = {name: np.atleast_1d(np.asarray(inputs[name], dtype=float)) for name in METRIC_INPUTS}
+        columns = dict(zip(METRIC_INPUTS, np.broadcast_arrays(*columns.values())))
+        n_rows = len(columns["purchase_price"])
+        if batch is None:
+            batch = calculate_metrics_batch(columns, irr_curve=False)
+        if ids is None:
+            ids = input_keys(columns)
+        labels = list(labels) if labels is not None else [None] * n_rows
+
+        horizons = np.asarray(batch["Time Horizon"], dtype=int)
+        blobs = []
+        for _, key in STORED_SERIES:
+            matrix = np.ascontiguousarray(batch[key], dtype=np.float64)
+            blobs.append([matrix[i, :h].tobytes() for i, h in enumerate(horizons)])
+
+        values = [list(ids), labels]
+        values += [columns[name].tolist() for name in METRIC_INPUTS]
+        values += [np.asarray(batch[key]).tolist() for column, key in METRIC_COLUMNS]
+        values.append(_verdict_grades(batch))
+        values += blobs
+        values.append([time.time()] * n_rows)
+
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        updates = ", ".join(f"{c} = excluded.{c}" for c in _COLUMNS[1:])
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO deals ({', '.join(_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(deal_id) DO UPDATE SET {updates}",
+                zip(*values),
+            )
+            if n_rows >= _ANALYZE_AFTER_ROWS:
+                self.conn.execute("ANALYZE deals")
+        return list(ids)
+
+    def delete(self, ids):
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM deals WHERE deal_id = ?", ((i,) for i in ids))
+
+    # --- Reads ---
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+
+    def _where(self, grades, max_price, min_cap_rate, min_coc, min_irr):
+        clauses, params = [], []
+        if grades:
+            grades = list(grades)
+            clauses.append(f"verdict_grade IN ({', '.join('?' * len(grades))})")
+            params += grades
+        if max_price is not None:
+            clauses.append("purchase_price <= ?")
+            params.append(max_price)
+        for column, minimum in (("cap_rate", min_cap_rate), ("coc_return", min_coc), ("irr", min_irr)):
+            if minimum is not None:
+                clauses.append(f"{column} >= ?")
+                params.append(minimum)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, grades=None, max_price=None, min_cap_rate=None, min_coc=None, min_irr=None,
+              order_by="irr", descending=True, limit=50):
+        """Inputs + scalar metrics of matching deals as a DataFrame, best first.
+
+        `grades` is an iterable of verdict grade letters (e.g. "AB" for B-or-better).
+        """
+        import pandas as pd
+
+        if order_by not in INDEXED_COLUMNS:
+            raise ValueError(f"order_by must be one of {', '.join(INDEXED_COLUMNS)}")
+        where, params = self._where(grades, max_price, min_cap_rate, min_coc, min_irr)
+        scalar_columns = [c for c in _COLUMNS if c not in SERIES_COLUMNS]
+        sql = (f"SELECT {', '.join(scalar_columns)} FROM deals{where} "
+               f"ORDER BY {order_by} {'DESC' if descending else 'ASC'} LIMIT ?")
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params + [int(limit)])
+
+    def explain(self, **filters):
+        """SQLite's query plan for query(**filters) - handy to confirm an index is used."""
+        order_by = filters.pop("order_by", "irr")
+        where, params = self._where(filters.get("grades"), filters.get("max_price"), filters.get("min_cap_rate"),
+                                    filters.get("min_coc"), filters.get("min_irr"))
+        with self._lock:
+            rows = self.conn.execute(f"EXPLAIN QUERY PLAN SELECT deal_id FROM deals{where} ORDER BY {order_by} DESC",
+                                     params).fetchall()
+        return [row[-1] for row in rows]
+
+    def get(self, deal_id):
+        """Stored MetricsResult for one deal, or None."""
+        metric_columns = [c for c, _ in METRIC_COLUMNS]
+        selected = metric_columns + list(SERIES_COLUMNS) + list(METRIC_INPUTS)
+        with self._lock:
+            row = self.conn.execute(f"SELECT {', '.join(selected)} FROM deals WHERE deal_id = ?",
+                                    (deal_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(selected, row))
+        for column in _NULLABLE:
+            if record[column] is None:
+                record[column] = math.nan
+        series = [np.frombuffer(record[column], dtype=np.float64) for column in SERIES_COLUMNS]
+        # The hold-year IRR curve isn't stored; solve it for this deal from its inputs
+        curve = calculate_metrics_batch({name: [record[name]] for name in METRIC_INPUTS})["IRR % by Hold Year"]
+        series.append(curve[0, :len(series[0])])
+        return MetricsResult(
+            **{field: record[field] for field, _ in SCALAR_FIELDS},
+            grade=record["grade"], irr=record["irr"], irr_converged=bool(record["irr_converged"]),
+            equity_multiple=record["equity_multiple"], net_sale_proceeds=record["net_sale_proceeds"],
+            series=np.stack(series),
+        )
+
+    def get_inputs(self, deal_id):
+        with self._lock:
+            row = self.conn.execute(f"SELECT {', '.join(METRIC_INPUTS)} FROM deals WHERE deal_id = ?",
+                                    (deal_id,)).fetchone()
+        return dict(zip(METRIC_INPUTS, row)) if row else None
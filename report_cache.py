@@ -0,0 +1,71 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def report_fingerprint(kind, *args):
+    """Stable hash of a report's kind and the inputs it is built from."""
+    payload = json.dumps([kind, args], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _as_bytes(result):
+    # generate_pdf returns a BytesIO, the comparison generators return bytes
+    if hasattr(result, "getvalue"):
+        return result.getvalue()
+    return bytes(result)
+
+
+class ReportCache:
+    """Bounded LRU of finished PDF bytes keyed by report_fingerprint."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder, *args):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        pdf = _as_bytes(builder(*args))
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = pdf
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return pdf
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+
+# Process-wide cache shared by every session
+default_report_cache = ReportCache(maxsize=int(os.getenv("REPORT_CACHE_SIZE", "64")))
+
+
+def deferred_report(kind, builder, *args, cache=None):
+    """Zero-argument callable that builds (or fetches) the report only when invoked.
+
+    The inputs are snapshotted now, so later edits to the caller's dicts don't leak into
+    the report. Pass the callable straight to st.download_button(data=...) or call it
+    when an email is actually sent.
+    """
+    cache = cache or default_report_cache
+    args = copy.deepcopy(args)
+    key = report_fingerprint(kind, *args)
+
+    def build():
+        return cache.get_or_build(key, builder, *args)
+
+    return build
@@ -0,0 +1,191 @@
+"""Shared ReportLab styles for the PDF reports.
+
+Everything here is built once per process, when the module is first imported, and is
+read-only afterwards: reports reuse the same ParagraphStyle and TableStyle objects
+instead of calling getSampleStyleSheet() and rebuilding TableStyles on every build, and
+since nothing can be changed in place, concurrent builds can't leak edits into each
+other. For a variation, derive a new style:
+
+    STYLES["Normal"].clone("Small", fontSize=8)
+    TableStyle([("ALIGN", (0, 0), (-1, -1), "RIGHT")], parent=METRICS_TABLE)
+
+ChartFlowable draws a charts.ChartLayout into a report (the pages show the same layout as SVG).
+"""
+from types import MappingProxyType
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus import Flowable, TableStyle
+
+# Standard fonts used by the reports; their metrics are loaded here rather than mid-build
+FONTS = ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique")
+
+
+class FrozenParagraphStyle(ParagraphStyle):
+    """A ParagraphStyle that can't be modified; clone() returns an ordinary, editable copy."""
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"report style {self.name!r} is shared; clone() it instead of setting {name!r}")
+
+    def clone(self, name, parent=None, **kwds):
+        style = ParagraphStyle(name)
+        style.__dict__.update(self.__dict__, name=name, parent=parent)
+        style._setKwds(**kwds)
+        return style
+
+
+class FrozenTableStyle(TableStyle):
+    """A TableStyle whose command list can't be extended (pass it as parent= to build on it)."""
+
+    def __init__(self, cmds):
+        super().__init__(cmds)
+        self._cmds = tuple(self._cmds)
+
+    def add(self, *cmd):
+        raise TypeError("shared table style; use TableStyle(cmds, parent=...) for a variation")
+
+    def getCommands(self):
+        return list(self._cmds)
+
+
+def _freeze(style, **overrides):
+    frozen = object.__new__(FrozenParagraphStyle)
+    frozen.__dict__.update(style.__dict__, parent=None, **overrides)
+    return frozen
+
+
+def _build_styles():
+    sample = getSampleStyleSheet()
+    styles = {name: _freeze(style) for name, style in sample.byName.items()}
+    styles["CenteredHeading1"] = _freeze(sample["Heading1"], name="CenteredHeading1", alignment=TA_CENTER)
+    styles["Disclaimer"] = _freeze(ParagraphStyle("Disclaimer", fontSize=10, textColor=colors.black))
+    return MappingProxyType(styles)
+
+
+def _build_verdict_styles():
+    grade_colors = {"A": colors.darkgreen, "B": colors.green, "C": colors.orange, "D": colors.red, "F": colors.red}
+    return MappingProxyType({
+        grade: _freeze(ParagraphStyle(grade, textColor=color, fontSize=10, spaceAfter=4))
+        for grade, color in grade_colors.items()
+    })
+
+
+def _load_fonts():
+    for name in FONTS:
+        pdfmetrics.getFont(name)
+
+
+_load_fonts()
+
+# getSampleStyleSheet() names plus "CenteredHeading1" and "Disclaimer"
+STYLES = _build_styles()
+
+# Grade letter -> verdict paragraph style
+VERDICT_STYLES = _build_verdict_styles()
+
+# --- Table styles ---
+INPUTS_TABLE = FrozenTableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+])
+
+METRICS_TABLE = FrozenTableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+])
+
+SIDE_BY_SIDE_TABLE = FrozenTableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+])
+
+TITLE_BANNER_TABLE = FrozenTableStyle([
+    ("SPAN", (0, 0), (-1, 0)),
+    ("ALIGN", (0, 0), (-1, 0), "CENTER"),
+    ("FONTSIZE", (0, 0), (-1, 0), 14),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.darkblue),
+    ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+])
+
+COMPARISON_GRID_TABLE = FrozenTableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 9),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ("TOPPADDING", (0, 0), (-1, -1), 6),
+])
+
+
+# --- Charts ---
+
+def _stroke_operators(lines):
+    """PDF operators stroking each line (a sequence of (x, y) points) as one path."""
+    operators = []
+    for points in lines:
+        operators.append("%.2f %.2f m" % points[0])
+        operators.extend(["%.2f %.2f l" % point for point in points[1:]])
+    operators.append("S")
+    return " ".join(operators)
+
+
+class ChartFlowable(Flowable):
+    """A charts.ChartLayout drawn as vector graphics: one canvas path per line style, one text object for the labels.
+
+    The layout is read-only and may be shared with other reports (charts.py caches it).
+    """
+
+    def __init__(self, chart):
+        super().__init__()
+        self.chart = chart
+        self.width, self.height = chart.width, chart.height
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        canvas = self.canv
+        # Stroke color, width and dash are only set when they change from the previous path,
+        # and likewise font and color for the labels
+        color = width = dash = None
+        for style in self.chart.paths:
+            if color != style.color:
+                color = style.color
+                canvas.setStrokeColorRGB(*color)
+            if width != style.width:
+                width = style.width
+                canvas.setLineWidth(width)
+            if dash != (style.dash or ()):
+                dash = style.dash or ()
+                canvas.setDash(list(dash))
+            # The points go in as literal path operators: canvas.beginPath costs a method
+            # call and an fp_str per point, more than the whole join here
+            canvas.addLiteral(_stroke_operators(style.lines))
+        if not self.chart.labels:
+            return
+
+        text = canvas.beginText()
+        font = color = None
+        for label in self.chart.labels:
+            if font != (label.font, label.size):
+                font = (label.font, label.size)
+                text.setFont(*font)
+            if color != label.color:
+                color = label.color
+                text.setFillColorRGB(*color)
+            turn = label.angle // 90
+            text.setTextTransform(1 - abs(turn), turn, -turn, 1 - abs(turn), label.x, label.y)
+            # textLine rather than textOut: every label sets its own position, so the
+            # string width textOut measures to advance the cursor would go unused
+            text.textLine(label.text)
+        canvas.drawText(text)
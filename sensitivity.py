@@ -0,0 +1,140 @@
+"""Sensitivity sweeps over calculate_metrics inputs.
+
+sweep_grid evaluates a full Cartesian grid over any subset of inputs in one
+calculate_metrics_batch call and returns a labeled cube; tornado evaluates one-at-a-time
+low/high perturbations of each input, also in a single batch.
+"""
+import numpy as np
+
+from calculations import METRIC_INPUTS, calculate_metrics_batch
+
+SWEEP_METRICS = (
+    "Cap Rate (%)", "Cash-on-Cash Return (%)", "Final Year ROI (%)", "First Year Cash Flow ($)",
+    "Monthly Mortgage ($)", "irr (%)", "equity_multiple",
+)
+
+# How default sweep ranges are built: dollars move by a fraction of the base value,
+# rates by percentage points, years by whole years
+_MONEY_INPUTS = ("purchase_price", "monthly_rent", "monthly_expenses")
+_YEAR_INPUTS = ("loan_term", "time_horizon")
+
+
+class SweepResult:
+    """Metric cubes over a grid of inputs: values[metric] has one axis per name in dims."""
+
+    def __init__(self, dims, coords, values):
+        self.dims = tuple(dims)
+        self.coords = coords
+        self.values = values
+
+    @property
+    def shape(self):
+        return tuple(len(self.coords[d]) for d in self.dims)
+
+    def index_of(self, **point):
+        """Grid index nearest to the given input values (one value per dim)."""
+        return tuple(int(np.abs(self.coords[d] - point[d]).argmin()) for d in self.dims)
+
+    def sel(self, metric, **point):
+        """Value of `metric` at the grid point nearest to `point` - a lookup, no recompute."""
+        return float(self.values[metric][self.index_of(**point)])
+
+    def to_frame(self):
+        import pandas as pd
+
+        mesh = np.meshgrid(*[self.coords[d] for d in self.dims], indexing="ij")
+        data = {d: m.ravel() for d, m in zip(self.dims, mesh)}
+        data.update({metric: cube.ravel() for metric, cube in self.values.items()})
+        return pd.DataFrame(data)
+
+
+def _check_inputs(base_inputs, names):
+    missing = [name for name in METRIC_INPUTS if name not in base_inputs]
+    if missing:
+        raise ValueError(f"base inputs are missing: {', '.join(missing)}")
+    unknown = [name for name in names if name not in METRIC_INPUTS]
+    if unknown:
+        raise ValueError(f"can't sweep unknown inputs: {', '.join(unknown)}")
+
+
+def sweep_grid(base_inputs, grid, metrics=SWEEP_METRICS):
+    """Evaluate every combination of `grid` ({input name: values}) around `base_inputs`.
+
+    Inputs not in `grid` stay at their base value. Returns a SweepResult whose cubes have
+    shape (len(grid[dim0]), len(grid[dim1]), ...).
+    """
+    _check_inputs(base_inputs, grid)
+    dims = list(grid)
+    coords = {d: np.asarray(grid[d], dtype=float) for d in dims}
+    mesh = np.meshgrid(*[coords[d] for d in dims], indexing="ij")
+    shape = mesh[0].shape if mesh else ()
+
+    columns = {name: np.full(int(np.prod(shape)), float(base_inputs[name])) for name in METRIC_INPUTS}
+    for d, m in zip(dims, mesh):
+        columns[d] = m.ravel()
+
+    batch = calculate_metrics_batch(columns, irr_curve=False)
+    values = {metric: np.asarray(batch[metric], dtype=float).reshape(shape) for metric in metrics}
+    return SweepResult(dims, coords, values)
+
+
+def default_range(name, base, steps=9):
+    """A reasonable sweep range for one input around its base value."""
+    base = float(base)
+    if name in _MONEY_INPUTS:
+        return np.linspace(base * 0.8, base * 1.2, steps)
+    if name in _YEAR_INPUTS:
+        low = max(1, int(base) - (steps // 2))
+        return np.arange(low, low + steps, dtype=float)
+    spread = 2.0 if name != "down_payment_pct" else 10.0
+    low = max(0.0, base - spread)
+    return np.linspace(low, low + 2 * spread, steps)
+
+
+def default_perturbations(base_inputs, names=None):
+    """Low/high pairs for a tornado chart: -10%/+10% on dollar inputs, -1/+1 point on rates."""
+    perturbations = {}
+    for name in names or METRIC_INPUTS:
+        base = float(base_inputs[name])
+        if name in _MONEY_INPUTS:
+            perturbations[name] = (base * 0.9, base * 1.1)
+        elif name in _YEAR_INPUTS:
+            perturbations[name] = (max(1.0, base - 5), base + 5)
+        else:
+            perturbations[name] = (max(0.0, base - 1), base + 1)
+    return perturbations
+
+
+def tornado(base_inputs, perturbations=None, metric="irr (%)"):
+    """One-at-a-time sensitivity of `metric`, widest swing first.
+
+    `perturbations` maps input names to (low, high) input values (default_perturbations
+    when omitted). The base case and all 2*k perturbed cases run as one batch.
+    """
+    perturbations = perturbations or default_perturbations(base_inputs)
+    _check_inputs(base_inputs, perturbations)
+    names = list(perturbations)
+
+    n_rows = 1 + 2 * len(names)
+    columns = {name: np.full(n_rows, float(base_inputs[name])) for name in METRIC_INPUTS}
+    for i, name in enumerate(names):
+        low, high = perturbations[name]
+        columns[name][1 + 2 * i] = low
+        columns[name][2 + 2 * i] = high
+
+    result = np.asarray(calculate_metrics_batch(columns, irr_curve=False)[metric], dtype=float)
+    base_value = float(result[0])
+    rows = []
+    for i, name in enumerate(names):
+        low_result, high_result = float(result[1 + 2 * i]), float(result[2 + 2 * i])
+        rows.append({
+            "input": name,
+            "low_input": float(perturbations[name][0]),
+            "high_input": float(perturbations[name][1]),
+            "low": low_result,
+            "high": high_result,
+            "base": base_value,
+            "swing": abs(high_result - low_result),
+        })
+    rows.sort(key=lambda row: -np.nan_to_num(row["swing"]))
+    return rows
@@ -0,0 +1,350 @@
+"""Headless JSON evaluation service (ASGI).
+
+    POST /evaluate  {"deal": {...}} or {"deals": [{...}, ...]}   -> metrics + AI verdict per deal
+    POST /compare   {"property_a": {...}, "property_b": {...}}    -> both metrics + comparison verdict
+    POST /report    {"kind": "single", "deal": {...}}             -> application/pdf
+                    {"kind": "comparison", "property_a": {...}, "property_b": {...}}
+
+Deals use the calculate_metrics argument names (calculations.METRIC_INPUTS).
+CPU-bound work runs in a process pool so the event loop only does I/O.
+
+    python service.py --port 8000 --workers 8            # serve (needs uvicorn)
+    python service.py --loadtest http://127.0.0.1:8000/evaluate --requests 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from calculations import MAX_LOAN_TERM, MAX_TIME_HORIZON, METRIC_INPUTS, batch_row, calculate_metrics_batch
+from metrics_result import result_from_batch
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# Upper bound on one request: the engine allocates (deals x horizon) matrices, so an
+# unbounded deal count could exhaust a pool worker's memory (as could a horizon or loan
+# term past calculations.MAX_TIME_HORIZON / MAX_LOAN_TERM)
+MAX_DEALS = int(os.getenv("MAX_DEALS_PER_REQUEST", "1000"))
+
+# Inputs given in percent; like the pages' sliders, each must be from 0 to 100
+PERCENT_INPUTS = ("down_payment_pct", "interest_rate", "vacancy_rate", "appreciation_rate", "rent_growth_rate")
+
+
+class BadRequest(Exception):
+    pass
+
+
+# --- Worker-side jobs (module level so they pickle) ---
+
+def _number(name, value):
+    # JSON true/false would pass float() as 1/0 (bool is an int subclass)
+    if isinstance(value, bool):
+        raise BadRequest(f"{name} must be a number, not {json.dumps(value)}")
+    return float(value)
+
+
+def _deal_columns(deals):
+    if len(deals) > MAX_DEALS:
+        raise BadRequest(f"at most {MAX_DEALS} deals per request")
+    if not all(isinstance(deal, dict) for deal in deals):
+        raise BadRequest("each deal must be a JSON object")
+    try:
+        columns = {name: [_number(name, deal[name]) for deal in deals] for name in METRIC_INPUTS}
+    except KeyError as e:
+        raise BadRequest(f"deal is missing input {e.args[0]!r}")
+    except (TypeError, ValueError) as e:
+        raise BadRequest(f"deal inputs must be numeric: {e}")
+
+    for name, values in columns.items():
+        if not all(math.isfinite(v) for v in values):
+            raise BadRequest(f"{name} must be a finite number")
+    if not all(v == int(v) and 1 <= v <= MAX_TIME_HORIZON for v in columns["time_horizon"]):
+        raise BadRequest(f"time_horizon must be a whole number of years from 1 to {MAX_TIME_HORIZON}")
+    if not all(0 < v <= MAX_LOAN_TERM for v in columns["loan_term"]):
+        raise BadRequest(f"loan_term must be more than 0 and at most {MAX_LOAN_TERM} years")
+    if not all(v > 0 for v in columns["purchase_price"]):
+        raise BadRequest("purchase_price must be more than 0")
+    for name in ("monthly_rent", "monthly_expenses"):
+        if not all(v >= 0 for v in columns[name]):
+            raise BadRequest(f"{name} must not be negative")
+    for name in PERCENT_INPUTS:
+        if not all(0 <= v <= 100 for v in columns[name]):
+            raise BadRequest(f"{name} must be a percentage from 0 to 100")
+    return columns
+
+
+def _evaluate(deals, **options):
+    """calculate_metrics_batch for validated deals; engine input errors become BadRequest."""
+    columns = _deal_columns(deals)
+    try:
+        return calculate_metrics_batch(columns, **options)
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+
+def evaluate_job(deals):
+    """(MetricsResult, summary, grade) per deal; results pickle back far smaller than display dicts."""
+    from grading import VERDICT_RULES, batch_metrics
+
+    batch = _evaluate(deals)
+    summaries, grades = VERDICT_RULES.verdicts(batch_metrics(batch))
+    return [(result_from_batch(batch, i), summaries[i], grades[i]) for i in range(len(deals))]
+
+
+def _evaluation_payload(result, summary, grade):
+    return {"metrics": result.to_display_dict(), "verdict": {"summary": summary, "grade": grade}}
+
+
+def compare_job(property_a, property_b):
+    from pdf_generator_dual import generate_ai_verdict
+
+    batch = _evaluate([property_a, property_b])
+    metrics_a, metrics_b = batch_row(batch, 0), batch_row(batch, 1)
+    summary, better = generate_ai_verdict(metrics_a, metrics_b)
+    return {"property_a": metrics_a, "property_b": metrics_b, "verdict": {"summary": summary, "better": better}}
+
+
+def report_job(kind, payload):
+    if kind == "single":
+        from pdf_generator_single import generate_ai_verdict, generate_pdf
+
+        deal = payload["deal"]
+        metrics = batch_row(_evaluate([deal]), 0)
+        summary, grade = generate_ai_verdict(metrics)
+        metrics["AI Verdict"] = summary
+        metrics["Grade"] = grade
+        property_data = {name: deal[name] for name in METRIC_INPUTS}
+        return generate_pdf(property_data, metrics, f"This is a {grade}-grade rental with upside potential").getvalue()
+
+    if kind == "comparison":
+        from pdf_generator_dual import generate_comparison_pdf_table_style
+
+        batch = _evaluate([payload["property_a"], payload["property_b"]])
+        return generate_comparison_pdf_table_style(batch_row(batch, 0), batch_row(batch, 1))
+
+    raise BadRequest(f"unknown report kind {kind!r}")
+
+
+# --- ASGI app ---
+
+def _json_safe(value):
+    # NaN/inf (e.g. an IRR that doesn't exist) aren't valid JSON
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+class EvaluationService:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count()
+        self.pool = None
+
+    def _executor(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        route = (scope["method"], scope["path"].rstrip("/"))
+        handlers = {
+            ("POST", "/evaluate"): self.evaluate,
+            ("POST", "/compare"): self.compare,
+            ("POST", "/report"): self.report,
+        }
+        if route == ("GET", "/health"):
+            await _send_json(send, 200, {"status": "ok", "workers": self.workers})
+            return
+        handler = handlers.get(route)
+        if handler is None:
+            await _send_json(send, 404, {"error": f"no route for {scope['method']} {scope['path']}"})
+            return
+
+        try:
+            body = await _read_json(receive)
+            status, content_type, payload = await handler(body)
+        except BadRequest as e:
+            await _send_json(send, 400, {"error": str(e)})
+            return
+        except Exception:
+            # The details go to the server log, not to the client
+            print(f"service: {scope['method']} {scope['path']} failed", file=sys.stderr)
+            traceback.print_exc()
+            await _send_json(send, 500, {"error": "internal server error"})
+            return
+
+        if content_type == "application/pdf":
+            await _send(send, status, content_type, payload)
+        else:
+            await _send_json(send, status, payload)
+
+    async def evaluate(self, body):
+        if "deals" in body:
+            deals = body["deals"]
+            if not isinstance(deals, list) or not deals:
+                raise BadRequest("'deals' must be a non-empty list")
+            if len(deals) > MAX_DEALS:
+                raise BadRequest(f"at most {MAX_DEALS} deals per request")
+            results = await self.run(evaluate_job, deals)
+            return 200, "application/json", {"results": [_evaluation_payload(*r) for r in results]}
+        if "deal" in body:
+            return 200, "application/json", _evaluation_payload(*(await self.run(evaluate_job, [body["deal"]]))[0])
+        raise BadRequest("expected 'deal' or 'deals'")
+
+    async def compare(self, body):
+        if "property_a" not in body or "property_b" not in body:
+            raise BadRequest("expected 'property_a' and 'property_b'")
+        return 200, "application/json", await self.run(compare_job, body["property_a"], body["property_b"])
+
+    async def report(self, body):
+        kind = body.get("kind", "single")
+        if kind not in ("single", "comparison"):
+            raise BadRequest(f"unknown report kind {kind!r}")
+        required = ("deal",) if kind == "single" else ("property_a", "property_b")
+        missing = [key for key in required if key not in body]
+        if missing:
+            raise BadRequest(f"{kind} report needs {', '.join(missing)}")
+        return 200, "application/pdf", await self.run(report_job, kind, body)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._executor()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.pool is not None:
+                    self.pool.shutdown(cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def _read_json(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise BadRequest("request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    try:
+        body = json.loads(b"".join(chunks) or b"{}")
+    except ValueError as e:
+        raise BadRequest(f"invalid JSON: {e}")
+    if not isinstance(body, dict):
+        raise BadRequest("request body must be a JSON object")
+    return body
+
+
+async def _send(send, status, content_type, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, payload):
+    await _send(send, status, "application/json", json.dumps(_json_safe(payload)).encode())
+
+
+app = EvaluationService(workers=int(os.getenv("SERVICE_WORKERS", "0")) or None)
+
+
+# --- Local load test (plain asyncio HTTP/1.1 keep-alive client, no extra dependencies) ---
+
+SAMPLE_DEAL = {
+    "purchase_price": 300000, "monthly_rent": 2000, "down_payment_pct": 20, "interest_rate": 6.5,
+    "loan_term": 30, "monthly_expenses": 400, "vacancy_rate": 5, "appreciation_rate": 3,
+    "rent_growth_rate": 3, "time_horizon": 10,
+}
+
+
+async def _load_worker(url, body, count, latencies, errors):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    request = (
+        f"POST {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    ).encode() + body
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if b" 200 " not in status_line:
+                errors.append(status_line.decode().strip())
+    finally:
+        writer.close()
+
+
+async def load_test(url, requests=1000, concurrency=32, deal=None):
+    body = json.dumps({"deal": deal or SAMPLE_DEAL}).encode()
+    latencies, errors = [], []
+    per_worker = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*[_load_worker(url, body, n, latencies, errors) for n in per_worker if n])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{len(latencies)} requests in {elapsed:.2f}s -> {len(latencies) / elapsed:.0f} req/s, {len(errors)} errors")
+    print(f"latency ms: p50={pct(0.50):.1f} p95={pct(0.95):.1f} p99={pct(0.99):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real estate evaluation JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--loadtest", metavar="URL", help="run a load test against URL instead of serving")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.loadtest:
+        asyncio.run(load_test(args.loadtest, args.requests, args.concurrency))
+        return
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required to serve: pip install uvicorn")
+    if args.workers:
+        os.environ["SERVICE_WORKERS"] = str(args.workers)
+    # Import by name so pool jobs pickle as service.* rather than __main__.*
+    uvicorn.run("service:app", host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Report builders on deals whose metrics aren't all finite."""
+import pytest
+
+from batch_reports import BUILDERS
+from pdf_generator_single import format_display_value
+
+DEAL = dict(purchase_price=300000.0, monthly_rent=2500.0, down_payment_pct=20.0, interest_rate=6.5, loan_term=30.0,
+            monthly_expenses=600.0, vacancy_rate=5.0, appreciation_rate=3.0, rent_growth_rate=2.0, time_horizon=10.0)
+
+
+def test_non_finite_values_display_as_na():
+    assert format_display_value("Cash-on-Cash Return (%)", float("inf")) == "N/A"
+    assert format_display_value("irr (%)", float("nan")) == "N/A"
+    assert format_display_value("Cap Rate (%)", 5.6) == "6"
+
+
+@pytest.mark.parametrize("mode", ["single", "comparison"])
+def test_zero_down_deal_renders(mode):
+    deals = [DEAL, {**DEAL, "down_payment_pct": 0.0}]  # 0% down: cash-on-cash is infinite
+    reports = BUILDERS[mode](["a", "b"], deals)
+    assert len(reports) == (2 if mode == "single" else 1)
+    assert all(pdf.startswith(b"%PDF") for _, pdf, _ in reports)
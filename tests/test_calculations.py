@@ -0,0 +1,170 @@
+"""calculate_metrics / calculate_metrics_batch against the original per-deal loop, to the cent.
+
+BASELINE below is that loop as it stood before the batch engine, less its IRR: IRR now
+includes the exit sale (and is NaN rather than 0 when it doesn't exist), so it has no
+baseline to match. The one other intended change is that debt service stops when the loan
+is paid off, which only shows when the horizon outlasts the loan term.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from amortization import annual_schedule_batch, unit_schedule
+from calculations import (MAX_LOAN_TERM, MAX_TIME_HORIZON, METRIC_INPUTS, batch_row, calculate_metrics,
+                          calculate_metrics_batch, evaluable, round_cents)
+
+
+def baseline_metrics(purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+                     monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon):
+    loan_amount = purchase_price * (1 - down_payment_pct / 100)
+    monthly_interest_rate = interest_rate / 100 / 12
+    number_of_payments = loan_term * 12
+
+    if monthly_interest_rate > 0:
+        monthly_mortgage = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** number_of_payments) / \
+                           ((1 + monthly_interest_rate) ** number_of_payments - 1)
+    else:
+        monthly_mortgage = loan_amount / number_of_payments
+
+    effective_rent = monthly_rent * (1 - vacancy_rate / 100)
+    annual_rent = effective_rent * 12
+    annual_expenses = monthly_expenses * 12
+    annual_mortgage = monthly_mortgage * 12
+    annual_cash_flow = annual_rent - annual_expenses - annual_mortgage
+
+    cap_rate = (annual_rent - annual_expenses) / purchase_price * 100
+    # The baseline raised ZeroDivisionError here on 0% down; the engine returns +/-inf
+    down_payment = purchase_price * down_payment_pct / 100
+    coc_return = annual_cash_flow / down_payment * 100 if down_payment else math.copysign(math.inf, annual_cash_flow)
+
+    cash_flows = []
+    rents = []
+    current_rent = monthly_rent
+    for year in range(1, time_horizon + 1):
+        effective_rent = current_rent * (1 - vacancy_rate / 100)
+        annual_rent = effective_rent * 12
+        # Intended change: no mortgage once the loan term has run out
+        annual_cash_flow = annual_rent - annual_expenses - (annual_mortgage if year <= loan_term else 0)
+        cash_flows.append(round(annual_cash_flow, 2))
+        rents.append(round(current_rent, 2))
+        current_rent *= (1 + rent_growth_rate / 100)
+
+    initial_investment = purchase_price * down_payment_pct / 100
+    total_cash_received = sum(cash_flows)
+    equity_multiple = round(total_cash_received / initial_investment, 2) if initial_investment != 0 else 0
+
+    appreciation_value = purchase_price * ((1 + appreciation_rate / 100) ** time_horizon - 1)
+    down_payment_amount = purchase_price * (down_payment_pct / 100)
+    roi_list = []
+    for i in range(time_horizon):
+        cumulative_return = sum(cash_flows[:i + 1]) + appreciation_value * ((i + 1) / time_horizon)
+        roi = (cumulative_return / down_payment_amount) * 100 if down_payment_amount != 0 else 0
+        roi_list.append(round(roi, 2))
+
+    return {
+        "Cap Rate (%)": round(cap_rate, 2),
+        "Cash-on-Cash Return (%)": round(coc_return, 2),
+        "Final Year ROI (%)": round(roi_list[-1], 2),
+        "First Year Cash Flow ($)": round(cash_flows[0], 2),
+        "Monthly Mortgage ($)": round(monthly_mortgage, 2),
+        "Multi-Year Cash Flow": cash_flows,
+        "Annual ROI % (by year)": roi_list,
+        "Annual Rents $ (by year)": rents,
+        "equity_multiple": equity_multiple,
+    }
+
+
+# (purchase_price, monthly_rent, down_payment_pct, interest_rate, loan_term,
+#  monthly_expenses, vacancy_rate, appreciation_rate, rent_growth_rate, time_horizon)
+EDGE_CASES = {
+    "typical": (300_000, 2_500, 20, 6.5, 30, 600, 5, 3, 2, 10),
+    "horizon past loan term": (250_000, 2_200, 25, 5.75, 15, 450, 4, 3.5, 2.5, 25),
+    "horizon equals loan term": (180_000, 1_650, 30, 7.25, 10, 350, 6, 2, 1.5, 10),
+    "zero down": (300_000, 2_500, 0, 6.5, 30, 600, 5, 3, 2, 10),
+    "zero interest": (220_000, 1_900, 20, 0, 30, 400, 5, 3, 2, 10),
+    "zero interest past term": (120_000, 1_300, 50, 0, 5, 250, 3, 2, 3, 8),
+    "one-year horizon": (300_000, 2_500, 20, 6.5, 30, 600, 5, 3, 2, 1),
+    "all cash": (150_000, 1_400, 100, 6.5, 30, 300, 5, 3, 2, 10),
+    "half-cent rents": (200_000, 1_000.10, 20, 6, 30, 400, 0, 3, 5, 12),
+}
+
+
+def random_deals(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return list(zip(
+        np.round(rng.uniform(50_000, 2_000_000, n), 2).tolist(),
+        np.round(rng.uniform(500, 15_000, n), 2).tolist(),
+        rng.choice([0, 3.5, 5, 10, 20, 25, 33.3, 100], n).tolist(),
+        np.round(rng.uniform(0, 12, n), 3).tolist(),
+        rng.choice([1, 5, 10, 15, 20, 30], n).tolist(),
+        np.round(rng.uniform(0, 5_000, n), 2).tolist(),
+        np.round(rng.uniform(0, 20, n), 1).tolist(),
+        np.round(rng.uniform(-5, 10, n), 2).tolist(),
+        np.round(rng.uniform(-5, 10, n), 2).tolist(),
+        rng.integers(1, 31, n).tolist(),
+    ))
+
+
+def assert_matches_baseline(metrics, deal):
+    expected = baseline_metrics(*deal)
+    for key, value in expected.items():
+        actual = metrics[key]
+        if isinstance(value, list):
+            actual = [x for x in np.asarray(actual, dtype=float).tolist() if not math.isnan(x)]
+        assert actual == value, f"{key} of {deal}"
+
+
+@pytest.mark.parametrize("deal", EDGE_CASES.values(), ids=EDGE_CASES.keys())
+def test_scalar_matches_baseline(deal):
+    assert_matches_baseline(calculate_metrics(*deal), deal)
+
+
+def test_batch_matches_baseline():
+    deals = list(EDGE_CASES.values()) + random_deals(2_000)
+    batch = calculate_metrics_batch(*map(np.array, zip(*deals)), irr_curve=False)
+    for i, deal in enumerate(deals):
+        assert_matches_baseline(batch_row(batch, i), deal)
+
+
+def test_batch_accepts_a_dataframe():
+    pd = pytest.importorskip("pandas")
+    deals = random_deals(50, seed=1)
+    frame = pd.DataFrame(deals, columns=METRIC_INPUTS)
+    from_frame = calculate_metrics_batch(frame, irr_curve=False)
+    from_arrays = calculate_metrics_batch(*map(np.array, zip(*deals)), irr_curve=False)
+    for key in ("Cap Rate (%)", "Final Year ROI (%)", "Multi-Year Cash Flow", "irr (%)"):
+        np.testing.assert_array_equal(from_frame[key], from_arrays[key])
+
+
+def test_round_cents_matches_round():
+    rng = np.random.default_rng(2)
+    # Values with three decimals often sit exactly on a half cent, where np.round can differ
+    values = np.concatenate([np.round(rng.uniform(-1e6, 1e6, 100_000), 3), rng.uniform(-1e4, 1e4, 100_000),
+                             [1050.105, 2.675, 1.005, 0.125, -0.125, 0.0]])
+    assert round_cents(values).tolist() == [round(value, 2) for value in values.tolist()]
+
+
+def test_schedule_tables_are_keyed_by_rate_and_term():
+    # Rate and term share one packed key per row: 0% over 100,001 months must not land on the
+    # table of 0.000001% over 1 month
+    rates, terms = np.array([0.0, 0.000001, 6.5]), np.array([100_001, 1, 360]) / 12
+    schedule = annual_schedule_batch(np.ones(3), rates, terms, 1)
+    expected = [unit_schedule(rate, term)["annual_principal"][0] for rate, term in zip(rates, terms)]
+    np.testing.assert_allclose(schedule["principal"][:, 0], expected)
+
+
+def test_evaluable_applies_the_engine_bounds():
+    pd = pytest.importorskip("pandas")
+    import batch_evaluate
+
+    deals = np.array(random_deals(6, seed=3))
+    deals[:, METRIC_INPUTS.index("time_horizon")] = [1, MAX_TIME_HORIZON, MAX_TIME_HORIZON + 1, 0, 10, 10]
+    deals[:, METRIC_INPUTS.index("loan_term")] = [30, 30, 30, 30, MAX_LOAN_TERM + 1, 0]
+    frame = pd.DataFrame(deals, columns=METRIC_INPUTS)
+    assert evaluable({name: frame[name].to_numpy() for name in METRIC_INPUTS}).tolist() == [True, True] + [False] * 4
+
+    # batch_evaluate keeps the out-of-range rows, without metrics
+    result = batch_evaluate.evaluate_chunk(frame)
+    assert result["verdict_grade"].notna().tolist() == [True, True] + [False] * 4
+    assert result["cap_rate"].isna().tolist() == [False, False] + [True] * 4
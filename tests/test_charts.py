@@ -0,0 +1,47 @@
+"""One chart layout for both outputs: the pages' SVG and the PDF reports' ChartFlowable."""
+import math
+
+import pytest
+
+import charts
+from charts import ChartCache, chart_layout, chart_svg
+
+CASH_FLOW, RENTS, ROI = [1000.0, 1200.0, -300.0, 800.0], [2000.0, 2100.0, 2200.0, 2300.0], [5.0, 12.0, 20.0, 40.0]
+
+
+@pytest.fixture
+def cache():
+    return ChartCache(maxsize=16)
+
+
+def test_svg_is_exported_from_the_cached_layout(cache):
+    svg = chart_svg("projection", CASH_FLOW, RENTS, ROI, cache=cache)
+    layout = chart_layout("projection", CASH_FLOW, RENTS, ROI, cache=cache)
+    assert cache.stats()["misses"] == 2  # the layout, then the SVG made from it
+    assert cache.stats()["hits"] == 1    # the report's layout is the one the SVG used
+    assert svg.startswith("<svg")
+    for label in layout.labels:
+        assert f">{label.text.replace('&', '&amp;')}<" in svg
+    assert chart_svg("projection", CASH_FLOW, RENTS, ROI, cache=cache) is svg
+
+
+def test_layout_keeps_series_inside_the_plot(cache):
+    layout = chart_layout("comparison", CASH_FLOW, CASH_FLOW[:3], RENTS, RENTS[:3], ROI, [math.nan] * 3, cache=cache)
+    names = [label.text for label in layout.labels]
+    assert names.count("Cash Flow A ($)") == 1 and "ROI B (%)" in names
+    points = [point for path in layout.paths for line in path.lines for point in line]
+    assert all(0 <= x <= layout.width and 0 <= y <= layout.height for x, y in points)
+
+
+def test_report_draws_the_layout():
+    from io import BytesIO
+
+    from reportlab.pdfgen.canvas import Canvas
+    from report_templates import ChartFlowable
+
+    flowable = ChartFlowable(charts.projection_layout(CASH_FLOW, RENTS, ROI))
+    buffer = BytesIO()
+    canvas = Canvas(buffer, pageCompression=0)
+    flowable.drawOn(canvas, 72, 72)
+    canvas.save()
+    assert b"(Multi - Year Projected Cash Flow & ROI) Tj" in buffer.getvalue()
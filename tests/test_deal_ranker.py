@@ -0,0 +1,56 @@
+"""TopKRanker's streamed leaderboards against a full sort of the whole feed."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from deal_ranker import MISSING_GROUP, RANK_KEYS, TopKRanker, composite_score
+
+K = 5
+
+
+def evaluated_feed(n=600, seed=0):
+    """An evaluate_chunk-shaped frame: ids, a zip column with gaps, and coarse metrics (so ties occur)."""
+    rng = np.random.default_rng(seed)
+    zips = rng.choice(np.array(["94110", "10001", "60601", None, np.nan], dtype=object), n)
+    frame = pd.DataFrame({
+        "listing_id": np.arange(n),
+        "zip": zips,
+        "cap_rate": np.round(rng.normal(6, 2, n), 1),
+        "coc_return": np.round(rng.normal(8, 4, n), 1),
+        "irr": np.round(rng.normal(10, 5, n), 1),
+        "verdict_grade": rng.choice(list("ABCDF"), n),
+    })
+    frame.loc[rng.random(n) < 0.05, "irr"] = np.nan  # no IRR: never ranked on irr
+    return frame
+
+
+def push_in_chunks(ranker, frame, chunksize):
+    for start in range(0, len(frame), chunksize):
+        ranker.push(frame.iloc[start:start + chunksize])
+    return ranker
+
+
+def expected_top(frame, key, group):
+    """Top K by a full sort: best value first, ties to the earlier deal."""
+    values = frame.assign(score=composite_score(frame))[RANK_KEYS[key]]
+    members = frame["zip"].fillna(MISSING_GROUP) == group if group is not None else np.ones(len(frame), bool)
+    ranked = frame[members & values.notna()].assign(value=values).sort_values("value", ascending=False, kind="stable")
+    return ranked["listing_id"].head(K).tolist()
+
+
+@pytest.mark.parametrize("chunksize", [37, 600])
+def test_top_k_matches_a_full_sort(chunksize):
+    frame = evaluated_feed()
+    ranker = push_in_chunks(TopKRanker(K), frame.drop(columns="zip"), chunksize)
+    for key in RANK_KEYS:
+        assert [deal["listing_id"] for deal in ranker.top(key)] == expected_top(frame, key, None)
+
+
+def test_missing_group_keys_share_one_group_across_chunks():
+    frame = evaluated_feed()
+    ranker = push_in_chunks(TopKRanker(K, group_by="zip", keep_columns=["listing_id", "zip"]), frame, 37)
+    assert ranker.groups() == sorted(["94110", "10001", "60601", MISSING_GROUP])
+    for group in ranker.groups():
+        for key in RANK_KEYS:
+            assert [deal["listing_id"] for deal in ranker.top(key, group)] == expected_top(frame, key, group)
+    assert len(ranker.to_frame()) == len(ranker.groups()) * len(RANK_KEYS) * K
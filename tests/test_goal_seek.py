@@ -0,0 +1,89 @@
+"""goal_seek: solved inputs hit their targets, batches match single deals, and no-solution rows are NaN."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculations import calculate_metrics
+from goal_seek import _columns, goal_seek, max_purchase_price, min_monthly_rent, target_residual
+
+DEAL = dict(purchase_price=300000, monthly_rent=2500, down_payment_pct=20, interest_rate=6.5, loan_term=30,
+            monthly_expenses=500, vacancy_rate=5, appreciation_rate=3, rent_growth_rate=2, time_horizon=10)
+
+SOLVABLE = [
+    ("purchase_price", "Cap Rate (%)"),
+    ("purchase_price", "Cash-on-Cash Return (%)"),
+    ("purchase_price", "irr (%)"),
+    ("purchase_price", "Final Year ROI (%)"),
+    ("monthly_rent", "Cap Rate (%)"),
+    ("monthly_rent", "Cash-on-Cash Return (%)"),
+    ("monthly_rent", "irr (%)"),
+    ("monthly_rent", "Final Year ROI (%)"),
+    ("down_payment_pct", "Cash-on-Cash Return (%)"),
+    ("interest_rate", "Cash-on-Cash Return (%)"),
+    ("interest_rate", "irr (%)"),
+    ("interest_rate", "Final Year ROI (%)"),
+]
+
+
+@pytest.mark.parametrize("solve_for, metric", SOLVABLE)
+def test_solved_value_hits_the_target(solve_for, metric):
+    result = goal_seek(DEAL, solve_for, metric, 6.0)
+    assert result["converged"][0]
+    assert result["achieved"][0] == pytest.approx(6.0, abs=0.01)
+    # The unrounded residual is zero too (in dollars, so measured against the deal's scale)
+    solved = _columns({**DEAL, solve_for: result["value"][0]})
+    scale = solved["purchase_price"][0] * solved["down_payment_pct"][0] / 100
+    assert abs(target_residual(solved, metric, 6.0)[0]) / scale < 1e-5
+    assert calculate_metrics(**{**DEAL, solve_for: result["value"][0]})[metric] == pytest.approx(6.0, abs=0.01)
+
+
+def test_batch_matches_one_deal_at_a_time():
+    deals = pd.DataFrame([DEAL, {**DEAL, "monthly_rent": 3100}, {**DEAL, "time_horizon": 5, "interest_rate": 7.5}])
+    targets = np.array([8.0, 10.0, 6.0])
+    for solve_for in ("purchase_price", "interest_rate"):
+        batch = goal_seek(deals, solve_for, "irr (%)", targets)
+        single = [goal_seek(row, solve_for, "irr (%)", target)["value"][0]
+                  for row, target in zip(deals.to_dict("records"), targets)]
+        # A batch iterates until its slowest row converges, so rows agree to within tol
+        np.testing.assert_allclose(batch["value"], single, rtol=1e-9, atol=1e-6)
+
+
+def test_one_deal_against_several_targets():
+    result = max_purchase_price(DEAL, "Cash-on-Cash Return (%)", [4.0, 6.0, 8.0])
+    assert result["converged"].all()
+    np.testing.assert_allclose(result["achieved"], [4.0, 6.0, 8.0], atol=0.01)
+    # Metrics fall as the price rises: a higher target allows a lower price
+    assert (np.diff(result["value"]) < 0).all()
+    rents = min_monthly_rent(DEAL, "Cash-on-Cash Return (%)", [4.0, 6.0, 8.0])["value"]
+    assert (np.diff(rents) > 0).all()
+
+
+def test_no_solution_within_bounds_is_nan():
+    # No interest rate in 0-30% gives a 50% cash-on-cash return on this deal
+    result = goal_seek(DEAL, "interest_rate", "Cash-on-Cash Return (%)", [50.0, 6.0])
+    assert result["converged"].tolist() == [False, True]
+    assert np.isnan(result["value"][0]) and np.isnan(result["achieved"][0])
+    assert np.isfinite(result["value"][1])
+
+
+def test_custom_bounds_limit_the_search():
+    unbounded = goal_seek(DEAL, "interest_rate", "irr (%)", 6.0)["value"][0]
+    assert np.isnan(goal_seek(DEAL, "interest_rate", "irr (%)", 6.0, bounds=(0, unbounded / 2))["value"][0])
+    narrowed = goal_seek(DEAL, "interest_rate", "irr (%)", 6.0, bounds=(unbounded / 2, 30))["value"][0]
+    assert narrowed == pytest.approx(unbounded, abs=1e-4)
+
+
+@pytest.mark.parametrize("solve_for, metric", [
+    ("loan_term", "irr (%)"),
+    ("purchase_price", "Grade"),
+    ("down_payment_pct", "Cap Rate (%)"),
+    ("interest_rate", "Cap Rate (%)"),
+])
+def test_unsupported_requests_raise(solve_for, metric):
+    with pytest.raises(ValueError):
+        goal_seek(DEAL, solve_for, metric, 6.0)
+
+
+def test_inputs_must_be_keyed_by_name():
+    with pytest.raises(TypeError):
+        goal_seek(list(DEAL.values()), "purchase_price", "irr (%)", 6.0)
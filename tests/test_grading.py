@@ -0,0 +1,83 @@
+"""deal_metrics / batch_metrics read metrics the way the reports always have: missing or NaN is 0."""
+import io
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_evaluate
+import grading
+from grading import VERDICT_RULES, batch_metrics, deal_metrics
+
+# Strong enough for a B on ROI and cash flow alone; the CoC condition (>= 0) decides the rest
+DEAL = {"Final Year ROI (%)": 150.0, "Multi-Year Cash Flow": [8000.0, 8000.0]}
+
+
+@pytest.mark.parametrize("coc", [None, math.nan, "n/a"])
+def test_missing_or_nan_metric_counts_as_zero(coc):
+    metrics = dict(DEAL) if coc is None else {**DEAL, "Cash-on-Cash Return (%)": coc}
+    assert deal_metrics(metrics)["coc_return"] == 0.0
+    assert VERDICT_RULES.deal_verdict(deal_metrics(metrics))[1] == "B"
+
+
+def test_display_strings_parse():
+    values = deal_metrics({"Final Year ROI (%)": "1,234.5", "Multi-Year Cash Flow": "100, 200,x"})
+    assert values["final_year_roi"] == 1234.5
+    assert values["total_cash_flow"] == 300.0
+    assert deal_metrics({})["total_cash_flow"] == 0.0
+
+
+def test_roi_fallback_when_final_year_roi_is_zero_or_missing():
+    assert deal_metrics({"ROI (%)": 80.0})["final_year_roi"] == 80.0
+    assert deal_metrics({"Final Year ROI (%)": math.nan, "ROI (%)": 80.0})["final_year_roi"] == 80.0
+    assert deal_metrics({"Final Year ROI (%)": 5.0, "ROI (%)": 80.0})["final_year_roi"] == 5.0
+
+
+def test_batch_matches_deal():
+    batch = {
+        "Final Year ROI (%)": np.array([150.0, math.nan, 0.0]),
+        "ROI (%)": np.array([1.0, 60.0, math.nan]),
+        "Cash-on-Cash Return (%)": np.array([math.nan, 2.0, -1.0]),
+        "Multi-Year Cash Flow": np.array([[8000.0, 8000.0], [3000.0, math.nan], [math.nan, math.nan]]),
+    }
+    values = batch_metrics(batch)
+    deals = [deal_metrics({key: column[i].tolist() for key, column in batch.items()}) for i in range(3)]
+    for name, column in values.items():
+        assert column.tolist() == [deal[name] for deal in deals]
+    assert VERDICT_RULES.grade(values).tolist() == [VERDICT_RULES.deal_verdict(deal)[1] for deal in deals]
+
+
+BASE_LISTING = dict(purchase_price=300000, monthly_rent=2500, down_payment_pct=20, interest_rate=6.5, loan_term=30,
+                    monthly_expenses=500, vacancy_rate=5, appreciation_rate=3, rent_growth_rate=2, time_horizon=10)
+LISTINGS = [
+    BASE_LISTING,
+    {**BASE_LISTING, "monthly_rent": 4500},
+    {**BASE_LISTING, "down_payment_pct": 0},  # CoC of -inf
+    {**BASE_LISTING, "monthly_rent": 1000, "monthly_expenses": 1500, "appreciation_rate": -8},  # no IRR
+    {**BASE_LISTING, "purchase_price": math.nan},  # left unevaluated
+    {**BASE_LISTING, "time_horizon": 3},
+]
+# Sends a NaN IRR to B if it reads as 0, to F if the NaN is compared as is
+IRR_POLICY = {"name": "irr", "rules": [{"grade": "A", "when": [["irr", ">", 20]]},
+                                       {"grade": "B", "when": [["irr", "<=", 20]]}],
+              "default": {"grade": "F"}}
+
+
+def test_regrading_batch_evaluate_output_matches_its_verdicts(tmp_path):
+    listings, results = str(tmp_path / "listings.csv"), str(tmp_path / "results")
+    pd.DataFrame(LISTINGS).to_csv(listings, index=False)
+    batch_evaluate.run(listings, results, chunksize=4, log=io.StringIO())
+
+    for name in sorted(os.listdir(results)):
+        if name.startswith("part-"):
+            part = pd.read_csv(os.path.join(results, name))
+            values = grading._chunk_values(part, VERDICT_RULES.metrics, None)
+            assert VERDICT_RULES.grade(values).tolist() == part["verdict_grade"].dropna().tolist()
+
+    # Read from the metric columns or computed from the listings, every deal grades the same
+    from_output = grading.run(results, IRR_POLICY, log=io.StringIO())
+    from_listings = grading.run(listings, IRR_POLICY, log=io.StringIO())
+    assert from_output.tolist() == from_listings.tolist()
+    assert from_output.sum() == len(LISTINGS) - 1
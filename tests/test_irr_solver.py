@@ -0,0 +1,69 @@
+"""solve_irr: batched Newton, the bisection fallback, and NaN (not 0) where no IRR exists."""
+import numpy as np
+import pytest
+
+import irr_solver
+from irr_solver import DEFAULT_BRACKET, irr_percent, npv_and_derivative, solve_irr
+
+# Rows with a known IRR, right-padded with zeros to a common length
+KNOWN = {
+    "one period": ([-100, 110], 0.10),
+    "lump sum": ([-1000, 0, 0, 1331], 0.10),
+    "annuity + sale": ([-50_000, 4_000, 4_000, 4_000, 4_000, 54_000], 0.08),
+    "loss": ([-1000, 500, 400], -0.06993),
+    "steep": ([-1, 0, 100], 9.0),
+}
+
+
+def padded(rows):
+    width = max(len(row) for row in rows)
+    return np.array([row + [0] * (width - len(row)) for row in rows], dtype=float)
+
+
+def test_known_rates_converge():
+    flows = padded([row for row, _ in KNOWN.values()])
+    rates, converged = solve_irr(flows)
+    assert converged.all()
+    np.testing.assert_allclose(rates, [rate for _, rate in KNOWN.values()], atol=1e-4)
+    npv, _ = npv_and_derivative(flows, rates)
+    np.testing.assert_allclose(npv, 0, atol=1e-6)
+
+
+@pytest.mark.parametrize("flows", [[100, 50], [-100, -50], [0, 0], [-100]], ids=["inflows", "outflows", "zeros", "one"])
+def test_no_irr_is_nan_not_zero(flows):
+    rates, converged = solve_irr([flows])
+    assert np.isnan(rates[0]) and not converged[0]
+
+
+def test_root_outside_the_bracket_is_not_reported():
+    rates, converged = solve_irr([[-1, 100]])  # 9,900% per period
+    assert DEFAULT_BRACKET[1] < 99
+    assert np.isnan(rates[0]) and not converged[0]
+
+
+def test_bisection_fallback_finds_the_same_roots(monkeypatch):
+    flows = padded([row for row, _ in KNOWN.values()])
+    newton_rates, _ = solve_irr(flows)
+
+    def failing_newton(cash_flows, rate, tol, maxiter):
+        return rate, np.zeros(rate.shape[0], dtype=bool)
+
+    monkeypatch.setattr(irr_solver, "_newton", failing_newton)
+    rates, converged = solve_irr(flows)
+    assert converged.all()
+    np.testing.assert_allclose(rates, newton_rates, atol=1e-8)
+
+
+def test_fallback_prefers_the_root_nearest_the_guess():
+    # NPV is zero at both 10% and 20%
+    flows = [[-100, 230, -132]]
+    for guess, expected in ((0.05, 0.10), (0.25, 0.20)):
+        rates, converged = solve_irr(flows, guess=guess, maxiter=1)
+        assert converged[0]
+        assert rates[0] == pytest.approx(expected, abs=1e-8)
+
+
+def test_irr_percent_rounds_like_the_reports():
+    rates, converged = irr_percent(padded([[-50_000, 4_000, 4_000, 4_000, 4_000, 54_000], [100, 50]]))
+    assert rates[0] == 8.0 and converged.tolist() == [True, False]
+    assert np.isnan(rates[1])
@@ -0,0 +1,184 @@
+"""MailQueue + MailWorker + SMTPPool against the in-process LocalSMTPServer sink."""
+import time
+
+import pytest
+
+import mail_queue
+from mail_queue import LocalSMTPServer, MailQueue, MailWorker, SMTPPool
+
+BACKOFF = 10.0
+
+
+@pytest.fixture
+def sink():
+    server = LocalSMTPServer(port=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = MailQueue(str(tmp_path / "mail.db"))
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def worker(queue, sink):
+    pool = SMTPPool("127.0.0.1", sink.port, user="reports", password="secret", starttls=False, size=1)
+    worker = MailWorker(queue, pool, batch_size=2, backoff=BACKOFF)
+    yield worker
+    pool.close()
+
+
+def enqueue(queue, count=1):
+    return [queue.enqueue(f"investor{i}@example.com", "Your report", "See attached.", attachment=b"%PDF-1.4",
+                          sender="reports@example.com") for i in range(count)]
+
+
+def make_due(queue, job_id):
+    queue._execute("UPDATE mail_jobs SET next_attempt_at = 0 WHERE job_id = ?", (job_id,))
+
+
+def next_attempt_in(queue, job_id):
+    return queue._execute("SELECT next_attempt_at FROM mail_jobs WHERE job_id = ?", (job_id,))[0][0] - time.time()
+
+
+def test_batches_reuse_one_pooled_connection(queue, worker, sink):
+    enqueue(queue, 5)
+    while worker.run_once():
+        pass
+    assert len(sink.messages) == 5
+    assert worker.pool.connects == 1
+    assert sink.connections == 1
+    assert sink.logins == ["reports"]
+
+
+def test_temporary_failure_is_retried_with_backoff(queue, worker, sink):
+    sink.fail_next(2, 451)
+    [job_id] = enqueue(queue)
+
+    worker.run_once()
+    status = queue.status(job_id)
+    assert (status["status"], status["attempts"]) == ("queued", 1)
+    assert status["last_error"].startswith("451")
+    assert 0.8 * BACKOFF - 1 < next_attempt_in(queue, job_id) <= 1.2 * BACKOFF
+    assert worker.run_once() == 0  # not due yet
+
+    make_due(queue, job_id)
+    worker.run_once()
+    assert queue.status(job_id)["attempts"] == 2
+    assert 1.6 * BACKOFF - 1 < next_attempt_in(queue, job_id) <= 2.4 * BACKOFF
+
+    make_due(queue, job_id)
+    worker.run_once()
+    assert queue.status(job_id)["status"] == "sent"
+    assert len(sink.messages) == 1
+
+
+def test_permanent_failure_is_not_retried(queue, worker, sink):
+    sink.fail_next(1, 550, "mailbox unavailable")
+    [job_id] = enqueue(queue)
+    worker.run_once()
+    status = queue.status(job_id)
+    assert (status["status"], status["attempts"]) == ("failed", 1)
+    assert status["last_error"] == "550 mailbox unavailable"
+    assert sink.messages == []
+
+
+def test_payload_is_cleared_once_sent(queue, worker, sink):
+    [job_id] = enqueue(queue)
+    assert queue._execute("SELECT length(message) FROM mail_jobs WHERE job_id = ?", (job_id,))[0][0] > 0
+    worker.run_once()
+    assert queue.status(job_id)["status"] == "sent"
+    assert queue._execute("SELECT length(message) FROM mail_jobs WHERE job_id = ?", (job_id,))[0][0] == 0
+    assert b"JVBERi0xLjQ=" in sink.messages[0][2]  # the attachment, base64-encoded
+
+
+def test_slow_batch_keeps_its_claim(queue, worker, sink, tmp_path, monkeypatch):
+    monkeypatch.setattr(mail_queue, "CLAIM_LEASE_SECONDS", 0.4)
+    other_worker = MailQueue(str(tmp_path / "mail.db"))
+    worker.batch_size = 4
+    enqueue(queue, 4)
+
+    # Each message takes half the lease, so the batch outlasts it twice over; meanwhile a
+    # second worker keeps polling and must not pick up any of the batch's jobs
+    stolen = []
+    acquire = worker.pool.acquire
+
+    def slow_acquire():
+        conn = acquire()
+        sendmail = conn.sendmail
+
+        def slow_sendmail(*args):
+            time.sleep(0.2)
+            stolen.extend(other_worker.claim(10))
+            return sendmail(*args)
+
+        conn.sendmail = slow_sendmail
+        return conn
+
+    monkeypatch.setattr(worker.pool, "acquire", slow_acquire)
+    assert worker.run_once() == 4
+    other_worker.close()
+    assert stolen == []
+    assert len(sink.messages) == 4
+
+
+def test_unsendable_addresses_are_refused_at_enqueue(queue):
+    with pytest.raises(ValueError, match="non-ASCII"):
+        queue.enqueue("josé@example.com", "Your report", "See attached.", sender="reports@example.com")
+    with pytest.raises(ValueError, match="not an email address"):
+        queue.enqueue("investor.example.com", "Your report", "See attached.", sender="reports@example.com")
+    job_id = queue.enqueue("investor@bücher.de", "Your report", "See attached.", sender="reports@example.com")
+    assert queue.status(job_id)["recipient"] == "investor@xn--bcher-kva.de"
+
+
+def test_unsendable_message_fails_alone(queue, sink, worker):
+    # A row queued before enqueue checked addresses: smtplib raises UnicodeEncodeError on it
+    message = mail_queue.build_message("reports@example.com", "investor@example.com", "Your report", "See attached.")
+    now = time.time()
+    [[bad_id]] = queue._execute(
+        "INSERT INTO mail_jobs (status, sender, recipient, subject, message, next_attempt_at, created_at) "
+        "VALUES ('queued', ?, ?, ?, ?, ?, ?) RETURNING job_id",
+        ("reports@example.com", "josé@example.com", "Your report", message.as_bytes(), now, now))
+    [good_id] = enqueue(queue)
+
+    worker.threads = 1
+    worker.start()
+    deadline = time.monotonic() + 10
+    while queue.counts().get("sending") or queue.counts().get("queued"):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    alive = all(thread.is_alive() for thread in worker._threads)
+    worker.stop(timeout=5)
+
+    bad, good = queue.status(bad_id), queue.status(good_id)
+    assert (bad["status"], good["status"]) == ("failed", "sent")
+    assert "can't send" in bad["last_error"]
+    assert len(sink.messages) == 1
+    assert alive
+    assert worker.pool.connects == 1  # the connection was reset and reused, not lost
+
+
+def test_worker_survives_unexpected_errors(queue, sink, worker, monkeypatch, capsys):
+    run_once = worker.run_once
+    calls = []
+
+    def flaky_run_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("bug")
+        return run_once()
+
+    monkeypatch.setattr(worker, "run_once", flaky_run_once)
+    worker.poll_interval = 0.05
+    [job_id] = enqueue(queue)
+    worker.threads = 1
+    worker.start()
+    deadline = time.monotonic() + 10
+    while queue.status(job_id)["status"] != "sent":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    worker.stop(timeout=5)
+    assert "RuntimeError: bug" in capsys.readouterr().err
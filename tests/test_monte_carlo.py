@@ -0,0 +1,73 @@
+"""QuantileSketch error bounds and merging; simulate_deal / simulate_portfolio reproducibility."""
+import numpy as np
+import pytest
+
+from monte_carlo import QuantileSketch, simulate_deal, simulate_portfolio
+
+DEAL = dict(purchase_price=300000, monthly_rent=2500, down_payment_pct=20, interest_rate=6.5, loan_term=30,
+            monthly_expenses=500, vacancy_rate=5, appreciation_rate=3, rent_growth_rate=2, time_horizon=10)
+QUANTILES = np.array([0.0, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 1.0])
+
+
+def sample(seed=0, n=50_000):
+    """Mixed-sign values over many magnitudes, like simulated cash flows and IRRs."""
+    rng = np.random.default_rng(seed)
+    return np.concatenate([rng.lognormal(8, 2, n), -rng.lognormal(3, 1.5, n // 4), rng.normal(0, 5, n // 4)])
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_sketch_quantiles_are_within_the_relative_accuracy(accuracy):
+    values = sample()
+    sketch = QuantileSketch(relative_accuracy=accuracy)
+    sketch.add(values)
+    ranked = np.sort(values)
+    expected = ranked[np.floor(QUANTILES * (len(values) - 1)).astype(int)]
+    estimates = sketch.quantile(QUANTILES)
+    # Values below min_value count as zero, so they only need to be within min_value of it
+    error = np.abs(estimates - expected)
+    assert (error <= accuracy * np.abs(expected) + sketch.min_value).all()
+
+
+def test_sketches_merge_exactly():
+    values = sample(seed=1)
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    whole.add(values)
+    left.add(values[:1000])
+    right.add(values[1000:])
+    left.merge(right)
+    assert np.array_equal(left.counts, whole.counts)
+    assert left.count == len(values)
+
+
+def test_empty_sketch_and_non_finite_values():
+    sketch = QuantileSketch()
+    assert np.isnan(sketch.quantile(0.5))
+    sketch.add([np.nan, np.inf, -np.inf])
+    assert sketch.count == 0
+
+
+def test_simulate_deal_is_reproducible():
+    first = simulate_deal(DEAL, n_paths=3_000, seed=7, block_size=1_000)
+    assert simulate_deal(DEAL, n_paths=3_000, seed=7, block_size=1_000) == first
+    assert simulate_deal(DEAL, n_paths=3_000, seed=8, block_size=1_000) != first
+    irr = first["irr (%)"]
+    assert first["paths"] == irr["count"] + round(first["irr_failure_rate"] * 3_000)
+    assert irr["min"] <= irr["p5"] <= irr["p50"] <= irr["p95"] <= irr["max"]
+
+
+def test_constant_drivers_have_no_spread():
+    constant = {name: {"dist": "constant"} for name in ("appreciation_rate", "rent_growth_rate", "vacancy_rate")}
+    summary = simulate_deal(DEAL, drivers=constant, n_paths=500, block_size=200)
+    cash_flow = summary["Total Cash Flow ($)"]
+    assert cash_flow["min"] == cash_flow["max"] == cash_flow["p50"]
+
+
+def test_portfolio_results_do_not_depend_on_workers_or_grouping():
+    deals = [DEAL, {**DEAL, "monthly_rent": 3200}, {**DEAL, "time_horizon": 5}]
+    drivers = [None, {"appreciation_rate": {"dist": "uniform", "low": -2, "high": 6}}, None]
+    options = dict(drivers=drivers, n_paths=1_000, seed=3, shard_size=300, block_size=128)
+    in_process = simulate_portfolio(deals, workers=1, **options)
+    assert simulate_portfolio(deals, workers=2, **options) == in_process
+    assert simulate_portfolio(deals, workers=1, group_size=2, **options) == in_process
+    assert [summary["paths"] for summary in in_process] == [1_000] * 3
+    assert in_process[0] != in_process[1]
@@ -0,0 +1,79 @@
+"""PortfolioStore: bulk upsert, indexed screens on the verdict grade, and NaN metrics round-tripping."""
+import math
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculations import calculate_metrics_batch
+from grading import VERDICT_RULES, batch_metrics
+from portfolio_store import PortfolioStore
+
+BASE = dict(purchase_price=300000, monthly_rent=2500, down_payment_pct=20, interest_rate=6.5, loan_term=30,
+            monthly_expenses=500, vacancy_rate=5, appreciation_rate=3, rent_growth_rate=2, time_horizon=10)
+DEALS = pd.DataFrame([
+    BASE,                                                # verdict A, cash-on-cash grade D
+    {**BASE, "monthly_rent": 4500, "purchase_price": 450000},
+    {**BASE, "time_horizon": 3},                         # verdict C
+    {**BASE, "monthly_rent": 1000, "monthly_expenses": 1500, "appreciation_rate": -8},  # no IRR
+])
+
+
+@pytest.fixture
+def store(tmp_path):
+    with PortfolioStore(str(tmp_path / "portfolio.db")) as store:
+        yield store
+
+
+def test_upsert_replaces_deals_by_content(store):
+    ids = store.upsert(DEALS, labels=["a", "b", "c", "d"])
+    assert len(set(ids)) == 4
+    assert store.upsert(DEALS.iloc[:2], labels=["a2", "b2"]) == ids[:2]
+    assert store.count() == 4
+    assert store.query(limit=10).set_index("deal_id").loc[ids[:2], "label"].tolist() == ["a2", "b2"]
+
+
+def test_query_screens_on_the_verdict_grade(store):
+    store.upsert(DEALS)
+    grades = VERDICT_RULES.grade(batch_metrics(calculate_metrics_batch(
+        {name: DEALS[name].to_numpy(dtype=float) for name in DEALS}, irr_curve=False))).tolist()
+    assert grades == ["A", "A", "C", "F"]
+
+    everything = store.query(limit=10)
+    assert sorted(everything["verdict_grade"]) == sorted(grades)
+    assert (everything["grade"] != everything["verdict_grade"]).any()  # the two grades do differ
+
+    screened = store.query(grades="AB", max_price=400_000, order_by="irr")
+    assert screened["verdict_grade"].tolist() == ["A"]
+    assert screened["purchase_price"].tolist() == [300000]
+    assert "idx_deals_verdict_grade" in " ".join(store.explain(grades="AB"))
+
+    irrs = store.query(grades="AC", order_by="irr", limit=10)["irr"].tolist()
+    assert irrs == sorted(irrs, reverse=True)
+
+
+def test_nan_metrics_round_trip(store):
+    [deal_id] = store.upsert(DEALS.iloc[3:])
+    result = store.get(deal_id)
+    assert math.isnan(result.irr) and not result.irr_converged
+    expected = calculate_metrics_batch({name: DEALS[name].to_numpy(dtype=float)[3:] for name in DEALS})
+    assert np.array_equal(result.cash_flows, expected["Multi-Year Cash Flow"][0])
+    assert np.allclose(result.irr_by_hold_year, expected["IRR % by Hold Year"][0], equal_nan=True)
+    assert store.query(min_irr=0, limit=10)["deal_id"].tolist().count(deal_id) == 0
+
+
+def test_older_stores_get_verdict_grades_on_open(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    with PortfolioStore(path) as store:
+        ids = store.upsert(DEALS, labels=["a", "b", "c", "d"])
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DROP INDEX idx_deals_verdict_grade")
+        conn.execute("ALTER TABLE deals DROP COLUMN verdict_grade")
+    conn.close()
+
+    with PortfolioStore(path) as store:
+        saved = store.query(limit=10).set_index("deal_id").loc[ids]
+    assert saved["verdict_grade"].tolist() == ["A", "A", "C", "F"]
+    assert saved["label"].tolist() == ["a", "b", "c", "d"]
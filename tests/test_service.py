@@ -0,0 +1,58 @@
+"""The ASGI service end to end, with jobs run inline instead of in the process pool."""
+import asyncio
+import json
+
+import pytest
+
+import service
+from service import SAMPLE_DEAL, EvaluationService
+
+
+@pytest.fixture
+def app():
+    app = EvaluationService(workers=1)
+
+    async def run_inline(fn, *args):
+        return fn(*args)
+
+    app.run = run_inline
+    return app
+
+
+def call(app, path, body):
+    """(status, content type, body bytes) for one POST."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app({"type": "http", "method": "POST", "path": path}, receive, send))
+    headers = dict(messages[0]["headers"])
+    return messages[0]["status"], headers[b"content-type"].decode(), messages[1]["body"]
+
+
+def test_zero_down_report_renders(app):
+    status, content_type, body = call(app, "/report", {"kind": "single", "deal": {**SAMPLE_DEAL, "down_payment_pct": 0}})
+    assert (status, content_type) == (200, "application/pdf")
+    assert body.startswith(b"%PDF")
+
+
+@pytest.mark.parametrize("name", ["time_horizon", "purchase_price", "down_payment_pct"])
+def test_booleans_are_rejected(app, name):
+    status, _, body = call(app, "/evaluate", {"deal": {**SAMPLE_DEAL, name: True}})
+    assert status == 400
+    assert name in json.loads(body)["error"]
+
+
+def test_unexpected_errors_hide_their_details(app, monkeypatch, capsys):
+    def broken(deals):
+        raise OverflowError("cannot convert float infinity to integer")
+
+    monkeypatch.setattr(service, "evaluate_job", broken)
+    status, _, body = call(app, "/evaluate", {"deal": SAMPLE_DEAL})
+    assert status == 500
+    assert json.loads(body) == {"error": "internal server error"}
+    assert "OverflowError" in capsys.readouterr().err
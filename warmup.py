@@ -0,0 +1,61 @@
+"""Preload the heavy libraries in the background while the login page is up.
+
+The pages only import NumPy, pandas, matplotlib and ReportLab after the password gate,
+so a fresh container can serve the login form straight away. start_warmup() is called
+from the gate: it imports those modules on a daemon thread while the user is typing,
+so the first page after login finds them already loaded. It runs once per process;
+later calls return immediately.
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+
+# In dependency order, so each import mostly reuses what the previous one loaded
+WARM_MODULES = (
+    "numpy",
+    "calculations",
+    "metrics_cache",
+    "sensitivity",
+    "pandas",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "charts",
+    "report_templates",
+    "reportlab.graphics.renderSVG",
+    "pdf_generator_single",
+    "pdf_generator_dual",
+    "portfolio_compare",
+    "portfolio_store",
+    "mail_queue",
+)
+
+_started = False
+_lock = threading.Lock()
+timings = {}  # module -> seconds, filled in as the warm-up runs
+
+
+def _warm(modules):
+    for name in modules:
+        if name in sys.modules:
+            continue
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:  # a missing optional library shouldn't take the app down
+            print(f"warm-up: could not import {name}: {e}", file=sys.stderr)
+            continue
+        timings[name] = time.perf_counter() - started
+
+
+def start_warmup(modules=WARM_MODULES):
+    """Import `modules` on a background thread (once per process; WARMUP=0 disables it)."""
+    global _started
+    if os.getenv("WARMUP", "1") == "0":
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_warm, args=(modules,), name="warmup", daemon=True).start()